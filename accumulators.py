@@ -0,0 +1,155 @@
+import math
+import numpy as np
+
+# This module holds running accumulators that fold in one observation at a time, so that the statistics of a cell can be computed without keeping every simulated startup in memory.
+
+
+# The RunningStats class keeps the count, mean and sum of squared deviations of a stream of observations using Welford's algorithm
+class RunningStats:
+  __slots__ = ('count', 'mean', 'm2')
+
+  def __init__(self):
+    self.count = 0
+    self.mean = 0.0
+    self.m2 = 0.0
+
+  def add(self, x):
+    self.count = self.count + 1
+    delta = x - self.mean
+    self.mean = self.mean + delta / self.count
+    self.m2 = self.m2 + delta * (x - self.mean)
+
+  # This function adds a whole array of observations at once
+  def add_batch(self, xs):
+    batch = RunningStats()
+    batch.count = len(xs)
+    if batch.count > 0:
+      batch.mean = float(np.mean(xs))
+      batch.m2 = float(np.sum((np.asarray(xs, dtype = float) - batch.mean)**2))
+    return self.merge(batch)
+
+  # This function combines the statistics of another RunningStats into this one (Chan et al.), so that accumulators built in different processes can be merged
+  def merge(self, other):
+    count = self.count + other.count
+    if count == 0:
+      return self
+    delta = other.mean - self.mean
+    self.mean = self.mean + delta * other.count / count
+    self.m2 = self.m2 + other.m2 + delta**2 * self.count * other.count / count
+    self.count = count
+    return self
+
+  # The sample variance, to match statistics.stdev() used in simulation_analysis()
+  def variance(self):
+    return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+  def stdev(self):
+    return math.sqrt(self.variance())
+
+
+# The QuantileSketch class estimates a single quantile p of a stream in constant memory with the P-squared algorithm (Jain and Chlamtac, 1985). Until five observations have been seen it returns the exact quantile.
+class QuantileSketch:
+  __slots__ = ('p', 'count', 'heights', 'positions', 'desired', 'increments')
+
+  def __init__(self, p):
+    if p <= 0 or p >= 1:
+      raise Exception('The quantile must be between 0 and 1. The quantile supplied was: {}'.format(p))
+    self.p = p
+    self.count = 0
+    self.heights = []
+    self.positions = [1, 2, 3, 4, 5]
+    self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+    self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+  def add(self, x):
+    q = self.heights
+    self.count = self.count + 1
+
+    # Fill the five markers with the first five observations
+    if len(q) < 5:
+      q.append(x)
+      q.sort()
+      return
+
+    # Find the cell the observation falls in and update the extreme markers
+    if x < q[0]:
+      q[0] = x
+      k = 0
+    elif x >= q[4]:
+      q[4] = x
+      k = 3
+    else:
+      k = 0
+      while x >= q[k + 1]:
+        k = k + 1
+
+    n = self.positions
+    for i in range(k + 1, 5):
+      n[i] = n[i] + 1
+    for i in range(5):
+      self.desired[i] = self.desired[i] + self.increments[i]
+
+    # Adjust the heights of the middle markers if they are off their desired positions
+    for i in range(1, 4):
+      d = self.desired[i] - n[i]
+      if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+        d = 1 if d > 0 else -1
+        parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * ((n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+        if q[i - 1] < parabolic < q[i + 1]:
+          q[i] = parabolic
+        else:
+          q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+        n[i] = n[i] + d
+
+  def value(self):
+    q = self.heights
+    if len(q) == 0:
+      return float('nan')
+    if self.count > 5:
+      return q[2]
+    # Exact quantile with linear interpolation for the first few observations
+    position = self.p * (len(q) - 1)
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(q) - 1)
+    return q[lower] + (q[upper] - q[lower]) * (position - lower)
+
+
+# The CellAccumulator class folds the outcome of each simulated startup of one (quality, control preference) cell into running statistics: the mean and stdev of value, ownership and age, the 10th and 90th percentiles of each, the number of startups that survived to a Series A and the number that were censored.
+class CellAccumulator:
+  __slots__ = ('value', 'ownership', 'age', 'percentiles', 'survived', 'censored', 'count')
+
+  QUANTILES = (0.1, 0.9)
+
+  def __init__(self):
+    self.value = RunningStats()
+    self.ownership = RunningStats()
+    self.age = RunningStats()
+    self.percentiles = {key: [QuantileSketch(p) for p in self.QUANTILES] for key in ['value', 'ownership', 'age']}
+    self.survived = 0
+    self.censored = 0
+    self.count = 0
+
+  # This function adds the outcome of one finished startup. The value and ownership should already follow the conventions of the model's simulation_analysis() (e.g. a value of 0 for startups that did not raise a Series A). censored marks a startup whose simulation was stopped before an end state (see simulate_dynamic.simulate()).
+  def add(self, value, ownership, age, survived, censored = False):
+    self.count = self.count + 1
+    self.survived = self.survived + (1 if survived else 0)
+    self.censored = self.censored + (1 if censored else 0)
+    for key, x in [('value', value), ('ownership', ownership), ('age', age)]:
+      getattr(self, key).add(x)
+      for sketch in self.percentiles[key]:
+        sketch.add(x)
+
+  def survival(self):
+    return self.survived / self.count if self.count > 0 else float('nan')
+
+  def censored_share(self):
+    return self.censored / self.count if self.count > 0 else float('nan')
+
+  # This function returns the statistics of the cell in the format of a cell of simulation_analysis(), extended with the promised percentiles: [(avg. value, stdev, 10th percentile, 90th percentile), (avg. ownership %, ...), (avg. age, ...), % survived to series a]
+  def analysis(self):
+    cell = []
+    for key in ['value', 'ownership', 'age']:
+      stats = getattr(self, key)
+      cell.append((stats.mean, stats.stdev()) + tuple(sketch.value() for sketch in self.percentiles[key]))
+    cell.append(self.survival())
+    return cell
@@ -0,0 +1,121 @@
+from accumulators import RunningStats
+from cohort import grid_points
+from parallel_sweep import MODELS, cohort_module
+from random_streams import cell_rngs
+from statistics import NormalDist
+import math
+
+# This module runs the quality x control preference sweep with an adaptive number of startups per cell. Each cell is simulated in batches with the cohort engine of the model, and stops as soon as the confidence intervals of its survival rate, mean value and mean ownership are narrower than the requested tolerances (or its budget is spent). Cells whose survival rate is close to 0 or 1 finish after a batch or two, and the rest of the compute goes to the high variance cells in the middle of the grid.
+
+
+# This function returns the half-width of the normal confidence interval of the mean of a RunningStats for the z score z
+def half_width(stats, z):
+  if stats.count < 2:
+    return float('inf')
+  return z * stats.stdev() / math.sqrt(stats.count)
+
+
+# The AdaptiveCell class keeps the running statistics of one (quality, control preference) cell of an adaptive sweep. censored_state is the state code of the censored end state of the model (the CENSORED of its cohort module), or None for a model that is never censored.
+class AdaptiveCell:
+  __slots__ = ('value', 'ownership', 'age', 'survived', 'censored_state', 'censored')
+
+  def __init__(self, censored_state = None):
+    self.value = RunningStats()
+    self.ownership = RunningStats()
+    self.age = RunningStats()
+    self.survived = RunningStats()
+    self.censored_state = censored_state
+    self.censored = 0 # The number of censored startups
+
+  # The number of startups simulated in the cell
+  @property
+  def count(self):
+    return self.survived.count
+
+  # This function adds the outcomes of a simulated StartupCohort to the cell
+  def add_cohort(self, cohort):
+    value, ownership, age, survived = cohort.outcomes()
+    self.value.add_batch(value)
+    self.ownership.add_batch(ownership)
+    self.age.add_batch(age)
+    self.survived.add_batch(survived)
+    if self.censored_state is not None:
+      self.censored = self.censored + int((cohort.columns()['state'] == self.censored_state).sum())
+
+  # This function returns the confidence interval half-widths of the survival rate, mean value and mean ownership for the z score z
+  def half_widths(self, z):
+    return {'survival': half_width(self.survived, z), 'value': half_width(self.value, z), 'ownership': half_width(self.ownership, z)}
+
+  # This function returns True if every half-width is within its tolerance. A tolerance of None is not checked.
+  def converged(self, z, tolerances):
+    widths = self.half_widths(z)
+    return all(tolerance is None or widths[key] <= tolerance for key, tolerance in tolerances.items())
+
+  # This function returns the statistics of the cell in the same format as a cell of simulation_analysis(): [(avg. value, stdev), (avg. ownership %, stdev), (avg. age, stdev), % survived to series a], followed by % censored for a model that can be censored
+  def analysis(self):
+    cell = [(self.value.mean, self.value.stdev()), (self.ownership.mean, self.ownership.stdev()), (self.age.mean, self.age.stdev()), self.survived.mean]
+    if self.censored_state is not None:
+      cell.append(self.censored / self.count if self.count > 0 else float('nan'))
+    return cell
+
+
+# This function simulates one cell in batches of batch_size startups until it has converged (after at least min_startups) or max_startups have been simulated. Every batch draws from the same Generator, so the cell is reproducible for a given seed. max_age and max_value censor the startups of the dynamic model.
+def simulate_adaptive_cell(model, control_pref, quality, rng, tolerances, z, batch_size, min_startups, max_startups, max_age = None, max_value = None):
+  module = cohort_module(model)
+  limits = {} if max_age is None and max_value is None else {'max_age': max_age, 'max_value': max_value}
+  cell = AdaptiveCell(getattr(module, 'CENSORED', None))
+  while cell.count < max_startups:
+    n = min(batch_size, max_startups - cell.count)
+    cell.add_cohort(module.simulate_cohort(module.StartupCohort(control_pref, quality, n, rng, **limits)))
+    if cell.count >= min_startups and cell.converged(z, tolerances):
+      break
+  return cell
+
+
+""" This function is the adaptive equivalent of initialize_startup_matrix() followed by simulation_analysis(). It returns a matrix (a list of lists indexed by quality and then control preference) of AdaptiveCell objects; see adaptive_analysis() and sample_counts(). The parameters are:
+  model: 'static' or 'dynamic'
+  q_increment, cp_increment: the grid increments
+  survival_tolerance, value_tolerance, ownership_tolerance: the target half-widths of the confidence intervals of the survival rate, the mean value and the mean ownership. None switches a target off.
+  confidence: the confidence level of the intervals
+  batch_size: the number of startups simulated at a time in a cell
+  min_startups: the number of startups a cell simulates before it may stop. It guards against stopping on a first batch that happens to have no spread.
+  max_startups: the budget of startups per cell
+  seed, common_random_numbers: as in initialize_startup_matrix()
+  max_age, max_value: censor the startups as in parallel_startup_matrix() (dynamic model only)
+"""
+def adaptive_startup_matrix(model, q_increment, cp_increment, survival_tolerance = 0.02, value_tolerance = 1.0, ownership_tolerance = 0.01, confidence = 0.95, batch_size = 50, min_startups = 100, max_startups = 5000, seed = None, common_random_numbers = False, max_age = None, max_value = None):
+
+  if model not in MODELS:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(MODELS, model))
+  if model == 'static' and (max_age is not None or max_value is not None):
+    raise Exception('The static model always reaches an end state within a few ticks, so it cannot be censored. The max_age and max_value supplied were: {}, {}'.format(max_age, max_value))
+  if confidence <= 0 or confidence >= 1:
+    raise Exception('The confidence must be between 0 and 1. The confidence supplied was: {}'.format(confidence))
+  if batch_size < 2 or max_startups < batch_size:
+    raise Exception('The batch size must be at least 2 and no larger than max_startups. The batch size supplied was: {}'.format(batch_size))
+
+  z = NormalDist().inv_cdf((1 + confidence) / 2)
+  tolerances = {'survival': survival_tolerance, 'value': value_tolerance, 'ownership': ownership_tolerance}
+
+  qualities = grid_points(q_increment)
+  control_prefs = grid_points(cp_increment)
+  rngs = iter(cell_rngs(seed, len(qualities) * len(control_prefs), common_random_numbers))
+
+  data = []
+  for quality in qualities:
+    row = []
+    for control_pref in control_prefs:
+      row.append(simulate_adaptive_cell(model, control_pref, quality, next(rngs), tolerances, z, batch_size, min_startups, max_startups, max_age, max_value))
+    data.append(row)
+
+  return data
+
+
+# This function returns the analysis matrix of an adaptive sweep, in the format of simulation_analysis()
+def adaptive_analysis(matrix):
+  return [[cell.analysis() for cell in row] for row in matrix]
+
+
+# This function returns the number of startups each cell of an adaptive sweep simulated
+def sample_counts(matrix):
+  return [[cell.count for cell in row] for row in matrix]
@@ -0,0 +1,129 @@
+from cohort import grid_points
+from parallel_sweep import MODELS, cohort_module
+import numpy as np
+
+# This module computes the statistics of simulation_analysis() for every (quality, control preference) cell in one grouped NumPy pass over columnar per startup results, instead of looping over the cells and startups in Python. The input is a set of per startup arrays (the layout of StartupCohort.columns() plus the quality and control preference of each startup), which can come from a results file (see results_store.py), a matrix of cohorts or a matrix of Startup objects. The output is a tidy pandas DataFrame indexed by (quality, control_pref).
+
+QUANTILES = (0.1, 0.9)
+
+
+# This helper returns the group of each startup and the (quality, control preference) of each group. Groups are numbered quality first, as the rows of an analysis matrix. The parameters are factorized with a hash table rather than sorted.
+def group_index(quality, control_pref):
+  import pandas as pd
+  q_index, qualities = pd.factorize(quality, sort = True)
+  cp_index, control_prefs = pd.factorize(control_pref, sort = True)
+  groups = q_index.astype(np.int64) * len(control_prefs) + cp_index
+  return groups, np.repeat(np.asarray(qualities), len(control_prefs)), np.tile(np.asarray(control_prefs), len(qualities))
+
+
+# This helper returns the quantiles of x within each group, with the same linear interpolation as np.percentile. order sorts the startups by group, and starts and counts give the slice of each group in that order. Only the order statistics that are needed are found in each group (with np.partition), so no full sort of x is needed.
+def grouped_quantiles(x, order, starts, counts, quantiles):
+  grouped = x[order]
+  result = [np.empty(len(counts)) for _ in quantiles]
+  for g in range(len(counts)):
+    values = grouped[starts[g]:starts[g] + counts[g]]
+    positions = [p * (counts[g] - 1) for p in quantiles]
+    ranks = sorted(set([int(np.floor(position)) for position in positions] + [min(int(np.floor(position)) + 1, counts[g] - 1) for position in positions]))
+    partitioned = np.partition(values, ranks)
+    for k, position in enumerate(positions):
+      lower = int(np.floor(position))
+      upper = min(lower + 1, counts[g] - 1)
+      result[k][g] = partitioned[lower] + (partitioned[upper] - partitioned[lower]) * (position - lower)
+  return result
+
+
+""" This function returns the statistics of each (quality, control preference) cell as a DataFrame indexed by (quality, control_pref). The parameters are:
+  model: 'static' or 'dynamic', which sets how the value and ownership of the startups that did not survive are counted (see the outcomes() function of the cohort modules)
+  quality, control_pref: the parameters of each startup
+  columns: a dict of per startup arrays with at least state, age, value and pct_owned, in the layout of StartupCohort.columns()
+  quantiles: the quantiles reported for the value, ownership and age
+The columns are the mean, stdev (ddof = 1, as statistics.stdev()) and quantiles of the value, ownership and age, the survival rate and the number of startups of each cell. For the dynamic model the share of censored startups (see simulate_dynamic.simulate()) is added as the censored column.
+"""
+def grouped_analysis(model, quality, control_pref, columns, quantiles = QUANTILES):
+  import pandas as pd
+
+  if model not in MODELS:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(MODELS, model))
+  module = cohort_module(model)
+  value, ownership, age, survived = module.outcomes(columns)
+  groups, group_quality, group_control_pref = group_index(np.asarray(quality), np.asarray(control_pref))
+
+  # Drop the grid points that have no startups
+  number_of_groups = len(group_quality)
+  counts = np.bincount(groups, minlength = number_of_groups)
+  present = counts > 0
+  remap = np.cumsum(present) - 1
+  groups = remap[groups]
+  counts = counts[present]
+  starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+  order = np.argsort(groups, kind = 'stable')
+
+  data = {}
+  for key, x in [('value', value), ('ownership', ownership), ('age', age)]:
+    x = np.asarray(x, dtype = float)
+    mean = np.bincount(groups, weights = x) / counts
+    squares = np.bincount(groups, weights = (x - mean[groups])**2)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+      data[key + '_mean'] = mean
+      data[key + '_stdev'] = np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+    for p, q in zip(quantiles, grouped_quantiles(x, order, starts, counts, quantiles)):
+      data['{}_p{:g}'.format(key, p * 100)] = q
+  data['survival'] = np.bincount(groups, weights = survived) / counts
+  if hasattr(module, 'CENSORED'):
+    data['censored'] = np.bincount(groups, weights = np.asarray(columns['state']) == module.CENSORED) / counts
+  data['count'] = counts
+
+  index = pd.MultiIndex.from_arrays([group_quality[present], group_control_pref[present]], names = ['quality', 'control_pref'])
+  return pd.DataFrame(data, index = index)
+
+
+# This function returns the grouped analysis of a results table written by results_store.ResultsWriter. table is a pyarrow Table or the path of a results file.
+def table_analysis(table, quantiles = QUANTILES):
+  if isinstance(table, str):
+    from results_store import read_results
+    table = read_results(table, columns = ['quality', 'control_pref', 'state', 'age', 'value', 'pct_owned'])
+  model = table.schema.metadata[b'model'].decode()
+  state = table.column('state').combine_chunks()
+  columns = {
+    'state': state.indices.to_numpy(zero_copy_only = False).astype(np.uint8),
+    'age': table.column('age').to_numpy(),
+    'value': table.column('value').to_numpy(),
+    'pct_owned': table.column('pct_owned').to_numpy(),
+  }
+  return grouped_analysis(model, table.column('quality').to_numpy(), table.column('control_pref').to_numpy(), columns, quantiles)
+
+
+# This function returns the grouped analysis of a matrix of results: the StartupCohort matrix of initialize_cohort_matrix(), the dicts of arrays of parallel_startup_matrix(output = 'arrays') (for which the grid increments must be given) or the Startup matrix of initialize_startup_matrix()
+def matrix_analysis(model, matrix, q_increment = None, cp_increment = None, quantiles = QUANTILES):
+  from results_store import startup_columns
+
+  qualities = []
+  control_prefs = []
+  cells = []
+  for i, row in enumerate(matrix):
+    for j, cell in enumerate(row):
+      if isinstance(cell, dict):
+        quality, control_pref = grid_points(q_increment)[i], grid_points(cp_increment)[j]
+      elif isinstance(cell, list):
+        quality, control_pref = cell[0].quality, cell[0].control_pref
+        cell = startup_columns(cell, model)
+      else:
+        quality, control_pref = cell.quality, cell.control_pref
+        cell = cell.columns()
+      qualities.append(np.full(len(cell['state']), quality, dtype = float))
+      control_prefs.append(np.full(len(cell['state']), control_pref, dtype = float))
+      cells.append(cell)
+
+  columns = {key: np.concatenate([cell[key] for cell in cells]) for key in ['state', 'age', 'value', 'pct_owned']}
+  return grouped_analysis(model, np.concatenate(qualities), np.concatenate(control_prefs), columns, quantiles)
+
+
+# This function converts a grouped analysis back into the matrix of simulation_analysis() (a list of lists indexed by quality and then control preference, each cell [(avg. value, stdev), (avg. ownership %, stdev), (avg. age, stdev), % survived to series a], followed by % censored for the dynamic model), e.g. for plot_analysis()
+def to_matrix(frame):
+  matrix = []
+  for quality in frame.index.get_level_values('quality').unique():
+    row = []
+    for _, cell in frame.loc[quality].iterrows():
+      row.append([(cell['value_mean'], cell['value_stdev']), (cell['ownership_mean'], cell['ownership_stdev']), (cell['age_mean'], cell['age_stdev']), cell['survival']] + ([cell['censored']] if 'censored' in cell else []))
+    matrix.append(row)
+  return matrix
@@ -0,0 +1,283 @@
+from cohort import grid_points
+import numpy as np
+import argparse
+import datetime
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# This module is the benchmark harness of the simulations. It times the main operations of both models (creating a Startup, advance(), pitch(), update_cap_table(), simulating a startup end to end and a full quality x control preference sweep) and reports startups per second, ticks per second, the peak resident memory of the process and the memory allocated per startup. The results are written as JSON so that runs from different commits can be compared, e.g.
+#   python benchmark.py --n 200 --q-inc 0.25 --cp-inc 0.25 --output bench.json
+#   python benchmark.py --n 200 --q-inc 0.25 --cp-inc 0.25 --compare bench.json
+
+MODELS = ['static', 'dynamic']
+END_STATES = {'static': ('die', 'series_a'), 'dynamic': ('die', 'series_a-success')}
+
+# The parameters of the startups used by the benchmarks of single operations
+CONTROL_PREF = 0.5
+QUALITY = 0.5
+
+
+# This helper returns the Startup class of a model
+def startup_class(model):
+  if model == 'static':
+    from startup_static import Startup
+  elif model == 'dynamic':
+    from startup_dynamic import Startup
+  else:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(MODELS, model))
+  return Startup
+
+
+# This helper runs a startup to an end state in the same way as simulate() and returns the number of ticks (calls to advance() or advance_grow_streak()) it took
+def run_startup(startup, end_states, skip_ahead = False):
+  ticks = 0
+  while not (startup.state == end_states[0] or startup.state == end_states[1]):
+    if skip_ahead and startup.state == 'grow':
+      startup.advance_grow_streak()
+    else:
+      startup.advance()
+    ticks = ticks + 1
+  return ticks
+
+
+# Each benchmark is a pair of functions. setup(model, n, rng) builds what the benchmark needs outside of the timed region, and run(model, setup) performs the timed work and returns (startups, ticks, result), where result is kept alive so that the memory it holds can be measured.
+
+def setup_rng(model, n, rng):
+  return (n, rng)
+
+def run_init(model, setup):
+  n, rng = setup
+  Startup = startup_class(model)
+  return n, 0, [Startup(CONTROL_PREF, QUALITY, rng, record = 'off') for _ in range(n)]
+
+def setup_startups(model, n, rng):
+  Startup = startup_class(model)
+  return [Startup(CONTROL_PREF, QUALITY, rng, record = 'off') for _ in range(n)]
+
+def run_advance(model, startups):
+  end_states = END_STATES[model]
+  ticks = 0
+  for startup in startups:
+    while not (startup.state == end_states[0] or startup.state == end_states[1]):
+      startup.advance()
+      ticks = ticks + 1
+  return len(startups), ticks, None
+
+def run_pitch(model, startups):
+  pitches = [startup.pitch(1 + i % 3) for i, startup in enumerate(startups)]
+  return len(startups), 0, pitches
+
+def setup_cap_table(model, n, rng):
+  startups = setup_startups(model, n, rng)
+  return [(startup, (1, 1) + tuple(startup.pitch(1)[2:])) for startup in startups]
+
+def run_cap_table(model, setup):
+  for startup, pitch in setup:
+    startup.update_cap_table(pitch)
+  return len(setup), 0, None
+
+def setup_cap_table_kernel(model, n, rng):
+  from cap_table import DEFAULT_LADDER
+  return DEFAULT_LADDER.sample_pct_sold(np.ones((len(DEFAULT_LADDER), n), dtype = bool), rng)
+
+def run_cap_table_kernel(model, pct_sold):
+  from cap_table import ownership_from_pct_sold
+  return pct_sold.shape[1], 0, ownership_from_pct_sold(pct_sold, check = 'all')
+
+def run_simulate(model, setup):
+  n, rng = setup
+  Startup = startup_class(model)
+  end_states = END_STATES[model]
+  ticks = 0
+  startups = []
+  for _ in range(n):
+    startup = Startup(CONTROL_PREF, QUALITY, rng, record = 'off')
+    ticks = ticks + run_startup(startup, end_states)
+    startups.append(startup)
+  return n, ticks, startups
+
+def run_simulate_skip_ahead(model, setup):
+  n, rng = setup
+  Startup = startup_class(model)
+  ticks = 0
+  startups = []
+  for _ in range(n):
+    startup = Startup(CONTROL_PREF, QUALITY, rng, record = 'off')
+    ticks = ticks + run_startup(startup, END_STATES[model], skip_ahead = True)
+    startups.append(startup)
+  return n, ticks, startups
+
+def setup_sweep(model, n, rng, q_increment, cp_increment):
+  return (n, rng, grid_points(q_increment), grid_points(cp_increment))
+
+def run_sweep(model, setup):
+  n, rng, qualities, control_prefs = setup
+  Startup = startup_class(model)
+  end_states = END_STATES[model]
+  ticks = 0
+  for quality in qualities:
+    for control_pref in control_prefs:
+      for _ in range(n):
+        ticks = ticks + run_startup(Startup(control_pref, quality, rng, record = 'off'), end_states)
+  return n * len(qualities) * len(control_prefs), ticks, None
+
+def run_cohort_sweep(model, setup):
+  n, rng, qualities, control_prefs = setup
+  if model == 'static':
+    import cohort_static as module
+  else:
+    import cohort_dynamic as module
+  ticks = 0
+  for quality in qualities:
+    for control_pref in control_prefs:
+      cohort = module.StartupCohort(control_pref, quality, n, rng)
+      while True:
+        advanced = cohort.advance()
+        if advanced == 0:
+          break
+        ticks = ticks + advanced
+  return n * len(qualities) * len(control_prefs), ticks, None
+
+def run_kernel_sweep(model, setup):
+  import kernel_dynamic
+  n, rng, qualities, control_prefs = setup
+  for quality in qualities:
+    for control_pref in control_prefs:
+      kernel_dynamic.simulate_kernel_cohort(control_pref, quality, n, rng)
+  return n * len(qualities) * len(control_prefs), None, None
+
+
+# This function returns the list of benchmarks for a model as (name, setup, run) tuples
+def benchmarks(model, q_increment, cp_increment):
+  sweep = lambda model, n, rng: setup_sweep(model, n, rng, q_increment, cp_increment)
+  cases = [
+    ('init', setup_rng, run_init),
+    ('advance', setup_startups, run_advance),
+    ('pitch', setup_startups, run_pitch),
+    ('update_cap_table', setup_cap_table, run_cap_table),
+    ('cap_table_kernel', setup_cap_table_kernel, run_cap_table_kernel),
+    ('simulate', setup_rng, run_simulate),
+  ]
+  if model == 'dynamic':
+    cases.append(('simulate_skip_ahead', setup_rng, run_simulate_skip_ahead))
+  cases = cases + [('sweep', sweep, run_sweep), ('cohort_sweep', sweep, run_cohort_sweep)]
+  if model == 'dynamic':
+    cases.append(('kernel_sweep', sweep, run_kernel_sweep))
+  return cases
+
+
+# This function runs one benchmark. It is first run on a few startups to warm up (importing the modules and compiling the kernel), then the work is timed repeat times and the fastest run is reported. Finally it is run once more under tracemalloc to measure the memory allocated per startup: the peak of the memory traced during the run and the memory still held by its result.
+def measure(model, name, setup, run, n, repeat, seed):
+  run(model, setup(model, min(n, 10), np.random.default_rng(seed)))
+
+  seconds = float('inf')
+  for k in range(repeat):
+    state = setup(model, n, np.random.default_rng([seed, k]))
+    start = time.perf_counter()
+    startups, ticks, result = run(model, state)
+    seconds = min(seconds, time.perf_counter() - start)
+    del result
+
+  state = setup(model, n, np.random.default_rng([seed, repeat]))
+  tracemalloc.start()
+  startups, ticks, result = run(model, state)
+  retained, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del result
+
+  return {
+    'model': model,
+    'benchmark': name,
+    'startups': startups,
+    'ticks': ticks,
+    'seconds': seconds,
+    'startups_per_second': startups / seconds if seconds > 0 else None,
+    'ticks_per_second': ticks / seconds if ticks and seconds > 0 else None,
+    'peak_traced_bytes_per_startup': peak / startups,
+    'retained_bytes_per_startup': retained / startups,
+    'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024),
+  }
+
+
+# This function returns the metadata stored with the results, so that results from different machines or commits are not compared by accident
+def metadata(args):
+  try:
+    commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, check = True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    commit = None
+  return {
+    'time': datetime.datetime.now().isoformat(),
+    'commit': commit,
+    'python': platform.python_version(),
+    'numpy': np.__version__,
+    'platform': platform.platform(),
+    'parameters': {'models': args.model, 'n': args.n, 'q_increment': args.q_inc, 'cp_increment': args.cp_inc, 'sweep_n': args.sweep_n, 'repeat': args.repeat, 'seed': args.seed},
+  }
+
+
+# This function compares results with a baseline file and returns a list of (model, benchmark, metric, baseline, current) for each throughput that dropped by more than tolerance (a fraction)
+def compare(baseline, results, tolerance = 0.2):
+  previous = {(r['model'], r['benchmark']): r for r in baseline['results']}
+  regressions = []
+  for result in results:
+    old = previous.get((result['model'], result['benchmark']))
+    if old is None:
+      continue
+    for metric in ['startups_per_second', 'ticks_per_second']:
+      if old.get(metric) and result.get(metric) and result[metric] < old[metric] * (1 - tolerance):
+        regressions.append((result['model'], result['benchmark'], metric, old[metric], result[metric]))
+  return regressions
+
+
+# This function runs the benchmarks of the given models and returns the list of results
+def run_benchmarks(models, n, q_increment, cp_increment, sweep_n, repeat = 3, seed = 0, only = None):
+  results = []
+  for model in models:
+    for name, setup, run in benchmarks(model, q_increment, cp_increment):
+      if only is not None and name not in only:
+        continue
+      size = sweep_n if name.endswith('sweep') else n
+      result = measure(model, name, setup, run, size, repeat, seed)
+      print('{:8} {:20} {:>12.0f} startups/s {:>12} ticks/s {:>10.0f} B/startup peak'.format(model, name, result['startups_per_second'], '-' if result['ticks_per_second'] is None else '{:.0f}'.format(result['ticks_per_second']), result['peak_traced_bytes_per_startup']))
+      results.append(result)
+  return results
+
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description = 'Benchmark the throughput and memory of the fundraising simulations.')
+  parser.add_argument('--model', nargs = '+', choices = MODELS, default = MODELS)
+  parser.add_argument('--n', type = int, default = 1000, help = 'startups per benchmark of a single operation')
+  parser.add_argument('--q-inc', type = float, default = 0.25, help = 'quality increment of the sweep benchmarks')
+  parser.add_argument('--cp-inc', type = float, default = 0.25, help = 'control preference increment of the sweep benchmarks')
+  parser.add_argument('--sweep-n', type = int, default = 50, help = 'startups per cell of the sweep benchmarks')
+  parser.add_argument('--repeat', type = int, default = 3)
+  parser.add_argument('--seed', type = int, default = 0)
+  parser.add_argument('--only', nargs = '+', help = 'run only the named benchmarks')
+  parser.add_argument('--output', help = 'write the results to this JSON file')
+  parser.add_argument('--compare', help = 'compare the results with this JSON file and exit with status 1 on a regression')
+  parser.add_argument('--tolerance', type = float, default = 0.2, help = 'the fraction of throughput that may be lost before --compare reports a regression')
+  args = parser.parse_args(argv)
+
+  results = run_benchmarks(args.model, args.n, args.q_inc, args.cp_inc, args.sweep_n, args.repeat, args.seed, args.only)
+  report = {'metadata': metadata(args), 'results': results}
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent = 2)
+
+  if args.compare:
+    with open(args.compare) as f:
+      regressions = compare(json.load(f), results, args.tolerance)
+    for model, name, metric, old, new in regressions:
+      print('Regression in {} {}: {} fell from {:.0f} to {:.0f}'.format(model, name, metric, old, new))
+    if len(regressions) > 0:
+      return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
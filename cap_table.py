@@ -0,0 +1,146 @@
+from definitions import DEBUG, FUNDRAISING_MAP, PCT_SOLD_RANGES, PRE_SEED_VALUE, SEED_VALUE
+import numpy as np
+
+# This module is the batched cap table kernel. The ownership of a batch of startups is held as one (rounds x startups) array, where row 0 is the founders and row r the investors of round r, so a round is applied to every startup of the batch with a few array operations, and the final cap table of a whole batch can be built from its pct_sold history with one cumulative product. Nothing in it is specific to the four rounds of FUNDRAISING_MAP: the rounds are given by a RoundLadder, which can be extended with a Series B, C and so on.
+#
+# The sum-to-1 invariant of the ownership is checked over the whole batch ('all'), over a random sample of its startups ('sample') or not at all ('off'). By default it is checked in full with FUNDRAISING_DEBUG=1 and sampled otherwise.
+
+CHECK_MODES = ['all', 'sample', 'off']
+DEFAULT_CHECK = 'all' if DEBUG else 'sample'
+SAMPLE_SIZE = 64 # The number of startups checked in 'sample' mode
+TOLERANCE = 10**-6
+
+_check_rng = None
+
+
+# The RoundLadder class is the sequence of rounds a startup can raise, starting with the founding round, and the range of the uniform draw for the pct_sold of every round after it (as PCT_SOLD_RANGES). raise_values are the value thresholds between the rounds after the founding round (as PRE_SEED_VALUE and SEED_VALUE): a startup raises the first round below raise_values[0], round r between raise_values[r - 2] and raise_values[r - 1], and the last round above the last threshold. They are only needed to simulate the ladder (see cohort_dynamic.StartupCohort).
+class RoundLadder:
+  __slots__ = ('names', 'pct_sold_ranges', 'raise_values')
+
+  def __init__(self, names, pct_sold_ranges, raise_values = None):
+    if len(pct_sold_ranges) != len(names) - 1:
+      raise Exception('A pct_sold range is needed for every round after the founding round. The number of rounds supplied was {} and the number of ranges was {}'.format(len(names), len(pct_sold_ranges)))
+    for name, (low, high) in zip(names[1:], pct_sold_ranges):
+      if not 0 <= low <= high < 1:
+        raise Exception('The pct_sold range of round {} must be within [0, 1). The range supplied was: {}'.format(name, (low, high)))
+    if raise_values is not None:
+      if len(raise_values) != max(len(names) - 2, 0):
+        raise Exception('A raise value is needed between every two rounds after the founding round. The number of rounds supplied was {} and the number of raise values was {}'.format(len(names), len(raise_values)))
+      if any(low >= high for low, high in zip(raise_values, raise_values[1:])):
+        raise Exception('The raise values must be increasing. The raise values supplied were: {}'.format(raise_values))
+    self.names = list(names)
+    self.pct_sold_ranges = [tuple(r) for r in pct_sold_ranges]
+    self.raise_values = None if raise_values is None else [float(v) for v in raise_values]
+
+  def __len__(self):
+    return len(self.names)
+
+  # This function returns the index of the round with the given name
+  def index(self, name):
+    return self.names.index(name)
+
+  # This function returns a new ladder with one more round at the end. If the ladder has raise values, raise_value is the value above which the new round is raised.
+  def extend(self, name, pct_sold_range, raise_value = None):
+    if self.raise_values is None:
+      return RoundLadder(self.names + [name], self.pct_sold_ranges + [pct_sold_range])
+    if raise_value is None:
+      raise Exception('The ladder has raise values, so round {} needs one too.'.format(name))
+    return RoundLadder(self.names + [name], self.pct_sold_ranges + [pct_sold_range], self.raise_values + [raise_value])
+
+  # This function returns a (rounds x startups) array of the pct_sold of each startup in each round. raised is a boolean (rounds x startups) array of the rounds each startup raised; the pct_sold of the others, and of the founding row, is 0.
+  def sample_pct_sold(self, raised, rng):
+    low = np.array([0.0] + [r[0] for r in self.pct_sold_ranges])[:, None]
+    high = np.array([0.0] + [r[1] for r in self.pct_sold_ranges])[:, None]
+    pct_sold = rng.uniform(low, high, size = raised.shape)
+    pct_sold[0] = 0.0
+    return np.where(raised, pct_sold, 0.0)
+
+  def __repr__(self):
+    return 'RoundLadder({})'.format(', '.join('{} {}'.format(name, r) for name, r in zip(self.names[1:], self.pct_sold_ranges)))
+
+
+# The rounds of the models (FUNDRAISING_MAP, PCT_SOLD_RANGES, PRE_SEED_VALUE and SEED_VALUE)
+DEFAULT_LADDER = RoundLadder([FUNDRAISING_MAP[r] for r in range(len(FUNDRAISING_MAP))], [PCT_SOLD_RANGES[r] for r in range(1, len(FUNDRAISING_MAP))], [PRE_SEED_VALUE, SEED_VALUE])
+
+
+# This function returns the cap table of number_of_startups new startups with number_of_rounds rounds, where the founders own everything
+def empty_cap_table(number_of_rounds, number_of_startups):
+  ownership = np.zeros((number_of_rounds, number_of_startups))
+  ownership[0] = 1.0
+  return ownership
+
+
+# This function checks that the ownership of every startup (every column of a (rounds x startups) array) adds up to 1. check is one of CHECK_MODES. It raises an Exception naming the first startup that fails, and returns the number of startups checked.
+def check_ownership(ownership, check = DEFAULT_CHECK, tolerance = TOLERANCE, sample_size = SAMPLE_SIZE):
+  global _check_rng
+  if check not in CHECK_MODES:
+    raise Exception('The check must be one of {}. The check supplied was: {}'.format(CHECK_MODES, check))
+  if check == 'off' or ownership.shape[1] == 0:
+    return 0
+  if check == 'sample' and ownership.shape[1] > sample_size:
+    # The sample is drawn from a Generator of its own, so that checking does not move the random streams of the simulations
+    if _check_rng is None:
+      _check_rng = np.random.default_rng()
+    columns = _check_rng.choice(ownership.shape[1], sample_size, replace = False)
+  else:
+    columns = np.arange(ownership.shape[1])
+  totals = ownership[:, columns].sum(axis = 0)
+  bad = np.flatnonzero(np.abs(totals - 1.0) >= tolerance)
+  if len(bad) > 0:
+    raise Exception('The total ownership should add up to 1. The sum of all ownership percentages of startup {} was: {}. Its cap table is: {}'.format(columns[bad[0]], totals[bad[0]], ownership[:, columns[bad[0]]]))
+  return len(columns)
+
+
+""" This function applies a round to a batch of startups in place. The parameters are:
+  ownership: the (rounds x startups) cap table of the batch
+  raise_round: the index of the round that was raised, or with idx an array with the round of each startup in idx
+  pct_sold: the pct_sold of the round, a number or an array with one entry per startup raising
+  idx: the indices of the startups that raised the round (all of them if None)
+  check: one of CHECK_MODES, applied to the startups that raised the round
+Every earlier round is diluted by (1 - pct_sold), and the new investors own pct_sold.
+"""
+def dilute(ownership, raise_round, pct_sold, idx = None, check = DEFAULT_CHECK):
+  if idx is None:
+    ownership[:raise_round] *= 1 - np.asarray(pct_sold)
+    ownership[raise_round] = pct_sold
+    check_ownership(ownership, check)
+    return ownership
+  if np.ndim(raise_round) == 0:
+    ownership[:raise_round, idx] *= 1 - np.asarray(pct_sold)
+  else:
+    # Each startup raised its own round, so the rows below it are masked column by column
+    earlier = np.arange(len(ownership))[:, None] < raise_round
+    ownership[:, idx] = np.where(earlier, ownership[:, idx] * (1 - np.asarray(pct_sold)), ownership[:, idx])
+  ownership[raise_round, idx] = pct_sold
+  if check != 'off':
+    check_ownership(ownership[:, idx], check)
+  return ownership
+
+
+# This function returns how often a check that is made one startup at a time (Startup.update_cap_table() and the compiled kernel) is done in the given check mode: every time for 'all', once every SAMPLE_SIZE times for 'sample' and never (0) for 'off'
+def check_interval(check = DEFAULT_CHECK):
+  if check not in CHECK_MODES:
+    raise Exception('The check must be one of {}. The check supplied was: {}'.format(CHECK_MODES, check))
+  return {'all': 1, 'sample': SAMPLE_SIZE, 'off': 0}[check]
+
+
+""" This function returns the final (rounds x startups) cap table of a batch of startups from their pct_sold in each round, a (rounds x startups) array with 0 for the rounds that were not raised (the founding row is ignored). Since the rounds are raised in order, the investors of round r are diluted by every later round:
+  ownership[r] = pct_sold[r] * prod over k > r of (1 - pct_sold[k])
+with the founders as pct_sold[0] = 1. The products over the later rounds are one reversed cumulative product down the rounds, so the cost in Python does not grow with the number of rounds. The pct_sold of a cohort (startups x rounds, see StartupCohort.columns()) can be passed transposed.
+"""
+def ownership_from_pct_sold(pct_sold, check = DEFAULT_CHECK):
+  stake = np.array(pct_sold, dtype = float)
+  stake[0] = 1.0
+  later = np.ones_like(stake)
+  later[:-1] = np.cumprod(1 - stake[:0:-1], axis = 0)[::-1]
+  ownership = stake * later
+  check_ownership(ownership, check)
+  return ownership
+
+
+# This function returns the (rounds x startups) cap table of the final arrays of a cohort (in the layout of StartupCohort.columns()), and checks that the founder row matches the founder ownership the cohort tracked itself
+def cohort_cap_table(columns, check = DEFAULT_CHECK):
+  ownership = ownership_from_pct_sold(columns['pct_sold'].T, check)
+  if check != 'off' and not np.allclose(ownership[0], columns['pct_owned'], rtol = 0, atol = TOLERANCE):
+    raise Exception('The founder ownership of the cap table does not match the pct_owned of the cohort.')
+  return ownership
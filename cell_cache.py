@@ -0,0 +1,186 @@
+from definitions import BASE_DIR, CACHE_DIR, FUNDRAISING_MAP, PRE_SEED_VALUE, SEED_VALUE, PCT_SOLD_RANGES
+from cohort import grid_points
+from parallel_sweep import MODELS, cohort_module
+import numpy as np
+import hashlib
+import json
+import os
+import time
+
+# This module keeps the simulated cells of a sweep in a content-addressed cache on disk, so that refining a grid, asking for more startups per cell or resuming an interrupted sweep only simulates what is missing. A cell is simulated in blocks of block_size startups, and each block is stored under a key built from the model version, the (quality, control preference) point, the block, the seed and the model constants. The random stream of a block depends only on that key (and not on the position of the cell in the grid), so a block gives the same startups whatever sweep it is part of.
+
+# The source files whose contents make up the version of each model. Editing any of them gives new keys, so stale results are never read back.
+MODEL_SOURCES = {
+  'static': ['definitions.py', 'random_streams.py', 'cohort.py', 'startup_static.py', 'cohort_static.py'],
+  'dynamic': ['definitions.py', 'random_streams.py', 'cohort.py', 'cap_table.py', 'startup_dynamic.py', 'cohort_dynamic.py'],
+}
+
+# Parameter values are rounded to this many decimals, so that e.g. the 0.3 of a 0.1 grid and of a 0.05 grid are the same cell
+DECIMALS = 9
+
+_model_versions = {}
+
+
+# This function returns the version hash of a model, computed from its source files
+def model_version(model):
+  if model not in MODELS:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(MODELS, model))
+  if model not in _model_versions:
+    digest = hashlib.sha256()
+    for name in MODEL_SOURCES[model]:
+      with open(os.path.join(BASE_DIR, name), 'rb') as f:
+        digest.update(f.read())
+    _model_versions[model] = digest.hexdigest()
+  return _model_versions[model]
+
+
+# This function returns the SeedSequence of one block of a cell. With common_random_numbers every cell shares the streams of its blocks.
+def block_seed_sequence(seed, quality, control_pref, block, common_random_numbers = False):
+  if common_random_numbers:
+    return np.random.SeedSequence(seed, spawn_key = (block,))
+  return np.random.SeedSequence(seed, spawn_key = (int(round(quality * 10**DECIMALS)), int(round(control_pref * 10**DECIMALS)), block))
+
+
+# This function returns the cache key of one block of a cell
+def block_key(model, quality, control_pref, block, block_size, seed, common_random_numbers = False, max_age = None, max_value = None):
+  content = {
+    'model': model,
+    'version': model_version(model),
+    'quality': round(quality, DECIMALS),
+    'control_pref': round(control_pref, DECIMALS),
+    'block': block,
+    'block_size': block_size,
+    'seed': seed,
+    'common_random_numbers': common_random_numbers,
+    'max_age': max_age,
+    'max_value': max_value,
+    'constants': {'FUNDRAISING_MAP': FUNDRAISING_MAP, 'PRE_SEED_VALUE': PRE_SEED_VALUE, 'SEED_VALUE': SEED_VALUE, 'PCT_SOLD_RANGES': PCT_SOLD_RANGES},
+  }
+  return hashlib.sha256(json.dumps(content, sort_keys = True).encode()).hexdigest()
+
+
+# The CellCache class stores blocks of simulated startups (dicts of arrays in the layout of StartupCohort.columns()) as .npz files in directory. Entries older than max_age seconds, and the least recently used entries beyond max_bytes, are removed by evict(). Either limit can be None.
+class CellCache:
+  def __init__(self, directory = CACHE_DIR, max_bytes = None, max_age = None):
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.max_age = max_age
+    self.hits = 0
+    self.misses = 0
+    os.makedirs(directory, exist_ok = True)
+
+  def path(self, key):
+    return os.path.join(self.directory, key[:2], key + '.npz')
+
+  # This function returns the cached block for key, or None if it is not in the cache. Reading an entry marks it as recently used.
+  def get(self, key):
+    path = self.path(key)
+    try:
+      with np.load(path) as data:
+        columns = {name: data[name] for name in data.files}
+    except (OSError, ValueError):
+      self.misses = self.misses + 1
+      return None
+    os.utime(path)
+    self.hits = self.hits + 1
+    return columns
+
+  # This function stores a block. It is written to a temporary file first, so an interrupted sweep never leaves a partial entry behind.
+  def put(self, key, columns):
+    path = self.path(key)
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    temporary = path + '.{}.tmp'.format(os.getpid())
+    with open(temporary, 'wb') as f:
+      np.savez(f, **columns)
+    os.replace(temporary, path)
+
+  # This function returns a list of (path, size in bytes, last used time) for every entry in the cache
+  def entries(self):
+    entries = []
+    for root, _, files in os.walk(self.directory):
+      for name in files:
+        if name.endswith('.npz'):
+          path = os.path.join(root, name)
+          stat = os.stat(path)
+          entries.append((path, stat.st_size, stat.st_mtime))
+    return entries
+
+  # The total size of the cache in bytes
+  def size(self):
+    return sum(size for _, size, _ in self.entries())
+
+  # This function removes the entries older than max_age and then the least recently used entries until the cache is no larger than max_bytes. It returns the number of entries removed.
+  def evict(self, max_bytes = None, max_age = None):
+    max_bytes = self.max_bytes if max_bytes is None else max_bytes
+    max_age = self.max_age if max_age is None else max_age
+    entries = sorted(self.entries(), key = lambda entry: entry[2])
+    removed = 0
+    if max_age is not None:
+      cutoff = time.time() - max_age
+      while len(entries) > 0 and entries[0][2] < cutoff:
+        os.remove(entries.pop(0)[0])
+        removed = removed + 1
+    if max_bytes is not None:
+      total = sum(size for _, size, _ in entries)
+      while len(entries) > 0 and total > max_bytes:
+        path, size, _ = entries.pop(0)
+        os.remove(path)
+        total = total - size
+        removed = removed + 1
+    return removed
+
+  # This function removes every entry from the cache
+  def clear(self):
+    for path, _, _ in self.entries():
+      os.remove(path)
+
+
+# This function returns the final arrays of number_of_startups startups of one cell, simulating only the blocks that are not in the cache. max_age and max_value censor the startups of the dynamic model.
+def cached_cell(cache, model, quality, control_pref, number_of_startups, seed, block_size = 50, common_random_numbers = False, max_age = None, max_value = None):
+  module = cohort_module(model)
+  limits = {} if max_age is None and max_value is None else {'max_age': max_age, 'max_value': max_value}
+  quality = round(quality, DECIMALS)
+  control_pref = round(control_pref, DECIMALS)
+  blocks = []
+  for block in range(-(-number_of_startups // block_size)):
+    key = block_key(model, quality, control_pref, block, block_size, seed, common_random_numbers, max_age, max_value)
+    columns = cache.get(key)
+    if columns is None:
+      rng = np.random.default_rng(block_seed_sequence(seed, quality, control_pref, block, common_random_numbers))
+      columns = {name: np.array(array) for name, array in module.simulate_cohort(module.StartupCohort(control_pref, quality, block_size, rng, **limits)).columns().items()}
+      cache.put(key, columns)
+    blocks.append(columns)
+  return {name: np.concatenate([columns[name] for columns in blocks])[:number_of_startups] for name in blocks[0]}
+
+
+""" This function is the cached equivalent of initialize_startup_matrix() followed by simulation_analysis(). It returns a matrix (a list of lists indexed by quality and then control preference) with one result per cell, the cell of simulation_analysis() if output is 'analysis', or the dict of final arrays if output is 'arrays'. The parameters are:
+  model: 'static' or 'dynamic'
+  q_increment, cp_increment: the grid increments
+  number_of_startups: the number of startups in each cell
+  seed: the seed of every block's random stream. A seed is required, since results without one could never be read back.
+  cache: the CellCache to use (defaults to a CellCache in CACHE_DIR). It is evicted after the sweep if it has limits.
+  block_size: the number of startups per cached block. Changing it changes the keys.
+  common_random_numbers: give every cell the same random streams
+  max_age, max_value: censor the startups as in parallel_startup_matrix() (dynamic model only). They are part of the keys.
+"""
+def cached_startup_matrix(model, q_increment, cp_increment, number_of_startups, seed, cache = None, block_size = 50, common_random_numbers = False, output = 'analysis', max_age = None, max_value = None):
+
+  if seed is None:
+    raise Exception('A seed is required to cache the results of a sweep.')
+  if output not in ['analysis', 'arrays']:
+    raise Exception('The output must be either analysis or arrays. The output supplied was: {}'.format(output))
+  if model == 'static' and (max_age is not None or max_value is not None):
+    raise Exception('The static model always reaches an end state within a few ticks, so it cannot be censored. The max_age and max_value supplied were: {}, {}'.format(max_age, max_value))
+  cache = CellCache() if cache is None else cache
+
+  data = []
+  for quality in grid_points(q_increment):
+    row = []
+    for control_pref in grid_points(cp_increment):
+      columns = cached_cell(cache, model, quality, control_pref, number_of_startups, seed, block_size, common_random_numbers, max_age, max_value)
+      row.append(cohort_module(model).cell_analysis(columns) if output == 'analysis' else columns)
+    data.append(row)
+
+  if cache.max_bytes is not None or cache.max_age is not None:
+    cache.evict()
+  return data
@@ -0,0 +1,25 @@
+import numpy as np
+
+# This helper returns the grid of parameter values used by the sweeps (quality or control preference) for a given increment. It matches the np.arange call used in initialize_startup_matrix() so that cohort sweeps land on exactly the same cells.
+def grid_points(increment):
+  return np.arange(0.0, 1.0 + increment, increment)
+
+# This helper returns the statistics of a cell from its per startup outcomes (see StartupCohort.outcomes()) in the same format as a cell of simulation_analysis(): [(avg. value, stdev), (avg. ownership %, stdev), (avg. age, stdev), % survived to series a]
+def outcome_analysis(value, ownership, age, survived):
+  return [(value.mean(), value.std(ddof = 1)), (ownership.mean(), ownership.std(ddof = 1)), (age.mean(), age.std(ddof = 1)), survived.mean()]
+
+# The StartupSummary class is a lightweight, read-only view of a single startup inside a cohort. It exposes the same attributes that simulation_analysis() reads from a simulated Startup object (state, age, value, amt_raised and pct_owned), so a cohort can be passed to the existing analysis code in place of a list of Startup objects.
+class StartupSummary:
+  __slots__ = ('control_pref', 'quality', 'state', 'age', 'value', 'amt_raised', 'pct_owned')
+
+  def __init__(self, control_pref, quality, state, age, value, amt_raised, ownership):
+    self.control_pref = control_pref
+    self.quality = quality
+    self.state = state
+    self.age = age
+    self.value = value
+    self.amt_raised = amt_raised
+    self.pct_owned = ownership
+
+  def __repr__(self):
+    return 'StartupSummary(control_pref={}, quality={}, state={}, age={}, value={}, amt_raised={}, ownership={})'.format(self.control_pref, self.quality, self.state, self.age, self.value, self.amt_raised, self.pct_owned)
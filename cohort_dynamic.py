@@ -0,0 +1,291 @@
+from definitions import FUNDRAISING_MAP, STARTUP_STATES, STATE_CODES
+from startup_dynamic import Startup
+from cohort import StartupSummary, grid_points, outcome_analysis
+from random_streams import get_rng, cell_rngs
+from cap_table import DEFAULT_CHECK, DEFAULT_LADDER, cohort_cap_table, dilute, empty_cap_table
+import numpy as np
+
+# The cohort stores the state of every startup as one of the integer codes in STATE_CODES rather than as a string
+END_STATES = (STATE_CODES['die'], STATE_CODES['series_a-success'])
+
+# The end state of the startups whose simulation was stopped at max_age or max_value (see simulate_dynamic.simulate())
+CENSORED = STATE_CODES['censored']
+
+# This function returns the state a startup moves to after a pitch for each round of a ladder (a cap_table.RoundLadder), indexed by [raise_round, success]. The model only has pitch states for the pre-seed, seed and Series A rounds of FUNDRAISING_MAP, so the first round of a longer ladder takes the pre-seed states, its last round the Series A states, whose success ends the simulation, and every round in between the seed states, which lead on to the next round in the same way.
+def pitch_states(ladder):
+  last = len(ladder) - 1
+  names = [FUNDRAISING_MAP[1] if r == 1 else FUNDRAISING_MAP[len(FUNDRAISING_MAP) - 1] if r == last else FUNDRAISING_MAP[2] for r in range(1, len(ladder))]
+  return np.array([[STATE_CODES['start'], STATE_CODES['start']]] + [[STATE_CODES[name + '-fail'], STATE_CODES[name + '-success']] for name in names], dtype = np.uint8)
+
+# The state a startup moves to after a pitch for a given round of FUNDRAISING_MAP, indexed by [raise_round, success]
+PITCH_STATES = pitch_states(DEFAULT_LADDER)
+
+# This function returns the per startup arrays of a cohort as (name, dtype, shape of each row). The funding history has one column for each of the number_of_rounds rounds.
+def cohort_arrays(number_of_rounds):
+  return [
+    ('state', np.uint8, ()),
+    ('age', np.int64, ()),
+    ('round', np.int8, ()),
+    ('value', np.float64, ()),
+    ('pct_owned', np.float64, ()),
+    ('amt_raised', np.float64, ()),
+    ('pct_sold', np.float64, (number_of_rounds,)),
+    ('post_money', np.float64, (number_of_rounds,)),
+  ]
+
+# The per startup arrays of a cohort with the rounds of FUNDRAISING_MAP
+COHORT_ARRAYS = cohort_arrays(len(FUNDRAISING_MAP))
+
+# The parameters of the dynamic model that a cohort can override (see model_parameters()): the value thresholds of the pre-seed and seed rounds (PRE_SEED_VALUE and SEED_VALUE in definitions.py), the growth rate of Startup.initialize_growth_rate() and the probability of Startup.live_transition_prob()
+PARAMETERS = ['pre_seed_value', 'seed_value', 'growth_rate', 'live_prob']
+
+
+# This function returns the parameters of the model for a reference Startup as a dict with every key of PARAMETERS, with the values in parameters (a dict, or None) in place of the defaults. The default thresholds are the first two raise values of ladder.
+def model_parameters(reference, parameters = None, ladder = DEFAULT_LADDER):
+  values = {'pre_seed_value': ladder.raise_values[0], 'seed_value': ladder.raise_values[1], 'growth_rate': reference.growth_rate, 'live_prob': reference.live_transition_prob()}
+  for key, value in (parameters or {}).items():
+    if key not in values:
+      raise Exception('The parameter must be one of {}. The parameter supplied was: {}'.format(PARAMETERS, key))
+    values[key] = value
+  if values['live_prob'] > 1 or values['live_prob'] < 0:
+    raise Exception('The live probability must be between 0 and 1. The live probability supplied was: {}'.format(values['live_prob']))
+  return values
+
+
+# This function returns the transition probabilities of a reference Startup as a list of rows in STARTUP_STATES order, with live_prob in place of every entry of the transition matrix that is Startup.live_transition_prob() (and 1 - live_prob for Startup.die_transition_prob())
+def transition_probabilities(reference, live_prob):
+  rows = []
+  for state in STARTUP_STATES:
+    row = reference.get_transition_probabilities(state)
+    for k, entry in enumerate(reference.transition_matrix[state]):
+      if entry == reference.live_transition_prob:
+        row[k] = live_prob
+      elif entry == reference.die_transition_prob:
+        row[k] = 1 - live_prob
+    rows.append(row)
+  return rows
+
+
+# This function returns the per startup outcomes that simulation_analysis() summarises from a dict of final arrays in the layout of StartupCohort.columns(), as the arrays (value, ownership, age, survived). The value is 0 for startups that did not survive to a Series A.
+def outcomes(columns):
+  survived = columns['state'] == STATE_CODES['series_a-success']
+  return np.where(survived, columns['value'], 0), columns['pct_owned'], columns['age'], survived
+
+
+# This function returns the statistics of a dict of final arrays in the same format as a cell of simulation_analysis(), with the share of censored startups as its last element
+def cell_analysis(columns):
+  return outcome_analysis(*outcomes(columns)) + [float(np.mean(columns['state'] == CENSORED))]
+
+
+# The StartupCohort class holds N startups with the same quality and control preference as NumPy arrays and advances all of them at once. It follows the same state machine as startup_dynamic.Startup.advance() (grow, live, pitch success or fail and the too-early path) with masked array operations. Startups that reach an end state are dropped from the active set. parameters is an optional dict that overrides the parameters of the model (see PARAMETERS). arrays is an optional dict of preallocated per startup arrays in the layout of cohort_arrays() for the rounds of the ladder (e.g. views of a shared buffer, see shared_cohort.py), which the cohort is then initialized and simulated in, in place. max_age and max_value censor the startups as in simulate_dynamic.simulate().
+# ladder is the cap_table.RoundLadder of the rounds the startups raise, by default the rounds of FUNDRAISING_MAP. A longer ladder needs raise values and at least the rounds of FUNDRAISING_MAP: pre_seed_value and seed_value are its first two thresholds, and its last round takes the place of the Series A (see pitch_states()). The cap table of every startup is kept as a (rounds x startups) array and diluted with cap_table.dilute(), whose sum-to-1 check is run in the given check mode (see cap_table.CHECK_MODES). Unlike the reference Startup, which checks every round, the cohort samples the check by default (cap_table.DEFAULT_CHECK is 'sample' unless FUNDRAISING_DEBUG=1).
+class StartupCohort:
+  def __init__(self, control_pref, quality, number_of_startups, rng = None, parameters = None, arrays = None, max_age = None, max_value = None, ladder = None, check = DEFAULT_CHECK):
+
+    # Check that the ladder can be simulated by the model
+    ladder = DEFAULT_LADDER if ladder is None else ladder
+    if len(ladder) < len(FUNDRAISING_MAP) or ladder.raise_values is None:
+      raise Exception('The ladder must have raise values and at least {} rounds. The ladder supplied was: {}'.format(len(FUNDRAISING_MAP), ladder))
+
+    # Build a reference Startup to validate the parameters and to get the initial value, growth rate and transition matrix
+    reference = Startup(control_pref, quality)
+    values = model_parameters(reference, parameters, ladder)
+
+    self.control_pref = control_pref
+    self.quality = quality
+    self.size = number_of_startups
+    self.rng = get_rng(rng)
+    self.growth_rate = values['growth_rate']
+    self.pre_seed_value = values['pre_seed_value']
+    self.seed_value = values['seed_value']
+    self.max_age = max_age
+    self.max_value = max_value
+    self.ladder = ladder
+    self.check = check
+
+    # The value thresholds between the rounds, the pct_sold range and the pitch states of each round
+    self.raise_values = np.array([self.pre_seed_value, self.seed_value] + ladder.raise_values[2:])
+    if np.any(np.diff(self.raise_values) <= 0):
+      raise Exception('The raise values of the rounds must be increasing. The raise values were: {}'.format(list(self.raise_values)))
+    self.pct_sold_low = np.array([0.0] + [r[0] for r in ladder.pct_sold_ranges])
+    self.pct_sold_high = np.array([0.0] + [r[1] for r in ladder.pct_sold_ranges])
+    self.pitch_states = pitch_states(ladder)
+
+    # Convert the transition matrix into cumulative probability rows in STARTUP_STATES order
+    matrix = np.array(transition_probabilities(reference, values['live_prob']), dtype = float)
+    self.transition_matrix = matrix
+    self.cumulative_matrix = np.cumsum(matrix, axis = 1)
+    self.cumulative_matrix = self.cumulative_matrix / self.cumulative_matrix[:, -1:]
+
+    # Per startup arrays
+    layout = cohort_arrays(len(ladder))
+    if arrays is None:
+      arrays = {name: np.empty((number_of_startups,) + shape, dtype = dtype) for name, dtype, shape in layout}
+    for name, dtype, shape in layout:
+      if arrays[name].shape != (number_of_startups,) + shape or arrays[name].dtype != dtype:
+        raise Exception('The array {} must have the shape {} and the dtype {}. The array supplied had the shape {} and the dtype {}'.format(name, (number_of_startups,) + shape, np.dtype(dtype), arrays[name].shape, arrays[name].dtype))
+    self.state = arrays['state']
+    self.state[:] = STATE_CODES['start']
+    self.age = arrays['age']
+    self.age[:] = 0
+    self.round = arrays['round']
+    self.round[:] = 0
+    self.value = arrays['value']
+    self.value[:] = reference.value
+    self.pct_owned = arrays['pct_owned'] # Founder ownership
+    self.pct_owned[:] = 1.0
+    self.amt_raised = arrays['amt_raised']
+    self.amt_raised[:] = 0.0
+
+    # Funding history for each round of the ladder. A pct_sold of 0 means the round was never raised.
+    self.pct_sold = arrays['pct_sold']
+    self.pct_sold[:] = 0.0
+    self.post_money = arrays['post_money']
+    self.post_money[:] = 0.0
+
+    # The (rounds x startups) cap table, whose founder row is pct_owned
+    self.ownership = empty_cap_table(len(ladder), number_of_startups)
+
+    # Indices of the startups that have not reached an end state
+    self.active_idx = np.arange(number_of_startups)
+    self.censor()
+
+  def __len__(self):
+    return self.size
+
+  # Iterating over a cohort yields a StartupSummary for each startup so that the cohort can be consumed by simulation_analysis()
+  def __iter__(self):
+    for i in range(self.size):
+      yield self.summary(i)
+
+  def summary(self, i):
+    return StartupSummary(self.control_pref, self.quality, STARTUP_STATES[self.state[i]], int(self.age[i]), float(self.value[i]), float(self.amt_raised[i]), float(self.pct_owned[i]))
+
+  # This function returns the final per startup results as a dict of arrays. It is a compact alternative to iterating over the cohort when the results need to be sent between processes or written to disk.
+  def columns(self):
+    return {'state': self.state, 'age': self.age, 'value': self.value, 'pct_owned': self.pct_owned, 'amt_raised': self.amt_raised, 'pct_sold': self.pct_sold, 'post_money': self.post_money}
+
+  # This function returns the per startup outcomes that simulation_analysis() summarises (see outcomes())
+  def outcomes(self):
+    return outcomes(self.columns())
+
+  # This function returns the (rounds x startups) cap table of the cohort, built from its funding history (see cap_table.cohort_cap_table())
+  def cap_table(self, check = 'all'):
+    return cohort_cap_table(self.columns(), check)
+
+  # This function returns the statistics of the cohort in the same format as a cell of simulation_analysis(): [(avg. value, stdev), (avg. ownership %, stdev), (avg. age, stdev), % survived to series a, % censored]
+  def analysis(self):
+    return cell_analysis(self.columns())
+
+  # This function moves the active startups that have reached max_age or max_value to the censored end state and drops them from the active set
+  def censor(self):
+    if self.max_age is None and self.max_value is None:
+      return
+    idx = self.active_idx
+    stop = np.zeros(len(idx), dtype = bool)
+    if self.max_age is not None:
+      stop |= self.age[idx] >= self.max_age
+    if self.max_value is not None:
+      stop |= self.value[idx] >= self.max_value
+    self.state[idx[stop]] = CENSORED
+    self.active_idx = idx[~stop]
+
+  # This function samples the next state for the startups in idx from the rows of the transition matrix for the given states
+  def sample(self, states):
+    u = self.rng.random(len(states))
+    return (u[:, None] >= self.cumulative_matrix[states]).sum(axis = 1).astype(np.uint8)
+
+  # This function grows the value of the startups in idx and adds one to their age
+  def grow(self, idx):
+    self.value[idx] = self.value[idx] * self.growth_rate
+    self.age[idx] = self.age[idx] + 1
+
+  # This function mirrors Startup.get_fundraising_round() for the startups in idx: the round to raise is the one whose range of raise values holds the value. A value of len(self.ladder) means the startup needs to grow more before trying to raise the next round, either because it has already raised that round or because its value is exactly one of the thresholds.
+  def get_fundraising_round(self, idx):
+    value = self.value[idx]
+    raise_round = (np.searchsorted(self.raise_values, value) + 1).astype(np.int8)
+    too_early = (raise_round <= self.round[idx]) | np.isin(value, self.raise_values)
+    raise_round[too_early] = len(self.ladder)
+    return raise_round
+
+  """ This function conducts the pitch for the startups in idx, each raising the round given in raise_round. It mirrors Startup.pitch() and returns the arrays (success, pre_money, post_money, amt_raised, pct_sold).
+  """
+  def pitch(self, idx, raise_round):
+    pct_sold = self.rng.uniform(self.pct_sold_low[raise_round], self.pct_sold_high[raise_round])
+    pre_money = self.value[idx]
+    post_money = pre_money / (1 - pct_sold)
+    amt_raised = post_money * pct_sold
+    success = self.rng.random(len(idx)) < self.quality
+    return success, pre_money, post_money, amt_raised, pct_sold
+
+  # This function updates the funding history, cap table, founder ownership, value and round of the startups in idx after a successful pitch
+  def update_funding(self, idx, raise_round, post_money, amt_raised, pct_sold):
+    self.pct_sold[idx, raise_round] = pct_sold
+    self.post_money[idx, raise_round] = post_money
+    dilute(self.ownership, raise_round, pct_sold, idx, self.check)
+    self.pct_owned[idx] = self.ownership[0, idx]
+    self.value[idx] = post_money
+    self.round[idx] = raise_round
+    self.amt_raised[idx] = self.amt_raised[idx] + amt_raised
+
+  # This function moves every active startup forward by one call of Startup.advance(). It returns the number of startups that were advanced.
+  def advance(self):
+    idx = self.active_idx
+    if len(idx) == 0:
+      return 0
+
+    state = self.state[idx]
+    new_state = self.sample(state)
+
+    # Grow: grow the value and then move to live or die
+    growing = state == STATE_CODES['grow']
+    self.grow(idx[growing])
+
+    # Live: move to grow, or else try to pitch
+    living = state == STATE_CODES['live']
+    pitching = living & (new_state != STATE_CODES['grow'])
+    pitch_idx = idx[pitching]
+    raise_round = self.get_fundraising_round(pitch_idx)
+
+    # Too early to raise the next round: grow instead and draw a new state from the live row
+    too_early = raise_round == len(self.ladder)
+    early_idx = pitch_idx[too_early]
+    self.grow(early_idx)
+    new_state[np.flatnonzero(pitching)[too_early]] = self.sample(np.full(len(early_idx), STATE_CODES['live'], dtype = np.uint8))
+
+    # Pitch for the rest and move to the success or fail state for the round
+    pitch_idx = pitch_idx[~too_early]
+    raise_round = raise_round[~too_early]
+    success, pre_money, post_money, amt_raised, pct_sold = self.pitch(pitch_idx, raise_round)
+    self.update_funding(pitch_idx[success], raise_round[success], post_money[success], amt_raised[success], pct_sold[success])
+    self.age[pitch_idx] = self.age[pitch_idx] + 1
+    new_state[np.flatnonzero(pitching)[~too_early]] = self.pitch_states[raise_round, success.astype(np.int8)]
+
+    # Every other state simply takes the sampled state
+    self.state[idx] = new_state
+
+    # Drop the startups that reached an end state from the active set
+    self.active_idx = idx[(new_state != END_STATES[0]) & (new_state != END_STATES[1])]
+    self.censor()
+    return len(idx)
+
+
+# This is the cohort equivalent of simulate_dynamic.simulate(). It advances the cohort until every startup has either raised a Series A, failed or been censored.
+def simulate_cohort(cohort):
+  while cohort.advance() > 0:
+    pass
+  return cohort
+
+
+# This function is the cohort equivalent of simulate_dynamic.initialize_startup_matrix(). Each cell of the returned matrix is a simulated StartupCohort, which can be passed directly to simulation_analysis(). Each cell's random stream is spawned from seed in the same way as in parallel_sweep.parallel_startup_matrix(), so both give identical results for the same seed. ladder is the RoundLadder of every cohort (see StartupCohort).
+def initialize_cohort_matrix(increment, number_of_startups, seed = None, common_random_numbers = False, ladder = None):
+  rngs = iter(cell_rngs(seed, len(grid_points(increment))**2, common_random_numbers))
+
+  data = []
+  for quality in grid_points(increment):
+    row = []
+    for control_preference in grid_points(increment):
+      row.append(simulate_cohort(StartupCohort(control_preference, quality, number_of_startups, next(rngs), ladder = ladder)))
+    data.append(row)
+
+  return data
@@ -0,0 +1,167 @@
+from definitions import FUNDRAISING_MAP, STARTUP_STATES_STATIC, STATE_CODES_STATIC as STATE_CODES
+from startup_static import Startup
+from cohort import StartupSummary, grid_points, outcome_analysis
+from random_streams import get_rng, cell_rngs
+import numpy as np
+
+# The cohort stores the state of every startup as one of the integer codes in STATE_CODES_STATIC rather than as a string
+END_STATES = (STATE_CODES['die'], STATE_CODES['series_a'])
+
+# The fundraising round that is pitched when a startup transitions into each of these states (see Startup.advance() and Startup.get_fundraising_round()).
+FUNDRAISING_STATES = {STATE_CODES['pre_seed']: 1, STATE_CODES['seed']: 2, STATE_CODES['series_a']: 3}
+
+# This helper checks a bitmask of visited states (or an array of them) for the given state
+def has_visited(visited, state):
+  return (visited & (1 << STATE_CODES[state])) != 0
+
+""" This function mirrors the valuation rules of Startup.pitch() for a startup of the given quality whose visited states are given by the bitmask visited. It returns (post_money, pct_sold) and broadcasts over arrays of quality and visited. Note that for the Series A the reference implementation only tests whether 'seed' was visited (the original check was "'pre_seed' and 'seed' in self.state_history"), and that behaviour is kept here so that every engine gives the same results.
+"""
+def pitch_terms(quality, visited, raise_round):
+  q = quality
+  if raise_round == 1:
+    post_money = (1 + 4 * q) * np.ones_like(visited, dtype = float)
+    pct_sold = .05 + .10 * (1 - q)
+  elif raise_round == 2:
+    post_money = np.where(has_visited(visited, 'pre_seed'), 10 + 10 * q, 5 + 10 * q)
+    pct_sold = .10 + .10 * (1 - q)
+  else:
+    seed = has_visited(visited, 'seed')
+    pre_seed_no_seed = has_visited(visited, 'pre_seed') & has_visited(visited, 'no_seed')
+    post_money = np.where(seed, 40 + 40 * q, np.where(pre_seed_no_seed, 25 + 40 * q, 20 + 40 * q))
+    pct_sold = .20 + .13 * (1 - q)
+  return post_money, pct_sold
+
+
+# This function returns the per startup outcomes that simulation_analysis() summarises from a dict of final arrays in the layout of StartupCohort.columns(), as the arrays (value, ownership, age, survived). The value is 0 for startups that did not survive to a Series A, and so is the ownership.
+def outcomes(columns):
+  survived = columns['state'] == STATE_CODES['series_a']
+  return np.where(survived, columns['value'], 0), np.where(survived, columns['pct_owned'], 0), columns['age'], survived
+
+
+# This function returns the statistics of a dict of final arrays in the same format as a cell of simulation_analysis()
+def cell_analysis(columns):
+  return outcome_analysis(*outcomes(columns))
+
+
+# The StartupCohort class holds N startups with the same quality and control preference as NumPy arrays and advances all of them at once. It follows the same state machine as startup_static.Startup, but each tick is one vectorized step over the startups that have not yet reached an end state.
+class StartupCohort:
+  def __init__(self, control_pref, quality, number_of_startups, rng = None):
+
+    # Build a reference Startup to validate the parameters and to get the transition matrix defined in Startup.__init__
+    reference = Startup(control_pref, quality)
+
+    self.control_pref = control_pref
+    self.quality = quality
+    self.size = number_of_startups
+    self.rng = get_rng(rng)
+
+    # Convert the transition matrix into cumulative probability rows in STARTUP_STATES_STATIC order. Sampling then only needs a single uniform draw per startup.
+    matrix = np.array([reference.get_transition_probabilities(state) for state in STARTUP_STATES_STATIC], dtype = float)
+    self.transition_matrix = matrix
+    self.cumulative_matrix = np.cumsum(matrix, axis = 1)
+    self.cumulative_matrix = self.cumulative_matrix / self.cumulative_matrix[:, -1:]
+
+    # Per startup arrays
+    self.state = np.full(number_of_startups, STATE_CODES['start'], dtype = np.uint8)
+    self.visited = np.full(number_of_startups, 1 << STATE_CODES['start'], dtype = np.uint8) # Bitmask of every state the startup has been in
+    self.age = np.zeros(number_of_startups, dtype = np.int64)
+    self.value = np.zeros(number_of_startups, dtype = float)
+    self.pct_owned = np.ones(number_of_startups, dtype = float) # Founder ownership
+    self.amt_raised = np.zeros(number_of_startups, dtype = float)
+
+    # Funding history for each round in FUNDRAISING_MAP. A pct_sold of 0 means the round was never raised.
+    self.pct_sold = np.zeros((number_of_startups, len(FUNDRAISING_MAP)), dtype = float)
+    self.post_money = np.zeros((number_of_startups, len(FUNDRAISING_MAP)), dtype = float)
+
+  def __len__(self):
+    return self.size
+
+  # Iterating over a cohort yields a StartupSummary for each startup so that the cohort can be consumed by simulation_analysis()
+  def __iter__(self):
+    for i in range(self.size):
+      yield self.summary(i)
+
+  def summary(self, i):
+    return StartupSummary(self.control_pref, self.quality, STARTUP_STATES_STATIC[self.state[i]], int(self.age[i]), float(self.value[i]), float(self.amt_raised[i]), float(self.pct_owned[i]))
+
+  # This function returns the final per startup results as a dict of arrays. It is a compact alternative to iterating over the cohort when the results need to be sent between processes or written to disk.
+  def columns(self):
+    return {'state': self.state, 'age': self.age, 'value': self.value, 'pct_owned': self.pct_owned, 'amt_raised': self.amt_raised, 'pct_sold': self.pct_sold, 'post_money': self.post_money}
+
+  # This function returns the per startup outcomes that simulation_analysis() summarises (see outcomes())
+  def outcomes(self):
+    return outcomes(self.columns())
+
+  # This function returns the (rounds x startups) cap table of the cohort, built from its funding history (see cap_table.cohort_cap_table())
+  def cap_table(self, check = 'all'):
+    from cap_table import cohort_cap_table
+    return cohort_cap_table(self.columns(), check)
+
+  # This function returns the statistics of the cohort in the same format as a cell of simulation_analysis(): [(avg. value, stdev), (avg. ownership %, stdev), (avg. age, stdev), % survived to series a]
+  def analysis(self):
+    return outcome_analysis(*self.outcomes())
+
+  # This function returns the indices of the startups that have not reached an end state
+  def active(self):
+    return np.flatnonzero((self.state != END_STATES[0]) & (self.state != END_STATES[1]))
+
+  # This function conducts the pitch for the startups in idx. It returns the arrays (pre_money, post_money, amt_raised, pct_sold).
+  def pitch(self, idx, raise_round):
+    post_money, pct_sold = pitch_terms(self.quality, self.visited[idx], raise_round)
+    post_money = np.broadcast_to(post_money, len(idx))
+    pct_sold = np.broadcast_to(pct_sold, len(idx))
+    amt_raised = post_money * pct_sold
+    pre_money = post_money - amt_raised
+    return pre_money, post_money, amt_raised, pct_sold
+
+  # This function updates the funding history and founder ownership of the startups in idx after a successful pitch. In the static model every pitch succeeds.
+  def update_funding(self, idx, raise_round, pitch):
+    pre_money, post_money, amt_raised, pct_sold = pitch
+    self.pct_sold[idx, raise_round] = pct_sold
+    self.post_money[idx, raise_round] = post_money
+    self.pct_owned[idx] = self.pct_owned[idx] * (1 - pct_sold)
+    self.value[idx] = post_money
+    self.amt_raised[idx] = self.amt_raised[idx] + amt_raised
+
+  # This function moves every active startup from its current state to the next state. It returns the number of startups that were advanced.
+  def advance(self):
+    idx = self.active()
+    if len(idx) == 0:
+      return 0
+
+    self.age[idx] = self.age[idx] + 1
+
+    # Sample the new states with one uniform draw per startup against the cumulative transition rows
+    u = self.rng.random(len(idx))
+    new_state = (u[:, None] >= self.cumulative_matrix[self.state[idx]]).sum(axis = 1).astype(np.uint8)
+
+    # Fundraise for the startups that transitioned into a fundraising state. The pitch is based on the history before the new state is recorded.
+    for code, raise_round in FUNDRAISING_STATES.items():
+      raising = idx[new_state == code]
+      if len(raising) > 0:
+        self.update_funding(raising, raise_round, self.pitch(raising, raise_round))
+
+    self.state[idx] = new_state
+    self.visited[idx] = self.visited[idx] | (np.uint8(1) << new_state)
+    return len(idx)
+
+
+# This is the cohort equivalent of simulate_static.simulate(). It advances the cohort until every startup has either raised a Series A or failed.
+def simulate_cohort(cohort):
+  while cohort.advance() > 0:
+    pass
+  return cohort
+
+
+# This function is the cohort equivalent of simulate_static.initialize_startup_matrix(). Each cell of the returned matrix is a simulated StartupCohort, which can be passed directly to simulation_analysis(). Each cell's random stream is spawned from seed in the same way as in parallel_sweep.parallel_startup_matrix(), so both give identical results for the same seed.
+def initialize_cohort_matrix(q_increment, cp_increment, number_of_startups, seed = None, common_random_numbers = False):
+  rngs = iter(cell_rngs(seed, len(grid_points(q_increment)) * len(grid_points(cp_increment)), common_random_numbers))
+
+  data = []
+  for quality in grid_points(q_increment):
+    row = []
+    for control_preference in grid_points(cp_increment):
+      row.append(simulate_cohort(StartupCohort(control_preference, quality, number_of_startups, next(rngs))))
+    data.append(row)
+
+  return data
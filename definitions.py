@@ -1,17 +1,45 @@
 import os
-import pandas as pd
+import numpy as np
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 DATA_DIR = BASE_DIR + '/data'
+CACHE_DIR = DATA_DIR + '/cache' # Default directory of the on-disk cell cache (see cell_cache.py)
 
 
 FUNDRAISING_MAP = {0: 'founding', 1: 'pre_seed', 2: 'seed', 3: 'series_a'}
 PRE_SEED_VALUE = 4.75 #UPDATE
 SEED_VALUE = 18 #UPDATE
-STARTUP_STATES = ['start', 'grow', 'live', 'die', 'pre_seed-success', 'pre_seed-fail', 'seed-success', 'seed-fail', 'series_a-success', 'series_a-fail']
+PCT_SOLD_RANGES = {1: (0.05, 0.15), 2: (0.10, 0.20), 3: (0.20, 0.33)} # Range of the uniform draw for the pct_sold in each round of the dynamic model
+STARTUP_STATES = ['start', 'grow', 'live', 'die', 'pre_seed-success', 'pre_seed-fail', 'seed-success', 'seed-fail', 'series_a-success', 'series_a-fail', 'censored'] # A startup is censored when its simulation is stopped at a maximum age or value (see Startup.censor())
 STARTUP_STATES_STATIC = ['start', 'die', 'pre_seed', 'no_pre_seed', 'seed', 'no_seed', 'series_a']
 
-FUNDING_HISTORY_INITIALIZER = pd.DataFrame.from_dict({FUNDRAISING_MAP[0]: [1, 0, 0.0, 0.0, 0.0, 0.0], FUNDRAISING_MAP[1]: [0, 1, 0, 0, 0, 0], FUNDRAISING_MAP[2]: [0, 2, 0, 0, 0, 0], FUNDRAISING_MAP[3]: [0, 3, 0, 0, 0, 0]}, orient = 'index', columns = ['active','round','pre_money','post_money','amt_raised','pct_sold'])
-CAP_TABLE_INITIALIZER = pd.DataFrame.from_dict({FUNDRAISING_MAP[0]: [1, 0, 1.0, 0], FUNDRAISING_MAP[1]: [0, 1, 0, 0], FUNDRAISING_MAP[2]: [0, 2, 0, 0], FUNDRAISING_MAP[3]: [0, 3, 0, 0]}, orient = 'index', columns = ['active','round','pct_owned','value'])
+# Trajectory recording policies of a Startup: no trajectory (final values only), only at pitches, every k ticks, or every tick
+RECORDING_MODES = ['off', 'events', 'every', 'full']
+
+# Integer codes of the states, used wherever states are stored or sampled as numbers rather than strings
+STATE_CODES = {state: code for code, state in enumerate(STARTUP_STATES)}
+STATE_CODES_STATIC = {state: code for code, state in enumerate(STARTUP_STATES_STATIC)}
+
+# Column layout of the funding history and cap table. A Startup stores both tables as NumPy arrays with one row per round in FUNDRAISING_MAP and these columns.
+FUNDING_HISTORY_COLUMNS = ['active','round','pre_money','post_money','amt_raised','pct_sold']
+CAP_TABLE_COLUMNS = ['active','round','pct_owned','value']
+FUNDING_HISTORY_ARRAY_INITIALIZER = np.array([[1, 0, 0.0, 0.0, 0.0, 0.0], [0, 1, 0, 0, 0, 0], [0, 2, 0, 0, 0, 0], [0, 3, 0, 0, 0, 0]], dtype = float)
+CAP_TABLE_ARRAY_INITIALIZER = np.array([[1, 0, 1.0, 0], [0, 1, 0, 0], [0, 2, 0, 0], [0, 3, 0, 0]], dtype = float)
+
+# The funding history and cap table initializers as pandas DataFrames. They are built from the arrays above the first time they are used (see __getattr__()), so that importing definitions does not import pandas.
+FRAME_INITIALIZERS = {'FUNDING_HISTORY_INITIALIZER': (FUNDING_HISTORY_ARRAY_INITIALIZER, FUNDING_HISTORY_COLUMNS), 'CAP_TABLE_INITIALIZER': (CAP_TABLE_ARRAY_INITIALIZER, CAP_TABLE_COLUMNS)}
+
+# Set the FUNDRAISING_DEBUG environment variable to 1 to drop into wat() when one of the checks of a Startup fails. wat is only imported then.
+DEBUG = os.environ.get('FUNDRAISING_DEBUG', '') == '1'
+
+
+def __getattr__(name):
+  if name in FRAME_INITIALIZERS:
+    import pandas as pd
+    array, columns = FRAME_INITIALIZERS[name]
+    frame = pd.DataFrame(array.copy(), index = [FUNDRAISING_MAP[r] for r in range(len(FUNDRAISING_MAP))], columns = columns).astype({'active': int, 'round': int})
+    globals()[name] = frame
+    return frame
+  raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
@@ -0,0 +1,136 @@
+from definitions import FUNDRAISING_MAP
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+import json
+
+# This module is the optional instrumentation of the simulations. A Profile collects per phase timers (the number of calls and the total time of each method of the Startup state machine, and of the initialize, simulate and analysis phases of a sweep) and counters (advance() calls, ticks, grow steps, cap table updates and pitches by round and outcome). Startups are instrumented by switching them to a subclass of their class whose methods are wrapped with timers (see profiled_class()), so a startup that is simulated without a Profile runs the plain methods and pays nothing for the instrumentation.
+
+# The methods of the Startup classes that are timed when they exist on the class. The times are inclusive, e.g. the time of advance() contains the time of pitch().
+TIMED_METHODS = ['advance', 'advance_grow_streak', 'try_pitch', 'sample_transition', 'grow', 'fundraise', 'pitch', 'update_funding', 'update_cap_table', 'record_trajectory', 'record_state']
+
+# The failed pitches of the static model are transitions to these states rather than calls to pitch(), so they are counted from the state after advance()
+FAILED_PITCH_STATES = {'no_pre_seed': 'pre_seed', 'no_seed': 'seed'}
+
+
+# The Profile class holds the timers and counters of one sweep
+class Profile:
+  def __init__(self):
+    self.timers = {} # name -> [calls, seconds]
+    self.counters = {}
+    self.classes = {} # Startup class -> its instrumented subclass
+
+  def add_time(self, name, seconds):
+    timer = self.timers.get(name)
+    if timer is None:
+      self.timers[name] = [1, seconds]
+    else:
+      timer[0] = timer[0] + 1
+      timer[1] = timer[1] + seconds
+
+  def count(self, name, k = 1):
+    self.counters[name] = self.counters.get(name, 0) + k
+
+  # This function times the body of a with statement as the phase name
+  @contextmanager
+  def timer(self, name):
+    start = perf_counter()
+    try:
+      yield self
+    finally:
+      self.add_time(name, perf_counter() - start)
+
+  # This function switches a startup to the instrumented subclass of its class, so that its methods report to this profile
+  def instrument(self, startup):
+    cls = type(startup)
+    if getattr(cls, 'profile', None) is not self:
+      # A startup instrumented for another profile is switched from its plain class
+      base = cls.__mro__[1] if getattr(cls, 'profile', None) is not None else cls
+      startup.__class__ = profiled_class(base, self)
+    return startup
+
+  # This function adds the timers and counters of another Profile (e.g. from another process) to this one
+  def merge(self, other):
+    for name, (calls, seconds) in other.timers.items():
+      timer = self.timers.setdefault(name, [0, 0.0])
+      timer[0] = timer[0] + calls
+      timer[1] = timer[1] + seconds
+    for name, k in other.counters.items():
+      self.count(name, k)
+    return self
+
+  def to_dict(self):
+    return {'timers': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in self.timers.items()}, 'counters': dict(self.counters)}
+
+  # This function writes the profile to a JSON file
+  def dump(self, path):
+    with open(path, 'w') as f:
+      json.dump(self.to_dict(), f, indent = 2)
+
+  # This function returns the profile as a text report, with the timers sorted by total time
+  def report(self):
+    lines = ['{:24} {:>12} {:>12} {:>14}'.format('phase', 'calls', 'seconds', 'us per call')]
+    for name, (calls, seconds) in sorted(self.timers.items(), key = lambda item: -item[1][1]):
+      lines.append('{:24} {:>12} {:>12.4f} {:>14.3f}'.format(name, calls, seconds, seconds / calls * 10**6))
+    lines.append('')
+    lines.append('{:24} {:>12}'.format('counter', 'count'))
+    for name in sorted(self.counters):
+      lines.append('{:24} {:>12}'.format(name, self.counters[name]))
+    return '\n'.join(lines)
+
+  def __repr__(self):
+    return self.report()
+
+
+# This helper returns a wrapper of a Startup method that adds its time to the profile and updates the counters of the method
+def timed_method(name, method, profile):
+  if name == 'advance':
+    def wrapper(self, *args):
+      start = perf_counter()
+      result = method(self, *args)
+      profile.add_time(name, perf_counter() - start)
+      profile.count('advance calls')
+      if self.state in FAILED_PITCH_STATES:
+        profile.count('pitch {} fail'.format(FAILED_PITCH_STATES[self.state]))
+      return result
+  elif name == 'advance_grow_streak':
+    def wrapper(self, *args):
+      start = perf_counter()
+      result = method(self, *args)
+      profile.add_time(name, perf_counter() - start)
+      profile.count('grow streaks')
+      # The streak returns its number of grow steps, which leaves out the closing pitch (a too early pitch calls grow(), which counts itself)
+      profile.count('grow steps', result)
+      return result
+  elif name == 'pitch':
+    def wrapper(self, *args):
+      start = perf_counter()
+      result = method(self, *args)
+      profile.add_time(name, perf_counter() - start)
+      profile.count('pitch {} {}'.format(FUNDRAISING_MAP[result[1]], 'success' if result[0] == 1 else 'fail'))
+      return result
+  else:
+    counter = {'grow': 'grow steps', 'update_cap_table': 'cap table updates'}.get(name)
+    def wrapper(self, *args):
+      start = perf_counter()
+      result = method(self, *args)
+      profile.add_time(name, perf_counter() - start)
+      if counter is not None:
+        profile.count(counter)
+      return result
+  wrapper.__name__ = name
+  return wrapper
+
+
+# This function returns the subclass of a Startup class whose methods in TIMED_METHODS report to profile. The subclass adds no slots, so an existing startup can be switched to it in place.
+def profiled_class(cls, profile):
+  if cls not in profile.classes:
+    methods = {name: timed_method(name, getattr(cls, name), profile) for name in TIMED_METHODS if hasattr(cls, name)}
+    methods['__slots__'] = ()
+    methods['profile'] = profile
+    profile.classes[cls] = type('Profiled' + cls.__name__, (cls,), methods)
+  return profile.classes[cls]
+
+
+# This helper times the body of a with statement as the phase name of profile, or does nothing if profile is None
+def phase(profile, name):
+  return profile.timer(name) if profile is not None else nullcontext()
@@ -0,0 +1,224 @@
+from definitions import FUNDRAISING_MAP, PCT_SOLD_RANGES, STARTUP_STATES, STATE_CODES
+from startup_dynamic import Startup
+from cohort_dynamic import PITCH_STATES, model_parameters, transition_probabilities
+from random_streams import get_rng, cumulative_probabilities
+from cap_table import DEFAULT_CHECK, check_interval
+import numpy as np
+
+# This module runs the dynamic model one startup at a time inside a compiled loop. The kernel is the state machine of startup_dynamic.Startup.advance() (grow, live, the pitch and the cap table dilution of update_cap_table()) written over plain scalars and small arrays, so that numba can compile it. It makes the same random draws in the same order as the Startup class, so for the same Generator it gives exactly the same startups. numba is optional: without it the same functions run as plain Python.
+
+try:
+  from numba import njit, uint64
+  from numba.experimental import jitclass
+  JIT_AVAILABLE = True
+except ImportError:
+  JIT_AVAILABLE = False
+  uint64 = None
+
+  # Without numba the kernel functions and classes are left as they are
+  def njit(*args, **kwargs):
+    if len(args) == 1 and callable(args[0]):
+      return args[0]
+    return lambda function: function
+
+  def jitclass(spec):
+    return lambda cls: cls
+
+# State codes used by the kernel. numba treats these module level values as compile time constants.
+START = STATE_CODES['start']
+GROW = STATE_CODES['grow']
+LIVE = STATE_CODES['live']
+DIE = STATE_CODES['die']
+SERIES_A_SUCCESS = STATE_CODES['series_a-success']
+CENSORED = STATE_CODES['censored']
+NUMBER_OF_ROUNDS = len(FUNDRAISING_MAP)
+
+# The constants of the SplitMix64 generator used by CounterStream
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+SHIFT_11 = np.uint64(11)
+SHIFT_27 = np.uint64(27)
+SHIFT_30 = np.uint64(30)
+SHIFT_31 = np.uint64(31)
+
+# The range of the pct_sold draw for each round, indexed by raise_round
+PCT_SOLD_LOW = np.array([0.0] + [PCT_SOLD_RANGES[r][0] for r in range(1, NUMBER_OF_ROUNDS)])
+PCT_SOLD_HIGH = np.array([0.0] + [PCT_SOLD_RANGES[r][1] for r in range(1, NUMBER_OF_ROUNDS)])
+
+# The max_age and max_value passed to the kernel when the startups are not censored
+NO_MAX_AGE = np.iinfo(np.int64).max
+NO_MAX_VALUE = np.inf
+
+
+# This function returns the compiled transition rows of Startup(control_pref, quality) as a (states x states) array of cumulative probabilities. live_prob overrides Startup.live_transition_prob() (see cohort_dynamic.transition_probabilities()).
+def transition_rows(control_pref, quality, live_prob = None):
+  reference = Startup(control_pref, quality, record = 'off')
+  if live_prob is None:
+    return np.array([reference.transition_rows[state] for state in STARTUP_STATES], dtype = float)
+  return np.array([cumulative_probabilities(row) for row in transition_probabilities(reference, live_prob)], dtype = float)
+
+
+# This function samples the state that follows state, in the same way as random_streams.sample_index()
+@njit(cache = True)
+def sample_state(cumulative, state, rng):
+  u = rng.random()
+  row = cumulative[state]
+  k = 0
+  while k < len(row) and row[k] <= u:
+    k = k + 1
+  return k
+
+
+# This function mirrors Startup.get_fundraising_round(), with the thresholds PRE_SEED_VALUE and SEED_VALUE passed in
+@njit(cache = True)
+def fundraising_round(value, current_round, pre_seed_value, seed_value):
+  if value < pre_seed_value and current_round < 1:
+    return 1
+  elif value < seed_value and value > pre_seed_value and current_round < 2:
+    return 2
+  elif value > seed_value and current_round < 3:
+    return 3
+  else:
+    return 4
+
+
+""" This function simulates one startup from the start state until it has raised a Series A or died, or until it reaches max_age or max_value, where it is censored as in simulate_dynamic.simulate() (NO_MAX_AGE and NO_MAX_VALUE turn the limits off). The funding history of the startup is written into the rows pct_sold and post_money, and cap_table is the PCT_OWNED column of its cap table (founders first), which must be passed in as [1, 0, 0, 0]. The sum-to-1 check of the cap table after each successful pitch is only made if check is True. It returns the tuple (state, age, value, amt_raised).
+"""
+@njit(cache = True)
+def simulate_startup(cumulative, value, growth_rate, pre_seed_value, seed_value, quality, rng, pct_sold, post_money, cap_table, max_age, max_value, check):
+  state = START
+  age = 0
+  current_round = 0
+  amt_raised = 0.0
+  while state != DIE and state != SERIES_A_SUCCESS:
+    if age >= max_age or value >= max_value:
+      state = CENSORED
+      break
+    if state == GROW:
+      age = age + 1
+      value = value * growth_rate
+      state = sample_state(cumulative, GROW, rng)
+    elif state == LIVE:
+      temp_state = sample_state(cumulative, LIVE, rng)
+      if temp_state == GROW:
+        state = GROW
+        continue
+      raise_round = fundraising_round(value, current_round, pre_seed_value, seed_value)
+      age = age + 1
+      if raise_round == 4:
+        # Too early to raise the next round: grow instead and draw a new state from the live row
+        value = value * growth_rate
+        state = sample_state(cumulative, LIVE, rng)
+        continue
+
+      # Pitch
+      sold = rng.uniform(PCT_SOLD_LOW[raise_round], PCT_SOLD_HIGH[raise_round])
+      post = value / (1 - sold)
+      raised = post * sold
+      success = rng.random() < quality
+      if success:
+        pct_sold[raise_round] = sold
+        post_money[raise_round] = post
+
+        # Dilute the earlier rounds and check that the ownership still adds up to 1
+        cap_table[raise_round] = sold
+        for r in range(raise_round):
+          cap_table[r] = cap_table[r] * (1 - sold)
+        if check:
+          total = 0.0
+          for r in range(len(cap_table)):
+            total = total + cap_table[r]
+          if not (1.0 - 10**-6 < total < 1.0 + 10**-6):
+            raise Exception('The total ownership should add up to 1.')
+
+        value = post
+        current_round = raise_round
+        amt_raised = amt_raised + raised
+      state = PITCH_STATES[raise_round, 1 if success else 0]
+    else:
+      state = sample_state(cumulative, state, rng)
+  return state, age, value, amt_raised
+
+
+# This function simulates every startup of a cohort inside one compiled loop, writing the results into the given arrays. The cap table of one startup in check_every is checked (none if check_every is 0, see cap_table.check_interval()).
+@njit(cache = True)
+def simulate_startups(cumulative, initial_value, growth_rate, pre_seed_value, seed_value, quality, rng, state, age, value, amt_raised, pct_owned, pct_sold, post_money, max_age, max_value, check_every):
+  cap_table = np.zeros(pct_sold.shape[1])
+  for i in range(len(state)):
+    cap_table[:] = 0.0
+    cap_table[0] = 1.0
+    state[i], age[i], value[i], amt_raised[i] = simulate_startup(cumulative, initial_value, growth_rate, pre_seed_value, seed_value, quality, rng, pct_sold[i], post_money[i], cap_table, max_age, max_value, check_every > 0 and i % check_every == 0)
+    pct_owned[i] = cap_table[0]
+
+
+# The CounterStream class is a counter based random stream with the random() and uniform() methods of a Generator that the kernel uses. Draw k of the stream with a given key is the kth output of SplitMix64 seeded with the key, so the stream can be restarted from the beginning by setting the counter back to 0. This is what lets simulate_variants() give a startup the same random draws under every set of parameters. Without numba the arithmetic wraps around as numpy uint64 scalars, which numpy reports as overflows, so callers suppress these with np.errstate(over = 'ignore').
+@jitclass([('key', uint64), ('counter', uint64)])
+class CounterStream:
+  def __init__(self, key):
+    self.key = np.uint64(key)
+    self.counter = np.uint64(0)
+
+  # This function returns the next 64 bit output of the stream
+  def next_uint64(self):
+    self.counter = self.counter + np.uint64(1)
+    z = self.key + self.counter * GOLDEN_GAMMA
+    z = (z ^ (z >> SHIFT_30)) * MIX_1
+    z = (z ^ (z >> SHIFT_27)) * MIX_2
+    return z ^ (z >> SHIFT_31)
+
+  def random(self):
+    return (self.next_uint64() >> SHIFT_11) * (1.0 / 9007199254740992.0)
+
+  def uniform(self, low, high):
+    return low + (high - low) * self.random()
+
+
+""" This function simulates every startup of a cell under several sets of parameters (variants) in one compiled loop. Startup i is simulated under every variant from the same CounterStream, restarted from keys[i] for each variant, so the variants see common random numbers startup by startup: a difference between the variants of a startup comes from the parameters and not from different random draws. The arrays cumulative (variants x states x states), growth_rate, pre_seed_value and seed_value hold the parameters of each variant, and the results are written into state, age, value and pct_owned (variants x startups). max_age and max_value censor the startups as in simulate_startups() (NO_MAX_AGE and NO_MAX_VALUE switch them off), and the cap tables of one startup in check_every are checked.
+"""
+@njit
+def simulate_variants(cumulative, initial_value, growth_rate, pre_seed_value, seed_value, quality, keys, state, age, value, pct_owned, max_age, max_value, check_every):
+  pct_sold = np.zeros(NUMBER_OF_ROUNDS)
+  post_money = np.zeros(NUMBER_OF_ROUNDS)
+  cap_table = np.zeros(NUMBER_OF_ROUNDS)
+  stream = CounterStream(keys[0])
+  for i in range(len(keys)):
+    for v in range(len(growth_rate)):
+      stream.key = keys[i]
+      stream.counter = np.uint64(0)
+      cap_table[:] = 0.0
+      cap_table[0] = 1.0
+      state[v, i], age[v, i], value[v, i], _ = simulate_startup(cumulative[v], initial_value, growth_rate[v], pre_seed_value[v], seed_value[v], quality, stream, pct_sold, post_money, cap_table, max_age, max_value, check_every > 0 and i % check_every == 0)
+      pct_owned[v, i] = cap_table[0]
+
+
+# This function simulates number_of_startups startups with the kernel and returns the final arrays in the layout of cohort_dynamic.StartupCohort.columns(). The startups are simulated one after the other from rng, so they match a list of Startup objects simulated in turn from the same Generator. parameters, max_age, max_value and check are as in cohort_dynamic.StartupCohort, with the rounds of FUNDRAISING_MAP.
+def simulate_kernel_cohort(control_pref, quality, number_of_startups, rng = None, parameters = None, max_age = None, max_value = None, check = DEFAULT_CHECK):
+  rng = get_rng(rng)
+  reference = Startup(control_pref, quality, record = 'off')
+  values = model_parameters(reference, parameters)
+  columns = {
+    'state': np.zeros(number_of_startups, dtype = np.uint8),
+    'age': np.zeros(number_of_startups, dtype = np.int64),
+    'value': np.zeros(number_of_startups, dtype = float),
+    'pct_owned': np.zeros(number_of_startups, dtype = float),
+    'amt_raised': np.zeros(number_of_startups, dtype = float),
+    'pct_sold': np.zeros((number_of_startups, NUMBER_OF_ROUNDS), dtype = float),
+    'post_money': np.zeros((number_of_startups, NUMBER_OF_ROUNDS), dtype = float),
+  }
+  simulate_startups(transition_rows(control_pref, quality, values['live_prob']), float(reference.value), float(values['growth_rate']), float(values['pre_seed_value']), float(values['seed_value']), float(quality), rng, columns['state'], columns['age'], columns['value'], columns['amt_raised'], columns['pct_owned'], columns['pct_sold'], columns['post_money'], NO_MAX_AGE if max_age is None else int(max_age), NO_MAX_VALUE if max_value is None else float(max_value), check_interval(check))
+  return columns
+
+
+# This function checks that the kernel gives exactly the same startups as the reference Startup class (simulated step by step with simulate_dynamic.simulate()) for a fixed seed and the same max_age and max_value. It raises an Exception on the first startup that differs and returns the number of startups checked.
+def cross_check(control_pref, quality, number_of_startups, seed = 0, max_age = None, max_value = None):
+  from simulate_dynamic import simulate
+  columns = simulate_kernel_cohort(control_pref, quality, number_of_startups, np.random.default_rng(seed), max_age = max_age, max_value = max_value)
+  rng = np.random.default_rng(seed)
+  for i in range(number_of_startups):
+    startup = simulate(Startup(control_pref, quality, rng, record = 'off'), max_age = max_age, max_value = max_value)
+    expected = (STATE_CODES[startup.state], startup.age, startup.value, startup.amt_raised, startup.pct_owned)
+    kernel = (columns['state'][i], columns['age'][i], columns['value'][i], columns['amt_raised'][i], columns['pct_owned'][i])
+    if expected[:2] != kernel[:2] or not np.allclose(expected[2:], kernel[2:], rtol = 10**-12, atol = 0):
+      raise Exception('Startup {} of the kernel does not match the reference Startup for control preference {}, quality {} and seed {}. Reference: {}, kernel: {}'.format(i, control_pref, quality, seed, expected, kernel))
+  return number_of_startups
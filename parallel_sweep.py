@@ -0,0 +1,87 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from cohort import grid_points
+from random_streams import cell_seed_sequences
+import numpy as np
+import os
+
+# This module runs the quality x control preference sweep of initialize_startup_matrix() on a pool of worker processes. Each cell is simulated with the cohort engine of the chosen model, and workers only send back compact per cell results (the simulation_analysis() cell or the final arrays of the cohort) rather than pickled Startup objects.
+
+MODELS = ['static', 'dynamic']
+
+
+# This helper returns the cohort module for a model name. It is imported in the worker so that the parent does not need to import both models.
+def cohort_module(model):
+  if model == 'static':
+    import cohort_static
+    return cohort_static
+  elif model == 'dynamic':
+    import cohort_dynamic
+    return cohort_dynamic
+  else:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(MODELS, model))
+
+
+# This function is run by a worker process. It simulates a chunk of cells, where each cell is a tuple (i, j, quality, control_pref, number_of_startups, seed_sequence), and returns a list of (i, j, result) tuples. The result is the cell of simulation_analysis() if output is 'analysis', or the dict of final arrays from StartupCohort.columns() if output is 'arrays'. max_age and max_value censor the startups of the dynamic model (see simulate_dynamic.simulate()).
+def simulate_cells(model, cells, output = 'analysis', max_age = None, max_value = None):
+  module = cohort_module(model)
+  limits = {} if max_age is None and max_value is None else {'max_age': max_age, 'max_value': max_value}
+  results = []
+  for i, j, quality, control_pref, number_of_startups, seed_sequence in cells:
+    cohort = module.simulate_cohort(module.StartupCohort(control_pref, quality, number_of_startups, np.random.default_rng(seed_sequence), **limits))
+    results.append((i, j, cohort.analysis() if output == 'analysis' else cohort.columns()))
+  return results
+
+
+""" This function is the multi-process equivalent of initialize_startup_matrix() followed by simulation_analysis(). It returns a matrix (a list of lists indexed by quality and then control preference) with one result per cell. The parameters are:
+  model: 'static' or 'dynamic'
+  q_increment, cp_increment: the grid increments
+  number_of_startups: the number of startups simulated in each cell
+  workers: the number of worker processes (defaults to the number of cores). With 0 the cells are simulated in this process.
+  chunksize: the number of cells sent to a worker at a time
+  progress: an optional callback, called as progress(cells_done, total_cells) each time a chunk finishes
+  seed: the seed of the SeedSequence that each cell's random stream is spawned from. The same seed gives the same results whatever the number of workers or the chunk size, and the same results as the serial initialize_cohort_matrix().
+  common_random_numbers: give every cell the same random stream (see random_streams.cell_seed_sequences())
+  output: 'analysis' for the cells of simulation_analysis(), or 'arrays' for the final arrays of each cohort
+  max_age, max_value: stop the startups that reach this age or value before an end state and count them as censored (dynamic model only, see simulate_dynamic.simulate())
+"""
+def parallel_startup_matrix(model, q_increment, cp_increment, number_of_startups, workers = None, chunksize = 1, progress = None, seed = None, common_random_numbers = False, output = 'analysis', max_age = None, max_value = None):
+
+  if model not in MODELS:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(MODELS, model))
+  if output not in ['analysis', 'arrays']:
+    raise Exception('The output must be either analysis or arrays. The output supplied was: {}'.format(output))
+  if model == 'static' and (max_age is not None or max_value is not None):
+    raise Exception('The static model always reaches an end state within a few ticks, so it cannot be censored. The max_age and max_value supplied were: {}, {}'.format(max_age, max_value))
+
+  qualities = grid_points(q_increment)
+  control_prefs = grid_points(cp_increment)
+
+  # Give every cell its own random stream
+  seed_sequences = cell_seed_sequences(seed, len(qualities) * len(control_prefs), common_random_numbers)
+  cells = []
+  for i, quality in enumerate(qualities):
+    for j, control_pref in enumerate(control_prefs):
+      cells.append((i, j, quality, control_pref, number_of_startups, seed_sequences[i * len(control_prefs) + j]))
+
+  data = [[None] * len(control_prefs) for _ in qualities]
+  chunks = [cells[k:k + chunksize] for k in range(0, len(cells), chunksize)]
+  done = 0
+  if workers == 0:
+    for chunk in chunks:
+      for i, j, result in simulate_cells(model, chunk, output, max_age, max_value):
+        data[i][j] = result
+        done = done + 1
+      if progress is not None:
+        progress(done, len(cells))
+    return data
+
+  with ProcessPoolExecutor(max_workers = workers or os.cpu_count()) as executor:
+    futures = [executor.submit(simulate_cells, model, chunk, output, max_age, max_value) for chunk in chunks]
+    for future in as_completed(futures):
+      for i, j, result in future.result():
+        data[i][j] = result
+        done = done + 1
+      if progress is not None:
+        progress(done, len(cells))
+
+  return data
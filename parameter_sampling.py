@@ -0,0 +1,257 @@
+from cohort import grid_points
+from parallel_sweep import MODELS, cohort_module
+from random_streams import cell_seed_sequences
+import numpy as np
+
+# This module is a sampling alternative to the quality x control preference grid sweeps. Instead of simulating many startups in every cell of an np.arange grid, it draws (quality, control preference) points from a space filling design (a scrambled Sobol sequence or a Latin hypercube), simulates a few startups at each point and fits a smooth surrogate of the four metrics of plot_analysis() (value, ownership, age and survival). The surrogate is evaluated on a grid, so the result has the layout of simulation_analysis() and can be plotted or compared with a grid sweep as it is.
+
+DESIGNS = ['sobol', 'lhs', 'random']
+SURROGATES = ['kernel', 'binned']
+METRICS = ['value', 'ownership', 'age', 'survived']
+
+# The models whose startups never pitch at control_pref = 1 (the pitch probability is 1 - control_pref), so that their surface jumps at that edge of [0, 1]^2
+PITCHLESS_AT_FULL_CONTROL = ['dynamic']
+
+# The number of bits of the Sobol points
+SOBOL_BITS = 32
+
+
+# This function returns the direction numbers of the first two dimensions of the Sobol sequence, as integers of SOBOL_BITS bits. The first dimension is the van der Corput sequence in base 2, and the second uses the primitive polynomial x + 1 (m_k = 2 m_(k-1) xor m_(k-1), m_1 = 1).
+def sobol_directions():
+  directions = np.zeros((2, SOBOL_BITS), dtype = np.uint64)
+  m = 1
+  for k in range(SOBOL_BITS):
+    if k > 0:
+      m = (2 * m) ^ m
+    directions[0, k] = 1 << (SOBOL_BITS - 1 - k)
+    directions[1, k] = m << (SOBOL_BITS - 1 - k)
+  return directions
+
+
+# This function returns the first number_of_points points of the two dimensional Sobol sequence in [0, 1)^2. With an rng the points are scrambled with a random digital shift, which keeps the balance of the sequence but removes the point at the origin and makes repeated designs independent. The balance properties hold exactly when number_of_points is a power of 2.
+def sobol_points(number_of_points, rng = None):
+  directions = sobol_directions()
+  index = np.arange(number_of_points, dtype = np.uint64)
+  x = np.zeros((number_of_points, 2), dtype = np.uint64)
+  for k in range(SOBOL_BITS):
+    bit = (index >> np.uint64(k)) & np.uint64(1)
+    x = x ^ (bit[:, None] * directions[:, k])
+  if rng is not None:
+    x = x ^ rng.integers(0, 2**SOBOL_BITS, size = 2, dtype = np.uint64)
+  return x / float(2**SOBOL_BITS)
+
+
+# This function returns a Latin hypercube of number_of_points points in [0, 1)^2: each dimension is cut into number_of_points equal strata, and every stratum holds exactly one point
+def latin_hypercube(number_of_points, rng):
+  strata = np.column_stack([rng.permutation(number_of_points) for _ in range(2)])
+  return (strata + rng.random((number_of_points, 2))) / number_of_points
+
+
+# This function returns the (quality, control preference) points of a design as an array with one row per point. The points are in [0, 1]^2 (the range of the grid sweeps).
+def sample_design(design, number_of_points, rng):
+  if design == 'sobol':
+    return sobol_points(number_of_points, rng)
+  elif design == 'lhs':
+    return latin_hypercube(number_of_points, rng)
+  elif design == 'random':
+    return rng.random((number_of_points, 2))
+  else:
+    raise Exception('The design must be one of {}. The design supplied was: {}'.format(DESIGNS, design))
+
+
+# This helper returns the final arrays of number_of_startups startups at (control_pref, quality), in the layout of StartupCohort.columns(). engine is 'cohort' for the vectorized cohort of the model, or 'kernel' for the compiled kernel of the dynamic model.
+def simulate_point(model, control_pref, quality, number_of_startups, rng, engine):
+  if engine == 'kernel':
+    from kernel_dynamic import simulate_kernel_cohort
+    return simulate_kernel_cohort(control_pref, quality, number_of_startups, rng)
+  module = cohort_module(model)
+  return module.simulate_cohort(module.StartupCohort(control_pref, quality, number_of_startups, rng)).columns()
+
+
+""" This function simulates startups_per_point startups at each point of a design and returns the samples as a dict of arrays with one entry per point:
+  quality, control_pref: the parameters of the point
+  count: the number of startups simulated at the point
+  <metric>_sum, <metric>_squares: the sum and the sum of squares of each metric (value, ownership, age and survived, as in the outcomes() function of the cohort modules) over the startups of the point
+  censored_sum: the number of censored startups at the point, for a model that can be censored (one whose cohort module has CENSORED)
+The parameters are:
+  model: 'static' or 'dynamic'
+  points: an array of (quality, control preference) rows, e.g. from sample_design()
+  startups_per_point: the number of startups simulated at each point
+  seed: the seed of the SeedSequence that each point's random stream is spawned from
+  engine: 'cohort' or 'kernel' (dynamic model only). By default the dynamic model uses the kernel if numba is installed, since a cohort of a few startups is dominated by the per tick overhead of the cohort.
+"""
+def simulate_design(model, points, startups_per_point, seed = None, engine = None):
+  if model not in MODELS:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(MODELS, model))
+  if engine is None:
+    engine = 'cohort'
+    if model == 'dynamic':
+      from kernel_dynamic import JIT_AVAILABLE
+      engine = 'kernel' if JIT_AVAILABLE else 'cohort'
+  if engine not in ['cohort', 'kernel'] or (engine == 'kernel' and model != 'dynamic'):
+    raise Exception('The engine must be cohort, or kernel for the dynamic model. The engine supplied was: {}'.format(engine))
+
+  points = np.asarray(points, dtype = float)
+  module = cohort_module(model)
+  samples = {'quality': points[:, 0].copy(), 'control_pref': points[:, 1].copy(), 'count': np.full(len(points), startups_per_point, dtype = float)}
+  for metric in METRICS:
+    samples[metric + '_sum'] = np.zeros(len(points))
+    samples[metric + '_squares'] = np.zeros(len(points))
+  censored = getattr(module, 'CENSORED', None)
+  if censored is not None:
+    samples['censored_sum'] = np.zeros(len(points))
+
+  for k, seed_sequence in enumerate(cell_seed_sequences(seed, len(points))):
+    columns = simulate_point(model, points[k, 1], points[k, 0], startups_per_point, np.random.default_rng(seed_sequence), engine)
+    for metric, x in zip(METRICS, module.outcomes(columns)):
+      x = np.asarray(x, dtype = float)
+      samples[metric + '_sum'][k] = x.sum()
+      samples[metric + '_squares'][k] = (x * x).sum()
+    if censored is not None:
+      samples['censored_sum'][k] = (columns['state'] == censored).sum()
+  return samples
+
+
+# This helper returns the analysis matrix of simulation_analysis() from per grid point arrays of the pooled count, mean and second moment of each metric (each of shape (qualities, control preferences)). censored is the array of the share of censored startups, which is added to every cell, or None for a model that is never censored.
+def surface_matrix(count, means, second_moments, censored = None):
+  matrix = []
+  for i in range(count.shape[0]):
+    row = []
+    for j in range(count.shape[1]):
+      cell = []
+      for metric in METRICS[:3]:
+        # Pooled variance of the startups around the mean, with the ddof = 1 correction of statistics.stdev()
+        variance = max(second_moments[metric][i, j] - means[metric][i, j]**2, 0.0)
+        n = count[i, j]
+        cell.append((means[metric][i, j], np.sqrt(variance * n / (n - 1)) if n > 1 else np.nan))
+      cell.append(means['survived'][i, j])
+      if censored is not None:
+        cell.append(censored[i, j])
+      row.append(cell)
+    matrix.append(row)
+  return matrix
+
+
+# This function returns the binned surrogate of the samples on the grid of (qualities, control_prefs): every point is pooled into the grid cell whose centre is nearest, so a cell holds the startups of the points within half an increment of it. Cells without points are NaN.
+def binned_surface(samples, qualities, control_prefs):
+  def nearest(x, grid):
+    return np.abs(x[:, None] - grid[None, :]).argmin(axis = 1)
+  cells = nearest(samples['quality'], qualities) * len(control_prefs) + nearest(samples['control_pref'], control_prefs)
+  shape = (len(qualities), len(control_prefs))
+  size = shape[0] * shape[1]
+
+  count = np.bincount(cells, weights = samples['count'], minlength = size)
+  means = {}
+  second_moments = {}
+  with np.errstate(invalid = 'ignore', divide = 'ignore'):
+    for metric in METRICS:
+      means[metric] = (np.bincount(cells, weights = samples[metric + '_sum'], minlength = size) / count).reshape(shape)
+      second_moments[metric] = (np.bincount(cells, weights = samples[metric + '_squares'], minlength = size) / count).reshape(shape)
+    censored = (np.bincount(cells, weights = samples['censored_sum'], minlength = size) / count).reshape(shape) if 'censored_sum' in samples else None
+  return surface_matrix(count.reshape(shape), means, second_moments, censored)
+
+
+""" This function returns the kernel smoothed surrogate of the samples on the grid of (qualities, control_prefs). Each metric is fit with a local linear regression of the point means, weighted by a Gaussian kernel of the distance to the grid point and by the number of startups at each point. The local linear fit, unlike a kernel weighted average, has no bias from the slope of the surface at the edges of [0, 1]^2, where every neighbour lies on one side. The stdev is the spread of the startups around the kernel weighted mean.
+  bandwidth: the standard deviation of the kernel, in units of quality and control preference. A pair gives separate bandwidths for quality and control preference.
+The survival rate and the ownership are clipped to [0, 1], and the value and the age to be non negative, since the linear fit can overshoot near steep edges. A jump in the surface is smoothed over a bandwidth, and so are the rare very large values of the dynamic model, which is why sampled_startup_matrix() keeps the design of the dynamic model away from its edge control_pref = 1 and simulates that edge on its own.
+"""
+def kernel_surface(samples, qualities, control_prefs, bandwidth = 0.1):
+  bandwidth = np.broadcast_to(np.asarray(bandwidth, dtype = float), (2,))
+  grid_q, grid_cp = np.meshgrid(qualities, control_prefs, indexing = 'ij')
+  grid_q = grid_q.ravel()
+  grid_cp = grid_cp.ravel()
+
+  # Offsets of every point from every grid point, in units of the bandwidth
+  dq = (samples['quality'][None, :] - grid_q[:, None]) / bandwidth[0]
+  dcp = (samples['control_pref'][None, :] - grid_cp[:, None]) / bandwidth[1]
+  weights = np.exp(-0.5 * (dq**2 + dcp**2)) * samples['count'][None, :]
+  total = weights.sum(axis = 1)
+
+  # Weighted least squares of each metric on (1, dq, dcp) at every grid point. The small ridge on the slopes keeps the fit defined where the kernel only reaches a point or two, and then the fit falls back to the kernel weighted mean.
+  design = np.stack([np.ones_like(dq), dq, dcp], axis = 2)
+  gram = np.einsum('gp,gpa,gpb->gab', weights, design, design)
+  gram = gram + np.eye(3)[None, :, :] * np.array([0.0, 1.0, 1.0])[None, :, None] * 10**-9 * total[:, None, None]
+  count = samples['count']
+  point_means = np.column_stack([samples[metric + '_sum'] / count for metric in METRICS])
+  moments = np.einsum('gp,gpa,pm->gam', weights, design, point_means)
+  coefficients = np.linalg.solve(gram, moments)
+
+  shape = (len(qualities), len(control_prefs))
+  means = {}
+  second_moments = {}
+  limits = {'value': (0, None), 'ownership': (0, 1), 'age': (0, None), 'survived': (0, 1)}
+  for k, metric in enumerate(METRICS):
+    means[metric] = np.clip(coefficients[:, 0, k], *limits[metric]).reshape(shape)
+    mean = weights @ (samples[metric + '_sum'] / count) / total
+    second_moment = weights @ (samples[metric + '_squares'] / count) / total
+    # surface_matrix() subtracts the square of the fitted mean, so the variance it finds is the spread around the kernel weighted mean
+    second_moments[metric] = (second_moment - mean**2 + means[metric].ravel()**2).reshape(shape)
+
+  # The effective number of startups behind each grid point (Kish), used for the ddof correction of the stdev
+  effective = (total**2 / (weights**2 / count[None, :]).sum(axis = 1)).reshape(shape)
+
+  # The share of censored startups is the kernel weighted mean, which stays within [0, 1]
+  censored = (weights @ (samples['censored_sum'] / count) / total).reshape(shape) if 'censored_sum' in samples else None
+  return surface_matrix(effective, means, second_moments, censored)
+
+
+# This function returns the (quality, control preference) of the cells on the edges of the grid (the first and last quality and control preference), leaving out the control preference columns in skip
+def edge_points(qualities, control_prefs, skip = ()):
+  return [(quality, control_pref) for i, quality in enumerate(qualities) for j, control_pref in enumerate(control_prefs) if j not in skip and (i in (0, len(qualities) - 1) or j in (0, len(control_prefs) - 1))]
+
+
+# This helper returns one cell of simulation_analysis() for each point of samples (see simulate_design()), from the startups simulated at that point alone
+def point_cells(samples):
+  count = samples['count'][None, :]
+  means = {metric: samples[metric + '_sum'][None, :] / count for metric in METRICS}
+  second_moments = {metric: samples[metric + '_squares'][None, :] / count for metric in METRICS}
+  censored = samples['censored_sum'][None, :] / count if 'censored_sum' in samples else None
+  return surface_matrix(count, means, second_moments, censored)[0]
+
+
+""" This function is the sampling equivalent of initialize_startup_matrix() followed by simulation_analysis(). It returns the surrogate as an analysis matrix (a list of lists indexed by quality and then control preference), e.g. for plot_analysis(). The parameters are:
+  model: 'static' or 'dynamic'
+  q_increment, cp_increment: the increments of the grid the surrogate is evaluated on. They set the resolution of the output, and the number of edge cells.
+  number_of_points: the number of (quality, control preference) points of the design. Sobol designs are best balanced when it is a power of 2.
+  startups_per_point: the number of startups simulated at each point
+  design: 'sobol', 'lhs' or 'random'
+  surrogate: 'kernel' (see kernel_surface()) or 'binned' (see binned_surface())
+  bandwidth: the bandwidth of the kernel surrogate
+  seed: the seed of the design and of the random streams of the points
+  engine: as in simulate_design()
+  edge_startups: the number of startups simulated at each cell on the edges of the grid (defaults to about as many as the design spends per grid cell)
+A surrogate of the design alone has to extrapolate to the edges of the grid, where every point lies on one side, so the cells on the edges are also simulated directly and added to the samples as points of their own. The startups of the dynamic model never pitch at control_pref = 1 (see PITCHLESS_AT_FULL_CONTROL), and their values grow without bound as control_pref approaches 1, so nothing can be carried across that edge: the control_pref = 1 column is then taken from its own startups alone, and the design only covers control preferences up to half way between the last two columns of the grid.
+"""
+def sampled_startup_matrix(model, q_increment, cp_increment, number_of_points = 256, startups_per_point = 4, design = 'sobol', surrogate = 'kernel', bandwidth = 0.1, seed = None, engine = None, edge_startups = None):
+  if surrogate not in SURROGATES:
+    raise Exception('The surrogate must be one of {}. The surrogate supplied was: {}'.format(SURROGATES, surrogate))
+  if number_of_points < 1 or startups_per_point < 1:
+    raise Exception('At least one point and one startup per point are needed. The values supplied were: {} and {}'.format(number_of_points, startups_per_point))
+  qualities = grid_points(q_increment)
+  control_prefs = grid_points(cp_increment)
+  if edge_startups is None:
+    edge_startups = max(startups_per_point, int(round(number_of_points * startups_per_point / (len(qualities) * len(control_prefs)))))
+  if edge_startups < 1:
+    raise Exception('At least one startup per edge cell is needed. The number supplied was: {}'.format(edge_startups))
+  # The control preference columns at 1 that are simulated on their own
+  pitchless = [j for j, control_pref in enumerate(control_prefs) if model in PITCHLESS_AT_FULL_CONTROL and control_pref >= 1 - 10**-9]
+
+  design_sequence, points_sequence, edge_sequence, pitchless_sequence = cell_seed_sequences(seed, 4)
+  points = sample_design(design, number_of_points, np.random.default_rng(design_sequence))
+  if pitchless and len(control_prefs) > 1:
+    points[:, 1] = points[:, 1] * (control_prefs[-2] + control_prefs[-1]) / 2
+  samples = simulate_design(model, points, startups_per_point, points_sequence, engine)
+  edge_samples = simulate_design(model, edge_points(qualities, control_prefs, pitchless), edge_startups, edge_sequence, engine)
+  samples = {key: np.concatenate([samples[key], edge_samples[key]]) for key in samples}
+
+  if surrogate == 'kernel':
+    matrix = kernel_surface(samples, qualities, control_prefs, bandwidth)
+  else:
+    matrix = binned_surface(samples, qualities, control_prefs)
+
+  if pitchless:
+    cells = [(i, j) for i in range(len(qualities)) for j in pitchless]
+    pitchless_samples = simulate_design(model, [(qualities[i], control_prefs[j]) for i, j in cells], edge_startups, pitchless_sequence, engine)
+    for (i, j), cell in zip(cells, point_cells(pitchless_samples)):
+      matrix[i][j] = cell
+  return matrix
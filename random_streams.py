@@ -0,0 +1,47 @@
+from bisect import bisect_right
+import numpy as np
+
+# This module holds the helpers that hand out numpy.random.Generator objects to the simulations. Every random draw in the Startup classes and the cohort engines comes from an explicit Generator, and the sweeps derive one stream per (quality, control preference) cell from a single seed with SeedSequence spawning, so a sweep is reproducible whatever order or process its cells are simulated in.
+
+_default_rng = None
+
+
+# This function returns rng if it is supplied, and otherwise a process wide default Generator. The default is seeded from the operating system the first time it is needed, so runs that do not pass a seed are still random.
+def get_rng(rng = None):
+  global _default_rng
+  if rng is not None:
+    return rng
+  if _default_rng is None:
+    _default_rng = np.random.default_rng()
+  return _default_rng
+
+
+# This function returns one SeedSequence per grid cell, spawned from seed. With common_random_numbers every cell gets the same stream, so the startups of different cells start from the same random draws and the differences between cells (e.g. between control preferences) have lower variance.
+def cell_seed_sequences(seed, number_of_cells, common_random_numbers = False):
+  root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+  if common_random_numbers:
+    shared = root.spawn(1)[0]
+    return [shared] * number_of_cells
+  return root.spawn(number_of_cells)
+
+
+# This function returns one Generator per grid cell (see cell_seed_sequences())
+def cell_rngs(seed, number_of_cells, common_random_numbers = False):
+  return [np.random.default_rng(seed_sequence) for seed_sequence in cell_seed_sequences(seed, number_of_cells, common_random_numbers)]
+
+
+# This function turns a row of transition probabilities into cumulative probabilities, normalised so that the last entry is exactly 1. A state can then be sampled with a single uniform draw (see sample_index()), and states with zero probability can never be drawn.
+def cumulative_probabilities(probs):
+  total = float(sum(probs))
+  row = []
+  running = 0.0
+  for p in probs:
+    running = running + p
+    row.append(running / total)
+  row[-1] = 1.0
+  return row
+
+
+# This function returns the index sampled from a row of cumulative probabilities with one uniform draw from rng
+def sample_index(cumulative_row, rng):
+  return bisect_right(cumulative_row, rng.random())
@@ -0,0 +1,132 @@
+from definitions import FUNDRAISING_MAP, STARTUP_STATES, STARTUP_STATES_STATIC, FUNDING_HISTORY_COLUMNS
+from cohort import grid_points
+from cap_table import DEFAULT_LADDER
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# This module stores the results of a sweep as a columnar table with one row per simulated startup. Rows are written in chunks (one Parquet row group or Arrow record batch per write), so a sweep can be written while it runs and analysed or plotted again later without re-simulating it or holding it all in memory.
+
+FORMATS = ['parquet', 'arrow']
+STATES = {'static': STARTUP_STATES_STATIC, 'dynamic': STARTUP_STATES}
+
+# The rounds that get pct_sold and post_money columns by default (every round in FUNDRAISING_MAP after founding)
+ROUNDS = [FUNDRAISING_MAP[r] for r in range(1, len(FUNDRAISING_MAP))]
+
+
+# This function returns the schema of the results table for a model. The final state is dictionary encoded with the state names of the model. Every round of ladder (a cap_table.RoundLadder, by default the rounds of FUNDRAISING_MAP) after founding gets pct_sold and post_money columns; only the dynamic model can be simulated over another ladder (see cohort_dynamic.StartupCohort).
+def results_schema(model, ladder = None):
+  if model not in STATES:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(list(STATES), model))
+  ladder = DEFAULT_LADDER if ladder is None else ladder
+  if model == 'static' and ladder.names != DEFAULT_LADDER.names:
+    raise Exception('The static model only raises the rounds of FUNDRAISING_MAP. The ladder supplied was: {}'.format(ladder))
+  fields = [('quality', pa.float64()), ('control_pref', pa.float64()), ('state', pa.dictionary(pa.int8(), pa.string())), ('age', pa.int64()), ('value', pa.float64()), ('pct_owned', pa.float64()), ('amt_raised', pa.float64())]
+  for name in ladder.names[1:]:
+    fields.append((name + '_pct_sold', pa.float64()))
+    fields.append((name + '_post_money', pa.float64()))
+  return pa.schema(fields, metadata = {'model': model})
+
+
+# This function converts a list of simulated Startup objects into the column layout returned by StartupCohort.columns()
+def startup_columns(startups, model):
+  codes = {state: code for code, state in enumerate(STATES[model])}
+  pct_sold = FUNDING_HISTORY_COLUMNS.index('pct_sold')
+  post_money = FUNDING_HISTORY_COLUMNS.index('post_money')
+  return {
+    'state': np.array([codes[s.state] for s in startups], dtype = np.uint8),
+    'age': np.array([s.age for s in startups], dtype = np.int64),
+    'value': np.array([s.value for s in startups], dtype = float),
+    'pct_owned': np.array([s.pct_owned for s in startups], dtype = float),
+    'amt_raised': np.array([s.amt_raised for s in startups], dtype = float),
+    'pct_sold': np.array([s.funding_history[:, pct_sold] for s in startups], dtype = float).reshape(len(startups), len(FUNDRAISING_MAP)),
+    'post_money': np.array([s.funding_history[:, post_money] for s in startups], dtype = float).reshape(len(startups), len(FUNDRAISING_MAP)),
+  }
+
+
+# The ResultsWriter class appends chunks of per startup results to a Parquet or Arrow IPC file. Use it as a context manager, or call close() when the sweep is done. ladder is the RoundLadder of the results, which must be the ladder of every cohort written.
+class ResultsWriter:
+  def __init__(self, path, model, format = 'parquet', ladder = None):
+    if format not in FORMATS:
+      raise Exception('The format must be one of {}. The format supplied was: {}'.format(FORMATS, format))
+    self.path = path
+    self.model = model
+    self.format = format
+    self.ladder = DEFAULT_LADDER if ladder is None else ladder
+    self.schema = results_schema(model, self.ladder)
+    self.rows = 0
+    if format == 'parquet':
+      self.writer = pq.ParquetWriter(path, self.schema)
+    else:
+      self.sink = pa.OSFile(path, 'wb')
+      self.writer = pa.ipc.new_file(self.sink, self.schema)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  # This function writes one chunk for the startups of a single (quality, control preference) cell, given as a dict of arrays in the layout of StartupCohort.columns()
+  def write_columns(self, quality, control_pref, columns):
+    n = len(columns['state'])
+    if columns['pct_sold'].shape[1] != len(self.ladder):
+      raise Exception('The results have a funding history of {} rounds, but the ladder of the file has {}. The ladder of the file is: {}'.format(columns['pct_sold'].shape[1], len(self.ladder), self.ladder))
+    arrays = [pa.array(np.full(n, quality, dtype = float)), pa.array(np.full(n, control_pref, dtype = float)), pa.DictionaryArray.from_arrays(pa.array(columns['state'].astype(np.int8)), STATES[self.model]), pa.array(columns['age'], type = pa.int64())]
+    arrays = arrays + [pa.array(columns[key], type = pa.float64()) for key in ['value', 'pct_owned', 'amt_raised']]
+    for r in range(1, len(self.ladder)):
+      arrays.append(pa.array(np.ascontiguousarray(columns['pct_sold'][:, r]), type = pa.float64()))
+      arrays.append(pa.array(np.ascontiguousarray(columns['post_money'][:, r]), type = pa.float64()))
+    self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema = self.schema))
+    self.rows = self.rows + n
+
+  # This function writes a simulated StartupCohort
+  def write_cohort(self, cohort):
+    ladder = getattr(cohort, 'ladder', DEFAULT_LADDER)
+    if ladder.names != self.ladder.names:
+      raise Exception('The cohort was simulated over a different ladder than the file. The ladder of the cohort is {} and the ladder of the file is {}'.format(ladder, self.ladder))
+    self.write_columns(cohort.quality, cohort.control_pref, cohort.columns())
+
+  # This function writes a list of simulated Startup objects from one cell, e.g. a cell of initialize_startup_matrix()
+  def write_startups(self, startups):
+    if len(startups) > 0:
+      self.write_columns(startups[0].quality, startups[0].control_pref, startup_columns(startups, self.model))
+
+  # This function writes a whole matrix of results: cohorts, lists of Startup objects, or the dicts of arrays from parallel_startup_matrix(output = 'arrays'), in which case the grid increments must be given
+  def write_matrix(self, matrix, q_increment = None, cp_increment = None):
+    for i, row in enumerate(matrix):
+      for j, cell in enumerate(row):
+        if isinstance(cell, dict):
+          self.write_columns(grid_points(q_increment)[i], grid_points(cp_increment)[j], cell)
+        elif isinstance(cell, list):
+          self.write_startups(cell)
+        else:
+          self.write_cohort(cell)
+
+  def close(self):
+    if self.writer is not None:
+      self.writer.close()
+      if self.format == 'arrow':
+        self.sink.close()
+      self.writer = None
+
+
+# This function reads a results file back as a pyarrow Table. Files ending in .parquet are read as Parquet and anything else as an Arrow IPC file. With memory_map the file is memory mapped, so an Arrow IPC file is read without copying and only the pages that are used are loaded. columns selects a subset of the columns.
+def read_results(path, columns = None, memory_map = True):
+  if path.endswith('.parquet'):
+    return pq.read_table(path, columns = columns, memory_map = memory_map)
+  source = pa.memory_map(path, 'r') if memory_map else pa.OSFile(path, 'rb')
+  table = pa.ipc.open_file(source).read_all()
+  return table.select(columns) if columns is not None else table
+
+
+# This function iterates over a results file one chunk at a time as pyarrow RecordBatches, so a file larger than memory can be analysed in a streaming pass
+def iter_results(path, columns = None):
+  if path.endswith('.parquet'):
+    for batch in pq.ParquetFile(path).iter_batches(columns = columns):
+      yield batch
+  else:
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    for k in range(reader.num_record_batches):
+      batch = reader.get_batch(k)
+      yield batch.select(columns) if columns is not None else batch
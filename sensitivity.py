@@ -0,0 +1,143 @@
+from cohort import grid_points, outcome_analysis
+from cohort_dynamic import CENSORED, PARAMETERS, model_parameters, outcomes
+from kernel_dynamic import NO_MAX_AGE, NO_MAX_VALUE, simulate_variants, transition_rows
+from cap_table import DEFAULT_CHECK, check_interval
+from random_streams import cell_seed_sequences
+from startup_dynamic import Startup
+from statistics import NormalDist
+import numpy as np
+
+# This module measures how the results of the dynamic model move when one of its parameters changes (the PRE_SEED_VALUE and SEED_VALUE thresholds of definitions.py, the growth rate of Startup.initialize_growth_rate() and the live probability of Startup.live_transition_prob(), see cohort_dynamic.PARAMETERS). Every startup of a cell is simulated under the baseline parameters and under each perturbed set in the same compiled pass, from the same random stream (see kernel_dynamic.simulate_variants()). The finite difference of each metric is then the mean of paired per startup differences, whose Monte Carlo noise is much smaller than the difference of two independent sweeps. The parameters only exist in the dynamic model, so there is no static equivalent.
+
+# The default step of each parameter
+DEFAULT_STEPS = {'pre_seed_value': 0.25, 'seed_value': 1.0, 'growth_rate': 0.005, 'live_prob': 0.002}
+METRICS = ['value', 'ownership', 'age', 'survived']
+
+
+# The SensitivityCell class holds the baseline statistics of one (quality, control preference) cell and the paired differences of each perturbed parameter
+class SensitivityCell:
+  __slots__ = ('control_pref', 'quality', 'count', 'steps', 'central', 'baseline', 'differences')
+
+  """ The parameters are the per startup outcomes of the cell, as an array (variants x 4 metrics x startups) in the order of variant_parameters(), and:
+    steps: a dict of the step of each perturbed parameter
+    central: True if each parameter was perturbed by -step and +step rather than only by +step
+    censored: the share of censored startups of the baseline
+  """
+  def __init__(self, control_pref, quality, results, steps, central, censored = 0.0):
+    self.control_pref = control_pref
+    self.quality = quality
+    self.count = results.shape[2]
+    self.steps = dict(steps)
+    self.central = central
+    self.baseline = outcome_analysis(*results[0]) + [censored]
+
+    # For each parameter and metric keep the mean and variance of the paired differences, and the variances of the two arms they were taken between
+    self.differences = {}
+    for k, name in enumerate(self.steps):
+      if central:
+        low, high = results[1 + 2 * k], results[2 + 2 * k]
+        paired = (high - low) / 2
+        independent = (high.var(axis = 1, ddof = 1) + low.var(axis = 1, ddof = 1)) / 4
+      else:
+        high = results[1 + k]
+        paired = high - results[0]
+        independent = high.var(axis = 1, ddof = 1) + results[0].var(axis = 1, ddof = 1)
+      self.differences[name] = (paired.mean(axis = 1), paired.var(axis = 1, ddof = 1), independent)
+
+  """ This function returns the finite differences of the cell as a dict of parameter -> metric -> dict with:
+    delta: the mean change of the metric for a change of the parameter by its step
+    half_width: the half-width of the confidence interval of delta
+    derivative: delta divided by the step
+    efficiency: the variance of delta from two independent runs of the same size divided by its variance from the paired runs, i.e. how many times more startups independent sweeps would need for the same interval (NaN if the metric never changed)
+  """
+  def deltas(self, confidence = 0.95):
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    result = {}
+    for name, (mean, variance, independent) in self.differences.items():
+      result[name] = {}
+      for m, metric in enumerate(METRICS):
+        result[name][metric] = {
+          'delta': float(mean[m]),
+          'half_width': float(z * np.sqrt(variance[m] / self.count)),
+          'derivative': float(mean[m] / self.steps[name]),
+          'efficiency': float(independent[m] / variance[m]) if variance[m] > 0 else float('nan'),
+        }
+    return result
+
+  # This function returns the statistics of the baseline in the same format as a cell of simulation_analysis()
+  def analysis(self):
+    return self.baseline
+
+
+# This function returns the list of parameter dicts that a cell is simulated under: the baseline first and then, for each parameter of steps in turn, the baseline with that parameter moved by +step (or by -step and +step if central)
+def variant_parameters(reference, steps, central = False):
+  baseline = model_parameters(reference)
+  variants = [baseline]
+  for name, step in steps.items():
+    if name not in PARAMETERS:
+      raise Exception('The parameter must be one of {}. The parameter supplied was: {}'.format(PARAMETERS, name))
+    if step == 0:
+      raise Exception('The step of the parameter {} must not be 0.'.format(name))
+    for sign in ([-1, 1] if central else [1]):
+      variants.append(model_parameters(reference, {name: baseline[name] + sign * step}))
+  return variants
+
+
+# This function simulates number_of_startups startups of one cell under the baseline and every perturbed parameter set and returns a SensitivityCell. The key of each startup's random stream is drawn from rng. max_age and max_value censor the startups under every parameter set (see simulate_dynamic.simulate()).
+def simulate_sensitivity_cell(control_pref, quality, number_of_startups, steps, central, rng, max_age = None, max_value = None):
+  if number_of_startups < 2:
+    raise Exception('At least 2 startups per cell are needed for the confidence intervals. The number supplied was: {}'.format(number_of_startups))
+  reference = Startup(control_pref, quality, record = 'off')
+  variants = variant_parameters(reference, steps, central)
+
+  cumulative = np.array([transition_rows(control_pref, quality, variant['live_prob']) for variant in variants])
+  growth_rate, pre_seed_value, seed_value = [np.array([float(variant[key]) for variant in variants]) for key in ['growth_rate', 'pre_seed_value', 'seed_value']]
+  keys = rng.integers(0, 2**64, size = number_of_startups, dtype = np.uint64)
+  shape = (len(variants), number_of_startups)
+  state = np.zeros(shape, dtype = np.uint8)
+  age = np.zeros(shape, dtype = np.int64)
+  value = np.zeros(shape, dtype = float)
+  pct_owned = np.zeros(shape, dtype = float)
+  # The stream wraps around in uint64 arithmetic, which numpy reports as overflows when the kernel runs without numba
+  with np.errstate(over = 'ignore'):
+    simulate_variants(cumulative, float(reference.value), growth_rate, pre_seed_value, seed_value, float(quality), keys, state, age, value, pct_owned, NO_MAX_AGE if max_age is None else int(max_age), NO_MAX_VALUE if max_value is None else float(max_value), check_interval(DEFAULT_CHECK))
+
+  results = np.array([[np.asarray(x, dtype = float) for x in outcomes({'state': state[v], 'age': age[v], 'value': value[v], 'pct_owned': pct_owned[v]})] for v in range(len(variants))])
+  # Like every cell of the dynamic model, the cell has the share of censored startups of the baseline
+  return SensitivityCell(control_pref, quality, results, steps, central, float(np.mean(state[0] == CENSORED)))
+
+
+""" This function runs a sensitivity sweep of the dynamic model and returns a matrix (a list of lists indexed by quality and then control preference) of SensitivityCell objects; see sensitivity_records(). The parameters are:
+  q_increment, cp_increment: the grid increments
+  number_of_startups: the number of startups simulated in each cell. Each is simulated once per parameter set.
+  steps: a dict of the step of each parameter to perturb (defaults to DEFAULT_STEPS)
+  central: perturb each parameter by -step and +step and take central differences, rather than forward differences from the baseline
+  seed, common_random_numbers: as in initialize_startup_matrix()
+  max_age, max_value: stop the startups that reach this age or value before an end state and count them as censored (see simulate_dynamic.simulate())
+"""
+def sensitivity_matrix(q_increment, cp_increment, number_of_startups, steps = None, central = False, seed = None, common_random_numbers = False, max_age = None, max_value = None):
+  steps = DEFAULT_STEPS if steps is None else steps
+  qualities = grid_points(q_increment)
+  control_prefs = grid_points(cp_increment)
+  seed_sequences = iter(cell_seed_sequences(seed, len(qualities) * len(control_prefs), common_random_numbers))
+
+  data = []
+  for quality in qualities:
+    row = []
+    for control_pref in control_prefs:
+      row.append(simulate_sensitivity_cell(control_pref, quality, number_of_startups, steps, central, np.random.default_rng(next(seed_sequences)), max_age, max_value))
+    data.append(row)
+  return data
+
+
+# This function converts a sensitivity matrix into a list of one dict per cell, parameter and metric, for printing or writing as JSON
+def sensitivity_records(matrix, confidence = 0.95):
+  records = []
+  for row in matrix:
+    for cell in row:
+      for name, metrics in cell.deltas(confidence).items():
+        for metric, statistics in metrics.items():
+          record = {'quality': float(cell.quality), 'control_pref': float(cell.control_pref), 'parameter': name, 'step': cell.steps[name], 'metric': metric}
+          record.update(statistics)
+          records.append(record)
+  return records
@@ -0,0 +1,191 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from cohort import grid_points
+from cohort_dynamic import StartupCohort, cell_analysis, cohort_arrays, simulate_cohort
+from cap_table import DEFAULT_LADDER
+from random_streams import cell_seed_sequences
+import numpy as np
+import os
+import tempfile
+
+# This module runs a quality x control preference sweep of the dynamic model with the state of every startup in one shared buffer, instead of having each worker process build its own arrays and send the results back pickled. The buffer holds the arrays of cohort_dynamic.cohort_arrays() (state code, age, round, value, founder pct_owned, amt_raised and the per round pct_sold and post_money of the funding history) for every startup of the sweep, cell after cell. Each worker attaches to the buffer and simulates disjoint slices of it in place with cohort_dynamic.StartupCohort, and the parent reads the final arrays as views of the buffer, without copying them. The buffer is either a multiprocessing.shared_memory block, or a file mapped with np.memmap, whose pages the operating system can write back to disk, so a sweep can be larger than the memory of one process.
+
+BACKENDS = ['shared_memory', 'memmap']
+
+# Each array starts at a multiple of this many bytes in the buffer
+ALIGNMENT = 64
+
+
+# This function returns the offset of each array of cohort_arrays(number_of_rounds) in a buffer for size startups, and the total size of the buffer in bytes
+def buffer_layout(size, number_of_rounds = len(DEFAULT_LADDER)):
+  offsets = {}
+  total = 0
+  for name, dtype, shape in cohort_arrays(number_of_rounds):
+    offsets[name] = total
+    total = total + int(np.prod((size,) + shape)) * np.dtype(dtype).itemsize
+    total = -(-total // ALIGNMENT) * ALIGNMENT
+  return offsets, max(total, 1)
+
+
+# The SharedCohortBuffer class holds the arrays of cohort_arrays(number_of_rounds) for size startups in a shared memory block or a memory mapped file, with number_of_rounds the length of the ladder of the cohorts simulated in it. The process that creates the buffer owns it and removes it with unlink(). Other processes attach to it from its spec(), which is small enough to send to a worker, and close() it when they are done.
+class SharedCohortBuffer:
+  def __init__(self, size, backend = 'shared_memory', path = None, name = None, create = True, number_of_rounds = len(DEFAULT_LADDER)):
+    if backend not in BACKENDS:
+      raise Exception('The backend must be one of {}. The backend supplied was: {}'.format(BACKENDS, backend))
+    self.size = size
+    self.backend = backend
+    self.number_of_rounds = number_of_rounds
+    offsets, total = buffer_layout(size, number_of_rounds)
+
+    if backend == 'shared_memory':
+      from multiprocessing import shared_memory
+      self.memory = shared_memory.SharedMemory(name = name, create = create, size = total if create else 0)
+      self.name = self.memory.name
+      self.path = None
+      buffer = self.memory.buf
+    else:
+      if path is None:
+        descriptor, path = tempfile.mkstemp(prefix = 'cohort-', suffix = '.dat')
+        os.close(descriptor)
+      self.memory = np.memmap(path, dtype = np.uint8, mode = 'w+' if create else 'r+', shape = total)
+      self.name = None
+      self.path = path
+      buffer = self.memory
+
+    self.arrays = {name: np.ndarray((size,) + shape, dtype = dtype, buffer = buffer, offset = offsets[name]) for name, dtype, shape in cohort_arrays(number_of_rounds)}
+
+  # This function returns what another process needs to attach to the buffer with attach()
+  def spec(self):
+    return {'size': self.size, 'backend': self.backend, 'name': self.name, 'path': self.path, 'number_of_rounds': self.number_of_rounds}
+
+  # This function attaches to the buffer of a spec() in another process
+  @classmethod
+  def attach(cls, spec):
+    return cls(spec['size'], spec['backend'], spec['path'], spec['name'], create = False, number_of_rounds = spec['number_of_rounds'])
+
+  # This function returns the arrays of the startups start to stop as views of the buffer, in the layout that StartupCohort takes as arrays
+  def slice(self, start, stop):
+    return {name: array[start:stop] for name, array in self.arrays.items()}
+
+  # This function writes the memory mapped pages back to the file. Shared memory needs no flush.
+  def flush(self):
+    if self.backend == 'memmap':
+      self.memory.flush()
+
+  # This function detaches this process from the buffer. The arrays must not be used afterwards.
+  def close(self):
+    if self.memory is None:
+      return
+    self.arrays = {}
+    if self.backend == 'shared_memory':
+      try:
+        self.memory.close()
+      except BufferError:
+        # Views of the buffer are still held elsewhere. The mapping is released when the last of them is freed.
+        pass
+    else:
+      self.flush()
+    self.memory = None
+
+  # This function closes the buffer and removes it. Only the process that created the buffer should call it.
+  def unlink(self):
+    memory = self.memory
+    self.close()
+    if self.backend == 'shared_memory':
+      if memory is not None:
+        memory.unlink()
+    elif os.path.exists(self.path):
+      os.remove(self.path)
+
+
+# This function is run by a worker process. It attaches to the buffer of spec and simulates each slice of slices in place, where a slice is a tuple (start, stop, quality, control_pref, seed_sequence, parameters, max_age, max_value, ladder). It returns the number of startups simulated, so nothing but that number is sent back.
+def simulate_slices(spec, slices):
+  buffer = SharedCohortBuffer.attach(spec)
+  try:
+    simulated = 0
+    for start, stop, quality, control_pref, seed_sequence, parameters, max_age, max_value, ladder in slices:
+      simulate_cohort(StartupCohort(control_pref, quality, stop - start, np.random.default_rng(seed_sequence), parameters, buffer.slice(start, stop), max_age, max_value, ladder))
+      simulated = simulated + stop - start
+    buffer.flush()
+    return simulated
+  finally:
+    buffer.close()
+
+
+# The SharedSweep class is the result of shared_startup_matrix(). It holds the buffer of the sweep and reads the final arrays of each cell out of it as views. The buffer is removed by close(), or at the end of a with statement.
+class SharedSweep:
+  def __init__(self, buffer, qualities, control_prefs, number_of_startups):
+    self.buffer = buffer
+    self.qualities = qualities
+    self.control_prefs = control_prefs
+    self.number_of_startups = number_of_startups
+
+  # This function returns the final arrays of the cell (i, j) in the layout of StartupCohort.columns(), as views of the buffer
+  def columns(self, i, j):
+    start = (i * len(self.control_prefs) + j) * self.number_of_startups
+    return self.buffer.slice(start, start + self.number_of_startups)
+
+  # This function returns the matrix of the columns of every cell, e.g. for analysis.matrix_analysis('dynamic', matrix, q_increment, cp_increment)
+  def matrix(self):
+    return [[self.columns(i, j) for j in range(len(self.control_prefs))] for i in range(len(self.qualities))]
+
+  # This function returns the analysis matrix of the sweep in the format of simulation_analysis()
+  def analysis(self):
+    return [[cell_analysis(self.columns(i, j)) for j in range(len(self.control_prefs))] for i in range(len(self.qualities))]
+
+  def close(self):
+    self.buffer.unlink()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+
+""" This function is the shared buffer equivalent of parallel_startup_matrix() for the dynamic model. It returns a SharedSweep, whose cells are read from the buffer without copying. The parameters are:
+  q_increment, cp_increment: the grid increments
+  number_of_startups: the number of startups simulated in each cell
+  workers: the number of worker processes (defaults to the number of cores). With 0 the slices are simulated in this process.
+  backend: 'shared_memory', or 'memmap' for a buffer in a file that can be larger than memory
+  path: the file of the memmap backend (a temporary file by default). It is removed when the sweep is closed.
+  slice_size: the number of startups simulated at a time by a worker (defaults to a whole cell). Smaller slices bound the memory of each worker for very large cells, and spread a few large cells over more workers.
+  seed, common_random_numbers: as in parallel_startup_matrix(). When every slice is a whole cell, the same seed gives the same startups as parallel_startup_matrix(); smaller slices get streams spawned from their cell's stream.
+  parameters: an optional dict that overrides the parameters of the model (see cohort_dynamic.PARAMETERS)
+  max_age, max_value: censor the startups as in parallel_startup_matrix()
+  ladder: the cap_table.RoundLadder of the cohorts (see cohort_dynamic.StartupCohort). The funding history in the buffer has one column for each of its rounds.
+"""
+def shared_startup_matrix(q_increment, cp_increment, number_of_startups, workers = None, backend = 'shared_memory', path = None, slice_size = None, seed = None, common_random_numbers = False, parameters = None, max_age = None, max_value = None, ladder = None):
+  ladder = DEFAULT_LADDER if ladder is None else ladder
+  qualities = grid_points(q_increment)
+  control_prefs = grid_points(cp_increment)
+  slice_size = number_of_startups if slice_size is None else slice_size
+  if slice_size < 1:
+    raise Exception('The slice size must be at least 1. The slice size supplied was: {}'.format(slice_size))
+
+  # Cut every cell into slices, each with its own random stream
+  seed_sequences = cell_seed_sequences(seed, len(qualities) * len(control_prefs), common_random_numbers)
+  slices = []
+  for i, quality in enumerate(qualities):
+    for j, control_pref in enumerate(control_prefs):
+      cell = i * len(control_prefs) + j
+      starts = list(range(0, number_of_startups, slice_size))
+      streams = [seed_sequences[cell]] if len(starts) == 1 else seed_sequences[cell].spawn(len(starts))
+      for start, stream in zip(starts, streams):
+        offset = cell * number_of_startups
+        slices.append((offset + start, offset + min(start + slice_size, number_of_startups), quality, control_pref, stream, parameters, max_age, max_value, ladder))
+
+  buffer = SharedCohortBuffer(len(qualities) * len(control_prefs) * number_of_startups, backend, path, number_of_rounds = len(ladder))
+  try:
+    if workers == 0:
+      simulate_slices(buffer.spec(), slices)
+    else:
+      workers = workers or os.cpu_count()
+      with ProcessPoolExecutor(max_workers = workers) as executor:
+        # Every worker gets a few chunks of slices, so that the buffer is attached once per chunk rather than once per slice
+        chunks = [slices[k::workers * 4] for k in range(min(len(slices), workers * 4))]
+        for future in as_completed([executor.submit(simulate_slices, buffer.spec(), chunk) for chunk in chunks]):
+          future.result()
+  except BaseException:
+    buffer.unlink()
+    raise
+  return SharedSweep(buffer, qualities, control_prefs, number_of_startups)
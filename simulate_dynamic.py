@@ -1,55 +1,105 @@
-from startup import Startup
+from startup_dynamic import Startup
 from definitions import STARTUP_STATES
 from statistics import mean, stdev
-import pandas as pd
+from accumulators import CellAccumulator
+from random_streams import cell_rngs
+from instrumentation import phase
+from time import perf_counter
 import numpy as np
-import matplotlib.pyplot as plt
-from wat import wat
 
 
-# This is the main function that runs the simulation of the startup. It takes in an initialized Startup object and performs various operations on it as specified by the model. The updated Startup object will either have raised a Series A or failed. 
-def simulate(startup):
+# This is the main function that runs the simulation of the startup. It takes in an initialized Startup object and performs various operations on it as specified by the model. The updated Startup object will either have raised a Series A or failed. If a Profile (see instrumentation.py) is given, the startup's methods are timed and counted in it. With skip_ahead, each run of grow steps is sampled in one go with Startup.advance_grow_streak(), which is much faster for startups with a high control preference. With max_age or max_value, a startup that reaches that age or value before an end state is stopped there and moved to the censored end state, which bounds the run time of startups that would grow for a very long time.
+def simulate(startup, skip_ahead = False, profile = None, max_age = None, max_value = None):
+
+  if profile is not None:
+    profile.instrument(startup)
   
   # Check if either of the end conditions are met. If so, return the startup. Otherwise, move the startup forward in the simulation. 
   # print('The startup was initialized with control pref {} and quality {}. The initial value is {}. The initial round is {}. The funding history is below. {}'.format(startup.control_pref, startup.quality, startup.value, startup.round, startup.funding_history))
-  while not (startup.state == 'series_a-success' or startup.state == 'die'):
+  censoring = max_age is not None or max_value is not None
+  if censoring and startup.should_censor(max_age, max_value):
+    startup.censor()
+  while not (startup.state == 'series_a-success' or startup.state == 'die' or startup.state == 'censored'):
     # wat()
-    startup.advance()
+    if skip_ahead and startup.state == 'grow':
+      startup.advance_grow_streak(startup.grow_limit(max_age, max_value) if censoring else None)
+    else:
+      startup.advance()
+    if censoring and startup.should_censor(max_age, max_value):
+      startup.censor()
     # print('The startup is in state {}. It has value {}. The current funding round is {} and it has raised a total of {}'.format(startup.state, startup.value, startup.round, startup.amt_raised))
 
   # print('The startup finished in state {}. It has value {}, and it has raised a total of {}. The funding history is below. {}'.format(startup.state, startup.value, startup.amt_raised, startup.funding_history))
 
+  if profile is not None:
+    profile.count('startups')
+    profile.count('ticks', startup.age)
+    if startup.state == 'censored':
+      profile.count('censored')
   
   return startup
 
 
-# This function creates a matrix of startups and simulates them. For each value of control_preference and quality (as specified by increment), the matrix contains a list of simulated startups (as specified by number_of_startups). It then returns the matrix of simulated startups. 
-def initialize_startup_matrix(increment, number_of_startups):
+# This function creates a matrix of startups and simulates them. For each value of control_preference and quality (as specified by increment), the matrix contains a list of simulated startups (as specified by number_of_startups). It then returns the matrix of simulated startups. The same seed always gives the same matrix, and common_random_numbers gives every cell the same random stream. record and record_every set how much of each startup's trajectory is kept (see Startup); use record = 'off' for large sweeps that only need the final values. With a Profile, the time of each phase of the sweep and of each Startup method is recorded in it; see Profile.report(). max_age and max_value censor the startups as in simulate().
+def initialize_startup_matrix(increment, number_of_startups, seed = None, common_random_numbers = False, skip_ahead = False, record = 'full', record_every = 1, profile = None, max_age = None, max_value = None):
   print("Initializing the startup matrix...")
   # Check that an integer mutliple of the increment equals 1.0 
 
 
+  # Give each cell its own random stream spawned from the seed (or the same stream for every cell with common_random_numbers)
+  rngs = iter(cell_rngs(seed, len(np.arange(0.0, 1.0+increment, increment))**2, common_random_numbers))
+
   # Create the startup matrix as a list of list of lists. 
-  data = []
-  for quality in np.arange(0.0, 1.0+increment, increment):
-    row = []
-    for control_preference in np.arange(0.0, 1.0+increment, increment):
-      cell = []
-      for k in range(number_of_startups):
-        cell.append(Startup(control_preference, quality))
-      row.append(cell)
-    data.append(row)
+  with phase(profile, 'initialize'):
+    data = []
+    for quality in np.arange(0.0, 1.0+increment, increment):
+      row = []
+      for control_preference in np.arange(0.0, 1.0+increment, increment):
+        cell = []
+        rng = next(rngs)
+        for k in range(number_of_startups):
+          cell.append(Startup(control_preference, quality, rng, record, record_every))
+        row.append(cell)
+      data.append(row)
 
   print("Simulating startups...")
   # Simulate the startups in the list
-  [[[simulate(s) for s in column] for column in row] for row in data]
+  with phase(profile, 'simulate'):
+    [[[simulate(s, skip_ahead, profile, max_age, max_value) for s in column] for column in row] for row in data]
   print("Startups simulated!")
 
   return data
 
-# This function performs an analysis of the startups that have been simulated and returns a matrix containing a list of tuples for each combination of quality and control preference. The list is structured as follows: [(avg. value, 10th percentile, 90th percentile), (avg. ownership %, 10th percentile, 90th percentile), (avg. time to series A, 10th percentile, 90th percentile), % survived to series a]
-def simulation_analysis(startup_matrix):
+# This function is the streaming equivalent of initialize_startup_matrix() followed by simulation_analysis(). Each startup is simulated, folded into the running accumulators of its cell and then discarded, so peak memory grows with the number of cells rather than the number of startups. No trajectories are recorded unless record is given, and a Profile, max_age and max_value can be passed as in initialize_startup_matrix(). It returns a matrix of CellAccumulator objects; see streaming_analysis().
+def stream_startup_matrix(increment, number_of_startups, seed = None, common_random_numbers = False, skip_ahead = False, record = 'off', record_every = 1, profile = None, max_age = None, max_value = None):
+  print("Simulating startups...")
+  rngs = iter(cell_rngs(seed, len(np.arange(0.0, 1.0+increment, increment))**2, common_random_numbers))
+
+  with phase(profile, 'simulate'):
+    data = []
+    for quality in np.arange(0.0, 1.0+increment, increment):
+      row = []
+      for control_preference in np.arange(0.0, 1.0+increment, increment):
+        cell = CellAccumulator()
+        rng = next(rngs)
+        for k in range(number_of_startups):
+          s = simulate(Startup(control_preference, quality, rng, record, record_every), skip_ahead, profile, max_age, max_value)
+          survived = s.state == STARTUP_STATES[8]
+          cell.add(s.value if survived else 0, s.pct_owned, s.age, survived, s.state == 'censored')
+        row.append(cell)
+      data.append(row)
 
+  print("Startups simulated!")
+  return data
+
+# This function returns the analysis matrix for a matrix of CellAccumulator objects. Each cell has the same layout as in simulation_analysis(), with the 10th and 90th percentiles appended to each tuple: [(avg. value, stdev, 10th percentile, 90th percentile), ..., % survived to series a, % censored]
+def streaming_analysis(accumulator_matrix):
+  return [[cell.analysis() + [cell.censored_share()] for cell in row] for row in accumulator_matrix]
+
+# This function performs an analysis of the startups that have been simulated and returns a matrix containing a list of tuples for each combination of quality and control preference. The list is structured as follows: [(avg. value, 10th percentile, 90th percentile), (avg. ownership %, 10th percentile, 90th percentile), (avg. time to series A, 10th percentile, 90th percentile), % survived to series a, % censored]. The censored startups (see simulate()) are counted as not having survived, with the age and ownership they had when they were stopped.
+def simulation_analysis(startup_matrix, profile = None):
+
+  start = perf_counter()
   analysis = []
 
   for i in range(0, len(startup_matrix)):
@@ -63,9 +113,10 @@ def simulation_analysis(startup_matrix):
 
       # For those startups, calculate the following
       value = [s.value if s.state == STARTUP_STATES[8] else 0 for s in startups]
-      ownership = [s.ownership_history[-1] for s in startups]
+      ownership = [s.pct_owned for s in startups]
       time = [s.age for s in startups]
       survival = [1 if s.state == STARTUP_STATES[8] else 0 for s in startups]
+      censored = [1 if s.state == 'censored' else 0 for s in startups]
 
       # Create a tuple based on the lists 
       avg_value = (mean(value), stdev(value))
@@ -78,16 +129,22 @@ def simulation_analysis(startup_matrix):
       cell.append(avg_ownership)
       cell.append(avg_time)
       cell.append(survival_pct)
+      cell.append(mean(censored))
 
       row.append(cell)
     
     analysis.append(row)
+
+  if profile is not None:
+    profile.add_time('analysis', perf_counter() - start)
   
   return analysis
 
 
 def plot_analysis(increment, analysis):
 
+  import matplotlib.pyplot as plt
+
   fig, axes = plt.subplots(nrows=2, ncols=2, sharex=True)
 
   x = np.arange(0.0 ,1.0 + increment, increment)
@@ -141,8 +198,6 @@ def plot_analysis(increment, analysis):
 
   plt.show()
 
-  wat()
-
   
 
 
@@ -166,27 +221,14 @@ def plot_analysis(increment, analysis):
 --> To get to the final output, I need to have a dataframe with
 
 """
-increment = 0.2
-startup_matrix = initialize_startup_matrix(increment, 20)
-
-analysis = simulation_analysis(startup_matrix)
-
-plot_analysis(increment, analysis)
-
-
-
-
-
-wat()
-
-
-test = Startup(0.8,0.6)
-simulate(test)  
-test.plot()
-
-# wat()
-
-
+if __name__ == '__main__':
+  increment = 0.2
+  startup_matrix = initialize_startup_matrix(increment, 20)
 
+  analysis = simulation_analysis(startup_matrix)
 
+  plot_analysis(increment, analysis)
 
+  test = Startup(0.8,0.6)
+  simulate(test)  
+  test.plot()
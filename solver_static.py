@@ -0,0 +1,122 @@
+from definitions import STARTUP_STATES_STATIC
+from startup_static import transition_matrix
+from cohort_static import STATE_CODES, END_STATES, FUNDRAISING_STATES, StartupCohort, pitch_terms, simulate_cohort
+from cohort import grid_points
+import numpy as np
+
+# The static model is a small absorbing Markov chain whose pitches have no randomness, so the distribution of outcomes of a startup is fully determined by its quality and control preference. This module computes the statistics reported by simulate_static.simulation_analysis() exactly, by enumerating every path from 'start' to an end state, instead of by sampling.
+
+
+# This function returns the transition matrix for the given parameters as an array of shape (7, 7, ...) where the trailing dimensions are the broadcast shape of control_pref and quality
+def transition_array(control_pref, quality):
+  rows = transition_matrix(control_pref, quality)
+  shape = np.broadcast(np.asarray(control_pref), np.asarray(quality)).shape
+  return np.array([[np.broadcast_to(np.asarray(p, dtype = float), shape) for p in rows[state]] for state in STARTUP_STATES_STATIC])
+
+
+""" This function computes the exact outcome statistics of the static model for the given quality and control preference, which may be scalars or arrays of any broadcastable shape. It returns a dict of arrays with the following entries:
+  survival: P(series_a)
+  age_mean, age_var: mean and variance of the age at the end state
+  value_mean, value_var: mean and variance of the value (0 unless the startup raised a Series A)
+  ownership_mean, ownership_var: mean and variance of the founder ownership (0 unless the startup raised a Series A)
+  amt_raised_mean: mean of the total amount raised
+"""
+def solve(quality, control_pref):
+
+  # Check that the supplied parameters are valid
+  if np.any(np.asarray(control_pref) > 1) or np.any(np.asarray(control_pref) < 0):
+    raise Exception('The control preference must be between 0 and 1. The control preference supplied was: {}'.format(control_pref))
+  if np.any(np.asarray(quality) > 1) or np.any(np.asarray(quality) < 0):
+    raise Exception('The quality must be between 0 and 1. The quality supplied was: {}'.format(quality))
+
+  matrix = transition_array(control_pref, quality)
+  quality = np.broadcast_to(np.asarray(quality, dtype = float), matrix.shape[2:])
+  zeros = np.zeros(matrix.shape[2:])
+  moments = {key: zeros.copy() for key in ['survival', 'age', 'age_sq', 'value', 'value_sq', 'ownership', 'ownership_sq', 'amt_raised']}
+
+  # Walk every path from 'start'. Each frame holds the state, the bitmask of visited states, the probability of the path and the age, value, founder ownership and amount raised at the end of the path.
+  start = STATE_CODES['start']
+  stack = [(start, 1 << start, np.ones(matrix.shape[2:]), 0, zeros, np.ones(matrix.shape[2:]), zeros)]
+  while stack:
+    state, visited, prob, age, value, ownership, amt_raised = stack.pop()
+
+    if state in END_STATES:
+      survived = state == STATE_CODES['series_a']
+      moments['survival'] = moments['survival'] + (prob if survived else 0)
+      moments['age'] = moments['age'] + prob * age
+      moments['age_sq'] = moments['age_sq'] + prob * age**2
+      moments['amt_raised'] = moments['amt_raised'] + prob * amt_raised
+      if survived:
+        moments['value'] = moments['value'] + prob * value
+        moments['value_sq'] = moments['value_sq'] + prob * value**2
+        moments['ownership'] = moments['ownership'] + prob * ownership
+        moments['ownership_sq'] = moments['ownership_sq'] + prob * ownership**2
+      continue
+
+    # The static chain only moves forward, so a path can never be longer than the number of states
+    if age > len(STARTUP_STATES_STATIC):
+      raise Exception('The static transition matrix contains a cycle through state {}, so the paths cannot be enumerated.'.format(STARTUP_STATES_STATIC[state]))
+
+    for new_state in range(len(STARTUP_STATES_STATIC)):
+      p = matrix[state, new_state]
+      if not np.any(p > 0):
+        continue
+      new_value, new_ownership, new_amt_raised = value, ownership, amt_raised
+      if new_state in FUNDRAISING_STATES:
+        post_money, pct_sold = pitch_terms(quality, visited, FUNDRAISING_STATES[new_state])
+        new_value = post_money
+        new_ownership = ownership * (1 - pct_sold)
+        new_amt_raised = amt_raised + post_money * pct_sold
+      stack.append((new_state, visited | (1 << new_state), prob * p, age + 1, new_value, new_ownership, new_amt_raised))
+
+  return {
+    'survival': moments['survival'],
+    'age_mean': moments['age'],
+    'age_var': moments['age_sq'] - moments['age']**2,
+    'value_mean': moments['value'],
+    'value_var': moments['value_sq'] - moments['value']**2,
+    'ownership_mean': moments['ownership'],
+    'ownership_var': moments['ownership_sq'] - moments['ownership']**2,
+    'amt_raised_mean': moments['amt_raised'],
+  }
+
+
+# This function solves the whole quality x control preference grid at once and returns it in the same format as simulate_static.simulation_analysis(), so it can be passed to plot_analysis(). Standard deviations are exact population values rather than sample estimates.
+def solve_grid(q_increment, cp_increment):
+  quality, control_pref = np.meshgrid(grid_points(q_increment), grid_points(cp_increment), indexing = 'ij')
+  solution = solve(quality, control_pref)
+  stdev = {key: np.sqrt(np.maximum(solution[key + '_var'], 0)) for key in ['value', 'ownership', 'age']}
+
+  analysis = []
+  for i in range(quality.shape[0]):
+    row = []
+    for j in range(quality.shape[1]):
+      row.append([(solution['value_mean'][i, j], stdev['value'][i, j]), (solution['ownership_mean'][i, j], stdev['ownership'][i, j]), (solution['age_mean'][i, j], stdev['age'][i, j]), solution['survival'][i, j]])
+    analysis.append(row)
+
+  return analysis
+
+
+# This function cross-checks the exact solution for one cell against the sampling path (a simulated StartupCohort). It returns a dict of (exact, sampled, z-score) for each statistic and raises an Exception if any sampled mean is more than tolerance standard errors away from the exact mean.
+def cross_check(quality, control_pref, number_of_startups, rng = None, tolerance = 5.0):
+  solution = solve(quality, control_pref)
+  cohort = simulate_cohort(StartupCohort(control_pref, quality, number_of_startups, rng))
+
+  survived = cohort.state == STATE_CODES['series_a']
+  sampled = {'survival': survived, 'age': cohort.age, 'value': np.where(survived, cohort.value, 0), 'ownership': np.where(survived, cohort.pct_owned, 0)}
+  exact_var = {'survival': solution['survival'] * (1 - solution['survival']), 'age': solution['age_var'], 'value': solution['value_var'], 'ownership': solution['ownership_var']}
+
+  report = {}
+  for key in sampled:
+    exact = float(solution[key if key == 'survival' else key + '_mean'])
+    mean = float(np.mean(sampled[key]))
+    standard_error = np.sqrt(max(float(exact_var[key]), 0) / number_of_startups)
+    if standard_error > 0:
+      z = (mean - exact) / standard_error
+    else:
+      z = 0.0 if abs(mean - exact) < 10**-9 else np.inf
+    report[key] = (exact, mean, z)
+    if abs(z) > tolerance:
+      raise Exception('The sampled {} for quality {} and control preference {} does not match the exact solution. Exact: {}, sampled: {}, z-score: {}'.format(key, quality, control_pref, exact, mean, z))
+
+  return report
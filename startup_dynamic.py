@@ -1,36 +1,125 @@
-from definitions import FUNDRAISING_MAP, PRE_SEED_VALUE, SEED_VALUE, FUNDING_HISTORY_INITIALIZER, CAP_TABLE_INITIALIZER, STARTUP_STATES
-import pandas as pd
+from definitions import FUNDRAISING_MAP, PRE_SEED_VALUE, SEED_VALUE, PCT_SOLD_RANGES, STATE_CODES, FUNDING_HISTORY_ARRAY_INITIALIZER, CAP_TABLE_ARRAY_INITIALIZER, FUNDING_HISTORY_COLUMNS, CAP_TABLE_COLUMNS, STARTUP_STATES, RECORDING_MODES
+from array import array
 import numpy as np
-import random
-from wat import wat
-import matplotlib.pyplot as plt
+import math
+from random_streams import get_rng, cumulative_probabilities, sample_index
+from cap_table import CHECK_MODES, check_interval
+
+# Column indices of the cap table array
+ACTIVE, ROUND, PCT_OWNED, VALUE = range(len(CAP_TABLE_COLUMNS))
 
 # Thie Startup class contains the primary object that will be passed through the simulation. It contains all relevant information regarding the startup, and will be updated as the startup progresses through time.
 class Startup:
-  def __init__(self, control_pref, quality):
+  # The cap table and funding history are small NumPy arrays with one row per round in FUNDRAISING_MAP (see CAP_TABLE_COLUMNS and FUNDING_HISTORY_COLUMNS). Use to_frame() to get them as pandas DataFrames.
+  __slots__ = ('_control_pref', '_quality', 'state', 'age', 'round', 'value', 'amt_raised', 'path', 'visited', 'record', 'record_every', 'age_history', 'value_history', 'ownership_history', 'amt_raised_history', 'cap_table', 'funding_history', 'growth_rate', 'transition_matrix', 'transition_rows', 'rng', 'check')
+
+  # All random draws are taken from rng, a numpy.random.Generator. If it is not supplied, the process wide default Generator from random_streams.get_rng() is used.
+  # record sets which points of the trajectory (value_history, ownership_history, amt_raised_history and the path) are kept, see RECORDING_MODES: 'full' records every tick, 'every' every record_every ticks, 'events' only the pitches and 'off' nothing but the final values.
+  # check is the mode of the sum-to-1 check of update_cap_table(), one of cap_table.CHECK_MODES. The reference Startup checks every round by default; 'sample' only checks the first of every cap_table.SAMPLE_SIZE rounds the startup raises, counted per startup.
+  def __init__(self, control_pref, quality, rng = None, record = 'full', record_every = 1, check = 'all'):
 
     # Check that the supplied parameters are valid
     if control_pref > 1 or control_pref < 0:
       raise Exception('The control preference must be between 0 and 1. The control preference supplied was: {}'.format(control_pref))
     if quality > 1 or quality < 0:
       raise Exception('The quality must be between 0 and 1. The quality supplied was: {}'.format(quality))
+    if record not in RECORDING_MODES:
+      raise Exception('The recording mode must be one of {}. The recording mode supplied was: {}'.format(RECORDING_MODES, record))
+    if record_every < 1:
+      raise Exception('The recording interval must be at least 1. The recording interval supplied was: {}'.format(record_every))
+    if check not in CHECK_MODES:
+      raise Exception('The check must be one of {}. The check supplied was: {}'.format(CHECK_MODES, check))
 
     # Assign the initial startup properties
-    self.control_pref = control_pref
-    self.quality = quality
+    self._control_pref = control_pref
+    self._quality = quality
+    self.rng = get_rng(rng)
     self.state = STARTUP_STATES[0]
     self.age = 0
     self.round = 0
     self.value = self.initialize_value()
     self.amt_raised = 0.0
-    self.state_history = [STARTUP_STATES[0]]
-    self.value_history = [self.value] # Append at the end of a pitch or grow phase
-    self.ownership_history = [1.0] # Append at the end of a pitch or grow phase
-    self.amt_raised_history = [0.0] # Append at the end of a pitch or grow phase
-    self.cap_table = CAP_TABLE_INITIALIZER.copy()
-    self.funding_history = FUNDING_HISTORY_INITIALIZER.copy()
+    self.record = record
+    self.record_every = record_every
+    self.check = check
+    recording = record != 'off'
+    self.path = array('B', [STATE_CODES[STARTUP_STATES[0]]] if recording else []) # The state codes of every state the startup has been in, in order. See state_history for the decoded view.
+    self.visited = 1 << STATE_CODES[STARTUP_STATES[0]] # Bitmask of the state codes the startup has visited
+    self.age_history = [0] if recording and record != 'full' else [] # Only used when not every tick is recorded. See trajectory_ages().
+    self.value_history = [self.value] if recording else [] # Append at the end of a pitch or grow phase
+    self.ownership_history = [1.0] if recording else [] # Append at the end of a pitch or grow phase
+    self.amt_raised_history = [0.0] if recording else [] # Append at the end of a pitch or grow phase
+    self.cap_table = CAP_TABLE_ARRAY_INITIALIZER.copy()
+    self.funding_history = FUNDING_HISTORY_ARRAY_INITIALIZER.copy()
     self.growth_rate = self.initialize_growth_rate()
-    self.transition_matrix = {'start': [0,1,0,0,0,0,0,0,0,0], 'grow': [0,0,self.live_transition_prob,self.die_transition_prob,0,0,0,0,0,0], 'live': [0,self.grow_transition_prob,0,0,self.pitch_transition_prob,0,0,0,0,0], 'die': [0,0,0,1,0,0,0,0,0,0], 'pre_seed-success': [0,1,0,0,0,0,0,0,0,0], 'pre_seed-fail': [0,0,self.live_transition_prob,self.die_transition_prob,0,0,0,0,0,0], 'seed-success': [0,1,0,0,0,0,0,0,0,0], 'seed-fail': [0,0,self.live_transition_prob,self.die_transition_prob,0,0,0,0,0,0], 'series_a-success': [0,0,0,0,0,0,0,0,1,0], 'series_a-fail': [0,0,self.live_transition_prob,self.die_transition_prob,0,0,0,0,0,0]} 
+    self.transition_matrix = {'start': [0,1,0,0,0,0,0,0,0,0,0], 'grow': [0,0,self.live_transition_prob,self.die_transition_prob,0,0,0,0,0,0,0], 'live': [0,self.grow_transition_prob,0,0,self.pitch_transition_prob,0,0,0,0,0,0], 'die': [0,0,0,1,0,0,0,0,0,0,0], 'pre_seed-success': [0,1,0,0,0,0,0,0,0,0,0], 'pre_seed-fail': [0,0,self.live_transition_prob,self.die_transition_prob,0,0,0,0,0,0,0], 'seed-success': [0,1,0,0,0,0,0,0,0,0,0], 'seed-fail': [0,0,self.live_transition_prob,self.die_transition_prob,0,0,0,0,0,0,0], 'series_a-success': [0,0,0,0,0,0,0,0,1,0,0], 'series_a-fail': [0,0,self.live_transition_prob,self.die_transition_prob,0,0,0,0,0,0,0], 'censored': [0,0,0,0,0,0,0,0,0,0,1]}
+    self.compile_transitions()
+
+  # The control preference and quality are properties so that the compiled transition rows are rebuilt (and re-validated) whenever one of them changes
+  @property
+  def control_pref(self):
+    return self._control_pref
+
+  @control_pref.setter
+  def control_pref(self, control_pref):
+    if control_pref > 1 or control_pref < 0:
+      raise Exception('The control preference must be between 0 and 1. The control preference supplied was: {}'.format(control_pref))
+    self._control_pref = control_pref
+    self.compile_transitions()
+
+  @property
+  def quality(self):
+    return self._quality
+
+  @quality.setter
+  def quality(self, quality):
+    if quality > 1 or quality < 0:
+      raise Exception('The quality must be between 0 and 1. The quality supplied was: {}'.format(quality))
+    self._quality = quality
+    self.compile_transitions()
+
+  # The path of the startup as a list of state names. It is decoded from the compact path of state codes on every access.
+  @property
+  def state_history(self):
+    return [STARTUP_STATES[code] for code in self.path]
+
+  # This function appends a state to the path of the startup (unless recording is off) and marks it as visited
+  def record_state(self, state):
+    code = STATE_CODES[state]
+    if self.record != 'off':
+      self.path.append(code)
+    self.visited = self.visited | (1 << code)
+
+  # The founder ownership of the startup. This is always up to date, whatever the recording mode.
+  @property
+  def pct_owned(self):
+    return self.cap_table[0, PCT_OWNED]
+
+  # This function appends the current value, founder ownership and amount raised to the trajectory if the recording mode asks for this point. event is True at the end of a pitch.
+  def record_trajectory(self, event):
+    record = self.record
+    if record == 'full' or (record == 'events' and event) or (record == 'every' and self.age % self.record_every == 0):
+      self.value_history.append(self.value)
+      self.ownership_history.append(self.cap_table[0, PCT_OWNED])
+      self.amt_raised_history.append(self.amt_raised)
+      if record != 'full':
+        self.age_history.append(self.age)
+
+  # This function returns the age of each point of the trajectory
+  def trajectory_ages(self):
+    return range(0, len(self.value_history)) if self.record == 'full' else self.age_history
+
+  # This function checks in constant time whether the startup has ever been in the given state
+  def has_visited(self, state):
+    return (self.visited >> STATE_CODES[state]) & 1 == 1
+
+  # This function evaluates and validates the transition matrix once and stores each row as cumulative probabilities, so that advance() only needs one uniform draw and a binary search per transition. It is called on creation and whenever the parameters change.
+  def compile_transitions(self):
+    self.transition_rows = {state: cumulative_probabilities(self.get_transition_probabilities(state)) for state in STARTUP_STATES}
+
+  # This function samples the state that follows the given state from the compiled transition rows
+  def sample_transition(self, state):
+    return STARTUP_STATES[sample_index(self.transition_rows[state], self.rng)]
 
   # This function will generate an initial value based on the quality of the startup. 
   def initialize_value(self):
@@ -60,9 +149,7 @@ class Startup:
   def grow(self):
     # Update the value based on the current value and growth rate
     self.value = self.value * self.growth_rate
-    self.value_history.append(self.value)
-    self.ownership_history.append(self.cap_table.at[FUNDRAISING_MAP[0],'pct_owned'])
-    self.amt_raised_history.append(self.amt_raised)
+    self.record_trajectory(False)
 
   # This function calls the functions get_round() and pitch() to determine what happens in a fundraising event. Based on the output of pitch, it updates the necessary field in the Startup object. 
   def fundraise(self, raise_round):
@@ -74,9 +161,7 @@ class Startup:
     self.update_funding(pitch)
 
     # Update the history of the startup
-    self.value_history.append(self.value)
-    self.ownership_history.append(self.cap_table.at[FUNDRAISING_MAP[0],'pct_owned'])
-    self.amt_raised_history.append(self.amt_raised)
+    self.record_trajectory(True)
 
     return pitch
 
@@ -91,7 +176,7 @@ class Startup:
     else:
       return 4 # This means the startup needs to grow more before trying to raise the next round. 
 
-  """ This function conducts the pitch based on the round and the startup properties. It returns a dataframe containing the following information: 
+  """ This function conducts the pitch based on the round and the startup properties. It returns a tuple laid out as a row of the funding history (see FUNDING_HISTORY_COLUMNS) containing the following information: 
     success: [0,1]
     raise_round: [1,2,3]
     amt_raised: [0,inf] 
@@ -104,110 +189,199 @@ class Startup:
     # Determine how much value to raise
     ### UPDATE!!! For now, set the value to be raised to be 20% of current value. Later, add in noise and figure out how to base this off the round.
     if raise_round == 1:
-      pct_sold = np.random.uniform(0.05,0.15)
+      pct_sold = self.rng.uniform(*PCT_SOLD_RANGES[1])
       post_money = self.value/(1-pct_sold)
       amt_raised = post_money*pct_sold
       pre_money = self.value
     elif raise_round == 2:
-      pct_sold = np.random.uniform(0.10,0.20)
+      pct_sold = self.rng.uniform(*PCT_SOLD_RANGES[2])
       post_money = self.value/(1-pct_sold)
       amt_raised = post_money*pct_sold
       pre_money = self.value
     else:
-      pct_sold = np.random.uniform(0.20,0.33)
+      pct_sold = self.rng.uniform(*PCT_SOLD_RANGES[3])
       post_money = self.value/(1-pct_sold)
       amt_raised = post_money*pct_sold
       pre_money = self.value
 
     # Determine if the pitch is successful
     ### UPDATE!!! For now, just set the probability to be based off the quality. Later, add in a variable that accounts for the value trying to be raised for the given round type
-    if random.random() < self.quality:
+    if self.rng.random() < self.quality:
       success = 1
     else:
       success = 0
 
-    # Return the result
-    key = FUNDRAISING_MAP[raise_round]
-    pitch = pd.DataFrame.from_dict({key: [success, raise_round,  pre_money, post_money, amt_raised, pct_sold]}, orient = 'index', columns = ['active','round','pre_money','post_money','amt_raised','pct_sold'])
-    return pitch
+    # Return the result as a row of the funding history
+    return (success, raise_round, pre_money, post_money, amt_raised, pct_sold)
 
   # This function udpates the funding_history based on the outcome of the pitch. If that pitch was successful, it makes a call to update_cap_table to update those numbers. 
   def update_funding(self, pitch):
 
     # Check if the pitch was successful. If it was not, then no need to update. If it was, then update funding_history and cap_table. 
-    if pitch['active'].values[0] == 0:
-      # self.funding_history.update(pitch) -- Think about whether we want a funding history that is the complete # of fundraising attempts
+    success, raise_round, pre_money, post_money, amt_raised, pct_sold = pitch
+    if success == 0:
+      # self.funding_history[raise_round] = pitch -- Think about whether we want a funding history that is the complete # of fundraising attempts
       return
     else:
-      self.funding_history.update(pitch) # This is the built in pandas dataframe update
+      self.funding_history[raise_round] = pitch
       self.update_cap_table(pitch)
-      self.value = pitch['post_money'].values[0]
-      self.round = pitch['round'].values[0]
-      self.amt_raised = self.amt_raised + pitch['amt_raised'].values[0]
+      self.value = post_money
+      self.round = raise_round
+      self.amt_raised = self.amt_raised + amt_raised
       return
 
   # This function uses the successful pitch to calculate updates to the capitalization for each of the parties invested in the startup. It updates the cap_tablepit. 
   def update_cap_table(self, pitch):
 
+    success, raise_round, pre_money, post_money, amt_raised, pct_sold = pitch
+
     # Update the round of funding that the pitch was successful for
-    self.cap_table.loc[pitch.index.values[0], 'active'] = pitch['active'].values[0]
-    self.cap_table.loc[pitch.index.values[0], 'pct_owned'] = pitch['pct_sold'].values[0]
+    self.cap_table[raise_round, ACTIVE] = success
+    self.cap_table[raise_round, PCT_OWNED] = pct_sold
 
     # Update the previous rounds' pct_owned values
-    for i in range(0, pitch['round'].values[0]):
-      self.cap_table.loc[self.cap_table['round'] == i, 'pct_owned'] = self.cap_table.loc[self.cap_table['round'] == i, 'pct_owned'].values[0] * (1 - pitch['pct_sold'].values[0])
+    self.cap_table[:raise_round, PCT_OWNED] *= (1 - pct_sold)
 
-    # Check that the pct_owned adds up to 1
-    ownership_check = sum(self.cap_table['pct_owned'])
-    if not (1.0 - 10**-6 < ownership_check < 1.0 + 10**-6):
-      raise Exception('The total ownership should add up to 1. The sum of all ownerhsip percecentages was: {}. The cap table is as follows (Entering Debug Mode): \n {}'.format(ownership_check, self.cap_table))
+    # Check that the pct_owned adds up to 1 (see check)
+    interval = check_interval(self.check)
+    if interval and (self.cap_table[1:, ACTIVE].sum() - 1) % interval == 0:
+      ownership_check = self.cap_table[:, PCT_OWNED].sum()
+      if not (1.0 - 10**-6 < ownership_check < 1.0 + 10**-6):
+        raise Exception('The total ownership should add up to 1. The sum of all ownerhsip percecentages was: {}. The cap table is as follows (Entering Debug Mode): \n {}'.format(ownership_check, self.to_frame('cap_table')))
 
 
     # Update the values based on the new post_money
-    self.cap_table['value'] = self.cap_table['pct_owned'] * pitch['post_money'].values[0]
+    self.cap_table[:, VALUE] = self.cap_table[:, PCT_OWNED] * post_money
+
+  # This function returns the cap table or the funding history of the startup as a pandas DataFrame indexed by the round names in FUNDRAISING_MAP
+  def to_frame(self, table = 'cap_table'):
+    import pandas as pd
+    if table == 'cap_table':
+      return pd.DataFrame(self.cap_table, index = [FUNDRAISING_MAP[r] for r in range(len(FUNDRAISING_MAP))], columns = CAP_TABLE_COLUMNS)
+    elif table == 'funding_history':
+      return pd.DataFrame(self.funding_history, index = [FUNDRAISING_MAP[r] for r in range(len(FUNDRAISING_MAP))], columns = FUNDING_HISTORY_COLUMNS)
+    else:
+      raise Exception('The table must be either cap_table or funding_history. The table supplied was: {}'.format(table))
 
   # This function moves the startup from the current state to the next state based on the transisition probabilities. It first calls any functions that are reqruired to be run in the current state. A
   def advance(self):
 
-    if self.state == 'die' or self.state == 'series_a-succeed':
+    if self.state == 'die' or self.state == 'series_a-success' or self.state == 'censored':
       raise Exception('The advance() function was called on a startup that has already reached end state {}.'.format(self.state))
     if self.state == 'grow':
-      self.grow()
       self.age = self.age + 1
-      transition_probabilities = self.get_transition_probabilities(self.state)
-      new_state = np.random.choice(STARTUP_STATES, replace = True, p = transition_probabilities)
+      self.grow()
+      new_state = self.sample_transition(self.state)
       self.state = new_state
     elif self.state == 'live':
       # Figure out if the startup will pitch or grow
-      transition_probabilities = self.get_transition_probabilities(self.state)
-      temp_state = np.random.choice(STARTUP_STATES, replace = True, p = transition_probabilities)
+      temp_state = self.sample_transition(self.state)
       if temp_state != 'grow':
-        #Do the pitch and update the state 
-        ### UPDATE!!! This needs to handle the new case where the startup is not old enough to be raising again
-        # Run the get round function
-        raise_round = self.get_fundraising_round()
-        if raise_round == 4:
-          self.grow()
-          self.age = self.age + 1
-          transition_probabilities = self.get_transition_probabilities(self.state)
-          new_state = np.random.choice(STARTUP_STATES, replace = True, p = transition_probabilities)
-          self.state = new_state
-        else: 
-          pitch = self.fundraise(raise_round)
-          new_state = FUNDRAISING_MAP[pitch['round'].values[0]] + '-' + ('success' if pitch['active'].values[0] == 1 else 'fail')
-          self.state = new_state
-          # Add one to the age since the pitch has actually been completed and a check will be made for the series_a-success end condition
-          self.age = self.age + 1
+        self.try_pitch()
       else:
         # Set the new state to grow. Note: We do not add one to the age here since the age will be updated after grow()
         self.state = temp_state
     else:
-      transition_probabilities = self.get_transition_probabilities(self.state)
-      new_state = np.random.choice(STARTUP_STATES, replace = True, p = transition_probabilities)
+      new_state = self.sample_transition(self.state)
       self.state = new_state
 
     # Append the current state to the path of the startup
-    self.state_history.append(self.state)
+    self.record_state(self.state)
+
+  # This function is called when a startup in the live state has chosen to pitch. If it is too early to raise the next round it grows instead, otherwise it pitches and moves to the success or fail state of the round.
+  def try_pitch(self):
+    #Do the pitch and update the state 
+    ### UPDATE!!! This needs to handle the new case where the startup is not old enough to be raising again
+    # Run the get round function
+    raise_round = self.get_fundraising_round()
+    if raise_round == 4:
+      self.age = self.age + 1
+      self.grow()
+      new_state = self.sample_transition(self.state)
+      self.state = new_state
+    else: 
+      # Add one to the age since the pitch will be completed and a check will be made for the series_a-success end condition
+      self.age = self.age + 1
+      pitch = self.fundraise(raise_round)
+      new_state = FUNDRAISING_MAP[pitch[1]] + '-' + ('success' if pitch[0] == 1 else 'fail')
+      self.state = new_state
+
+  # This function returns True if the startup has not reached an end state but has reached max_age or max_value (either can be None), i.e. if its simulation should be stopped
+  def should_censor(self, max_age = None, max_value = None):
+    if self.state == 'die' or self.state == 'series_a-success' or self.state == 'censored':
+      return False
+    return (max_age is not None and self.age >= max_age) or (max_value is not None and self.value >= max_value)
+
+  # This function stops the simulation of the startup by moving it to the censored end state. It keeps the age and value it had when it was stopped.
+  def censor(self):
+    self.state = 'censored'
+    self.record_state(self.state)
+
+  # This function returns the number of grow steps the startup can take from its current age and value before it reaches max_age or max_value, or None if neither limit can be reached by growing
+  def grow_limit(self, max_age = None, max_value = None):
+    limit = None
+    if max_age is not None:
+      limit = max(max_age - self.age, 0)
+    if max_value is not None and self.value > 0 and self.growth_rate > 1:
+      # The first step at which value * growth_rate ** k reaches max_value, corrected for the rounding of the logarithms
+      k = max(math.ceil(math.log(max_value / self.value) / math.log(self.growth_rate)), 0)
+      while k > 0 and self.value * self.growth_rate ** (k - 1) >= max_value:
+        k = k - 1
+      while self.value * self.growth_rate ** k < max_value:
+        k = k + 1
+      limit = k if limit is None else min(limit, k)
+    return limit
+
+  """ This function is a fast path for advance() when the startup is in the grow state. Each grow step is followed by live (or die) and live is followed by grow (or a pitch), so the number of grow steps before the startup either dies or chooses to pitch is geometric with exit probability 1 - P(grow -> live) * P(live -> grow). This function samples that run length k directly, applies growth_rate ** k in one step, fills the histories in bulk and then either moves the startup to die or runs the pitch, leaving it in the same state distribution as repeated calls to advance(). With a limit (see grow_limit()) a streak that would be longer stops after limit grow steps, and a streak of exactly limit steps that does not die stops before its pitch, in both cases in the live state, which is where repeated calls to advance() would have been when the startup reached the limit. The caller then censors the startup. It returns the number of grow steps of the streak.
+  """
+  def advance_grow_streak(self, limit = None):
+
+    if self.state != 'grow':
+      raise Exception('The advance_grow_streak() function can only be called in the grow state. The current state is {}.'.format(self.state))
+
+    # Get the probabilities of surviving a grow step and of choosing to grow again from the compiled rows
+    grow_row = self.transition_rows['grow']
+    live_row = self.transition_rows['live']
+    p_live = grow_row[STATE_CODES['live']] - grow_row[STATE_CODES['live'] - 1]
+    p_grow = live_row[STATE_CODES['grow']] - live_row[STATE_CODES['grow'] - 1]
+    p_exit = 1 - p_live * p_grow
+    if p_exit <= 0:
+      raise Exception('The startup can never leave the grow state. P(grow -> live) = {}, P(live -> grow) = {}'.format(p_live, p_grow))
+
+    # Sample the number of grow steps and grow the value in one step
+    k = int(self.rng.geometric(p_exit))
+    truncated = limit is not None and k > limit
+    if truncated:
+      k = limit
+    value = self.value
+    start_age = self.age
+    self.value = value * self.growth_rate ** k
+    self.age = self.age + k
+
+    # Fill in the recorded points of the trajectory in bulk
+    if self.record == 'full' or self.record == 'every':
+      step = 1 if self.record == 'full' else self.record_every
+      ages = range((start_age // step + 1) * step, start_age + k + 1, step)
+      self.value_history.extend([value * self.growth_rate ** (a - start_age) for a in ages])
+      self.ownership_history.extend([self.cap_table[0, PCT_OWNED]] * len(ages))
+      self.amt_raised_history.extend([self.amt_raised] * len(ages))
+      if self.record == 'every':
+        self.age_history.extend(ages)
+    if self.record != 'off':
+      self.path.extend(array('B', [STATE_CODES['live'], STATE_CODES['grow']]) * (k - 1))
+    if k > 1:
+      self.visited = self.visited | (1 << STATE_CODES['live'])
+
+    # The streak ends with either a death after the last grow step or a live step that chooses to pitch
+    if not truncated and self.rng.random() * p_exit < 1 - p_live:
+      self.state = 'die'
+    else:
+      self.state = 'live'
+      if limit is None or k < limit:
+        self.record_state(self.state)
+        self.try_pitch()
+    self.record_state(self.state)
+    return k
 
   # This is a helper function that retrieves the transition probabilites from the transition matrix, which stores both ints and functions. It calls the functions to generate the transition probabilities based on the current startup properties
   def get_transition_probabilities(self, state):
@@ -228,12 +402,17 @@ class Startup:
 
   def plot(self):
 
+    if self.record == 'off':
+      raise Exception('The startup was simulated with recording off, so there is no trajectory to plot. Create it with record = \'full\' to plot it.')
+
+    import matplotlib.pyplot as plt
+
     fig, host = plt.subplots()
 
     par1 = host.twinx()
 
-    p1, = host.plot(range(0,self.age + 1), self.value_history, "b-", marker ="o", label="Value")
-    p2, = par1.plot(range(0,self.age + 1), [x*100 for x in self.ownership_history],  "r-",  marker ="o", linestyle = "--", label="Founder Ownership %")
+    p1, = host.plot(self.trajectory_ages(), self.value_history, "b-", marker ="o", label="Value")
+    p2, = par1.plot(self.trajectory_ages(), [x*100 for x in self.ownership_history],  "r-",  marker ="o", linestyle = "--", label="Founder Ownership %")
 
     host.set_xlim(0, self.age)
     host.set_ylim(0, self.value+1)
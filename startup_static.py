@@ -1,43 +1,135 @@
-from definitions import FUNDRAISING_MAP, FUNDING_HISTORY_INITIALIZER, CAP_TABLE_INITIALIZER, STARTUP_STATES_STATIC
-import pandas as pd
+from definitions import FUNDRAISING_MAP, FUNDING_HISTORY_ARRAY_INITIALIZER, CAP_TABLE_ARRAY_INITIALIZER, FUNDING_HISTORY_COLUMNS, CAP_TABLE_COLUMNS, STARTUP_STATES_STATIC, STATE_CODES_STATIC, RECORDING_MODES, DEBUG
+from array import array
 import numpy as np
-import random
-from wat import wat
-import matplotlib.pyplot as plt
+from random_streams import get_rng, cumulative_probabilities, sample_index
+from cap_table import CHECK_MODES, check_interval
+
+# Column indices of the cap table array
+ACTIVE, ROUND, PCT_OWNED, VALUE = range(len(CAP_TABLE_COLUMNS))
+
+# This function returns the transition matrix of the static model for the given control preference and quality, keyed by state in STARTUP_STATES_STATIC. It works on scalars as well as on NumPy arrays of parameters, in which case each entry broadcasts over the arrays.
+def transition_matrix(control_pref, quality):
+  # UPDATE!!! Consider adding in a quality factor that determines whether the company actually is able to transition to a successful pitch state. 
+  return {'start': [0, 0.2 - quality/20.0, (1-(0.2 - quality/20.0))*(1 - control_pref), (1-(0.2 - quality/20.0))*control_pref, 0, 0, 0 ], 'die': [0, 1, 0, 0, 0, 0, 0], 'pre_seed': [0, (0.2 - quality/20.0)/2, 0, 0, (1-(0.2 - quality/20.0)/2)*(1 - control_pref), (1-(0.2 - quality/20.0)/2)*control_pref, 0], 'no_pre_seed': [0, 0.2 - quality/20.0, 0, 0, (1-(0.2 - quality/20.0))*(1 - control_pref), (1-(0.2 - quality/20.0))*control_pref, 0], 'seed': [0, (0.2 - quality/20.0)/4, 0, 0, 0, 0, 1 - (0.2 - quality/20.0)/4], 'no_seed': [0, (0.1 - quality/10.0), 0, 0, 0, 0, 1 - (0.1 - quality/10.0)], 'series_a': [0, 0, 0, 0, 0, 0, 1]} 
 
 # Thie Startup class contains the primary object that will be passed through the simulation. It contains all relevant information regarding the startup, and will be updated as the startup progresses through time.
 class Startup:
-  def __init__(self, control_pref, quality):
+  # The cap table and funding history are small NumPy arrays with one row per round in FUNDRAISING_MAP (see CAP_TABLE_COLUMNS and FUNDING_HISTORY_COLUMNS). Use to_frame() to get them as pandas DataFrames.
+  __slots__ = ('_control_pref', '_quality', 'state', 'age', 'round', 'value', 'amt_raised', 'path', 'visited', 'record', 'record_every', 'age_history', 'value_history', 'ownership_history', 'amt_raised_history', 'cap_table', 'funding_history', 'transition_matrix', 'transition_rows', 'rng', 'check')
+
+  # All random draws are taken from rng, a numpy.random.Generator. If it is not supplied, the process wide default Generator from random_streams.get_rng() is used.
+  # record sets which points of the trajectory (value_history, ownership_history, amt_raised_history and the path) are kept, see RECORDING_MODES: 'full' records every tick, 'every' every record_every ticks, 'events' only the pitches and 'off' nothing but the final values.
+  # check is the mode of the sum-to-1 check of update_cap_table(), one of cap_table.CHECK_MODES. The reference Startup checks every round by default; 'sample' only checks the first of every cap_table.SAMPLE_SIZE rounds the startup raises, counted per startup.
+  def __init__(self, control_pref, quality, rng = None, record = 'full', record_every = 1, check = 'all'):
 
     # Check that the supplied parameters are valid
     if control_pref > 1 or control_pref < 0:
       raise Exception('The control preference must be between 0 and 1. The control preference supplied was: {}'.format(control_pref))
     if quality > 1 or quality < 0:
       raise Exception('The quality must be between 0 and 1. The quality supplied was: {}'.format(quality))
+    if record not in RECORDING_MODES:
+      raise Exception('The recording mode must be one of {}. The recording mode supplied was: {}'.format(RECORDING_MODES, record))
+    if record_every < 1:
+      raise Exception('The recording interval must be at least 1. The recording interval supplied was: {}'.format(record_every))
+    if check not in CHECK_MODES:
+      raise Exception('The check must be one of {}. The check supplied was: {}'.format(CHECK_MODES, check))
 
     # Assign the initial startup properties
-    self.control_pref = control_pref
-    self.quality = quality
+    self._control_pref = control_pref
+    self._quality = quality
+    self.rng = get_rng(rng)
     self.state = STARTUP_STATES_STATIC[0]
     self.age = 0
     self.round = 0
     self.value = 0
     self.amt_raised = 0.0
-    self.state_history = [STARTUP_STATES_STATIC[0]]
-    self.value_history = [self.value] # Append at the end of a pitch or grow phase
-    self.ownership_history = [1.0] # Append at the end of a pitch or grow phase
-    self.amt_raised_history = [0.0] # Append at the end of a pitch or grow phase
-    self.cap_table = CAP_TABLE_INITIALIZER.copy()
-    self.funding_history = FUNDING_HISTORY_INITIALIZER.copy()
+    self.record = record
+    self.record_every = record_every
+    self.check = check
+    recording = record != 'off'
+    self.path = array('B', [STATE_CODES_STATIC[STARTUP_STATES_STATIC[0]]] if recording else []) # The state codes of every state the startup has been in, in order. See state_history for the decoded view.
+    self.visited = 1 << STATE_CODES_STATIC[STARTUP_STATES_STATIC[0]] # Bitmask of the state codes the startup has visited
+    self.age_history = [0] if recording and record != 'full' else [] # Only used when not every tick is recorded. See trajectory_ages().
+    self.value_history = [self.value] if recording else [] # Append at the end of a pitch or grow phase
+    self.ownership_history = [1.0] if recording else [] # Append at the end of a pitch or grow phase
+    self.amt_raised_history = [0.0] if recording else [] # Append at the end of a pitch or grow phase
+    self.cap_table = CAP_TABLE_ARRAY_INITIALIZER.copy()
+    self.funding_history = FUNDING_HISTORY_ARRAY_INITIALIZER.copy()
+
+    self.compile_transitions()
+
+  # The control preference and quality are properties so that the compiled transition rows are rebuilt (and re-validated) whenever one of them changes
+  @property
+  def control_pref(self):
+    return self._control_pref
+
+  @control_pref.setter
+  def control_pref(self, control_pref):
+    if control_pref > 1 or control_pref < 0:
+      raise Exception('The control preference must be between 0 and 1. The control preference supplied was: {}'.format(control_pref))
+    self._control_pref = control_pref
+    self.compile_transitions()
 
-    # UPDATE!!! Consider adding in a quality factor that determines whether the company actually is able to transition to a successful pitch state. 
-    self.transition_matrix = {'start': [0, 0.2 - quality/20.0, (1-(0.2 - quality/20.0))*(1 - control_pref), (1-(0.2 - quality/20.0))*control_pref, 0, 0, 0 ], 'die': [0, 1, 0, 0, 0, 0, 0], 'pre_seed': [0, (0.2 - quality/20.0)/2, 0, 0, (1-(0.2 - quality/20.0)/2)*(1 - control_pref), (1-(0.2 - quality/20.0)/2)*control_pref, 0], 'no_pre_seed': [0, 0.2 - quality/20.0, 0, 0, (1-(0.2 - quality/20.0))*(1 - control_pref), (1-(0.2 - quality/20.0))*control_pref, 0], 'seed': [0, (0.2 - quality/20.0)/4, 0, 0, 0, 0, 1 - (0.2 - quality/20.0)/4], 'no_seed': [0, (0.1 - quality/10.0), 0, 0, 0, 0, 1 - (0.1 - quality/10.0)], 'series_a': [0, 0, 0, 0, 0, 0, 1]} 
+  @property
+  def quality(self):
+    return self._quality
+
+  @quality.setter
+  def quality(self, quality):
+    if quality > 1 or quality < 0:
+      raise Exception('The quality must be between 0 and 1. The quality supplied was: {}'.format(quality))
+    self._quality = quality
+    self.compile_transitions()
+
+  # The path of the startup as a list of state names. It is decoded from the compact path of state codes on every access.
+  @property
+  def state_history(self):
+    return [STARTUP_STATES_STATIC[code] for code in self.path]
+
+  # This function appends a state to the path of the startup (unless recording is off) and marks it as visited
+  def record_state(self, state):
+    code = STATE_CODES_STATIC[state]
+    if self.record != 'off':
+      self.path.append(code)
+    self.visited = self.visited | (1 << code)
+
+  # The founder ownership of the startup. This is always up to date, whatever the recording mode.
+  @property
+  def pct_owned(self):
+    return self.cap_table[0, PCT_OWNED]
+
+  # This function appends the current value, founder ownership and amount raised to the trajectory if the recording mode asks for this point. event is True at the end of a pitch.
+  def record_trajectory(self, event):
+    record = self.record
+    if record == 'full' or (record == 'events' and event) or (record == 'every' and self.age % self.record_every == 0):
+      self.value_history.append(self.value)
+      self.ownership_history.append(self.cap_table[0, PCT_OWNED])
+      self.amt_raised_history.append(self.amt_raised)
+      if record != 'full':
+        self.age_history.append(self.age)
+
+  # This function returns the age of each point of the trajectory
+  def trajectory_ages(self):
+    return range(0, len(self.value_history)) if self.record == 'full' else self.age_history
+
+  # This function checks in constant time whether the startup has ever been in the given state
+  def has_visited(self, state):
+    return (self.visited >> STATE_CODES_STATIC[state]) & 1 == 1
+
+  # This function evaluates and validates the transition matrix once and stores each row as cumulative probabilities, so that advance() only needs one uniform draw and a binary search per transition. It is called on creation and whenever the parameters change.
+  def compile_transitions(self):
+    self.transition_matrix = transition_matrix(self._control_pref, self._quality)
+    self.transition_rows = {state: cumulative_probabilities(self.get_transition_probabilities(state)) for state in STARTUP_STATES_STATIC}
+
+  # This function samples the state that follows the given state from the compiled transition rows
+  def sample_transition(self, state):
+    return STARTUP_STATES_STATIC[sample_index(self.transition_rows[state], self.rng)]
 
   # def grow(self):
   #   # Update the value based on the current value and growth rate
   #   self.value = self.value * self.growth_rate
   #   self.value_history.append(self.value)
-  #   self.ownership_history.append(self.cap_table.at[FUNDRAISING_MAP[0],'pct_owned'])
+  #   self.ownership_history.append(self.cap_table[0, PCT_OWNED])
   #   self.amt_raised_history.append(self.amt_raised)
 
   # This function calls the functions get_round() and pitch() to determine what happens in a fundraising event. Based on the output of pitch, it updates the necessary field in the Startup object. 
@@ -53,9 +145,7 @@ class Startup:
     self.update_funding(pitch)
 
     # Update the history of the startup
-    self.value_history.append(self.value)
-    self.ownership_history.append(self.cap_table.at[FUNDRAISING_MAP[0],'pct_owned'])
-    self.amt_raised_history.append(self.amt_raised)
+    self.record_trajectory(True)
 
     return pitch
 
@@ -68,7 +158,7 @@ class Startup:
     else:
       return 3
 
-  """ This function conducts the pitch based on the round and the startup properties. It returns a dataframe containing the following information: 
+  """ This function conducts the pitch based on the round and the startup properties. It returns a tuple laid out as a row of the funding history (see FUNDING_HISTORY_COLUMNS) containing the following information: 
     success: [0,1]
     raise_round: [1,2,3]
     amt_raised: [0,inf] 
@@ -84,7 +174,7 @@ class Startup:
       amt_raised = post_money * pct_sold
       pre_money = post_money - amt_raised
     elif raise_round == 2:
-      if 'pre_seed' in self.state_history:
+      if self.has_visited('pre_seed'):
         post_money = 10 + 10 * self.quality
         pct_sold = .10 + .10 * (1 - self.quality)
         amt_raised = post_money * pct_sold
@@ -95,17 +185,18 @@ class Startup:
         amt_raised = post_money * pct_sold
         pre_money = post_money - amt_raised
     else:
-      if 'pre_seed' and 'seed' in self.state_history:
+      # The original check here was "'pre_seed' and 'seed' in self.state_history", which only tests for 'seed'
+      if self.has_visited('seed'):
         post_money = 40 + 40 * self.quality
         pct_sold = .20 + .13 * (1 - self.quality)
         amt_raised = post_money * pct_sold
         pre_money = post_money - amt_raised
-      elif 'pre_seed' in self.state_history and 'no_seed' in self.state_history:
+      elif self.has_visited('pre_seed') and self.has_visited('no_seed'):
         post_money = 25 + 40 * self.quality
         pct_sold = .20 + .13 * (1 - self.quality)
         amt_raised = post_money * pct_sold
         pre_money = post_money - amt_raised
-      elif 'no_pre_seed' in self.state_history and 'seed' in self.state_history:
+      elif self.has_visited('no_pre_seed') and self.has_visited('seed'):
         post_money = 35 + 40 * self.quality
         pct_sold = .20 + .13 * (1 - self.quality)
         amt_raised = post_money * pct_sold
@@ -120,47 +211,61 @@ class Startup:
     # If they transition to this state, then the pitch was successful.
     success = 1
 
-    # Return the result
-    key = FUNDRAISING_MAP[raise_round]
-    pitch = pd.DataFrame.from_dict({key: [success, raise_round,  pre_money, post_money, amt_raised, pct_sold]}, orient = 'index', columns = ['active','round','pre_money','post_money','amt_raised','pct_sold'])
-    return pitch
+    # Return the result as a row of the funding history
+    return (success, raise_round, pre_money, post_money, amt_raised, pct_sold)
 
   # This function udpates the funding_history based on the outcome of the pitch. If that pitch was successful, it makes a call to update_cap_table to update those numbers. 
   def update_funding(self, pitch):
 
     # Check if the pitch was successful. If it was not, then no need to update. If it was, then update funding_history and cap_table. 
-    if pitch['active'].values[0] == 0:
-      # self.funding_history.update(pitch) -- Think about whether we want a funding history that is the complete # of fundraising attempts
+    success, raise_round, pre_money, post_money, amt_raised, pct_sold = pitch
+    if success == 0:
+      # self.funding_history[raise_round] = pitch -- Think about whether we want a funding history that is the complete # of fundraising attempts
       return
     else:
-      self.funding_history.update(pitch) # This is the built in pandas dataframe update
+      self.funding_history[raise_round] = pitch
       self.update_cap_table(pitch)
-      self.value = pitch['post_money'].values[0]
-      self.round = pitch['round'].values[0]
-      self.amt_raised = self.amt_raised + pitch['amt_raised'].values[0]
+      self.value = post_money
+      self.round = raise_round
+      self.amt_raised = self.amt_raised + amt_raised
       return
 
   # This function uses the successful pitch to calculate updates to the capitalization for each of the parties invested in the startup. It updates the cap_tablepit. 
   def update_cap_table(self, pitch):
 
+    success, raise_round, pre_money, post_money, amt_raised, pct_sold = pitch
+
     # Update the round of funding that the pitch was successful for
-    self.cap_table.loc[pitch.index.values[0], 'active'] = pitch['active'].values[0]
-    self.cap_table.loc[pitch.index.values[0], 'pct_owned'] = pitch['pct_sold'].values[0]
+    self.cap_table[raise_round, ACTIVE] = success
+    self.cap_table[raise_round, PCT_OWNED] = pct_sold
 
     # Update the previous rounds' pct_owned values
-    for i in range(0, pitch['round'].values[0]):
-      self.cap_table.loc[self.cap_table['round'] == i, 'pct_owned'] = self.cap_table.loc[self.cap_table['round'] == i, 'pct_owned'].values[0] * (1 - pitch['pct_sold'].values[0])
+    self.cap_table[:raise_round, PCT_OWNED] *= (1 - pct_sold)
 
-    # Check that the pct_owned adds up to 1
-    ownership_check = sum(self.cap_table['pct_owned'])
-    if not (1.0 - 10**-6 < ownership_check < 1.0 + 10**-6):
-      print("ownership check issue")
-      wat()
-      raise Exception('The total ownership should add up to 1. The sum of all ownerhsip percecentages was: {}. The cap table is as follows (Entering Debug Mode): \n {}'.format(ownership_check, self.cap_table))
+    # Check that the pct_owned adds up to 1 (see check)
+    interval = check_interval(self.check)
+    if interval and (self.cap_table[1:, ACTIVE].sum() - 1) % interval == 0:
+      ownership_check = self.cap_table[:, PCT_OWNED].sum()
+      if not (1.0 - 10**-6 < ownership_check < 1.0 + 10**-6):
+        print("ownership check issue")
+        if DEBUG:
+          from wat import wat
+          wat()
+        raise Exception('The total ownership should add up to 1. The sum of all ownerhsip percecentages was: {}. The cap table is as follows (Entering Debug Mode): \n {}'.format(ownership_check, self.to_frame('cap_table')))
 
 
     # Update the values based on the new post_money
-    self.cap_table['value'] = self.cap_table['pct_owned'] * pitch['post_money'].values[0]
+    self.cap_table[:, VALUE] = self.cap_table[:, PCT_OWNED] * post_money
+
+  # This function returns the cap table or the funding history of the startup as a pandas DataFrame indexed by the round names in FUNDRAISING_MAP
+  def to_frame(self, table = 'cap_table'):
+    import pandas as pd
+    if table == 'cap_table':
+      return pd.DataFrame(self.cap_table, index = [FUNDRAISING_MAP[r] for r in range(len(FUNDRAISING_MAP))], columns = CAP_TABLE_COLUMNS)
+    elif table == 'funding_history':
+      return pd.DataFrame(self.funding_history, index = [FUNDRAISING_MAP[r] for r in range(len(FUNDRAISING_MAP))], columns = FUNDING_HISTORY_COLUMNS)
+    else:
+      raise Exception('The table must be either cap_table or funding_history. The table supplied was: {}'.format(table))
 
   # This function moves the startup from the current state to the next state based on the transisition probabilities. It first calls any functions that are reqruired to be run in the current state. A
   def advance(self):
@@ -169,18 +274,15 @@ class Startup:
       raise Exception('The advance() function was called on a startup that has already reached end state {}.'.format(self.state))
     else:
       self.age = self.age + 1
-      transition_probabilities = self.get_transition_probabilities(self.state)
-      new_state = np.random.choice(STARTUP_STATES_STATIC, replace = True, p = transition_probabilities)
+      new_state = self.sample_transition(self.state)
 
       if new_state == 'pre_seed' or new_state  == 'seed' or new_state == 'series_a':
         self.fundraise()
       else:
-        self.value_history.append(self.value)
-        self.ownership_history.append(self.cap_table.at[FUNDRAISING_MAP[0],'pct_owned'])
-        self.amt_raised_history.append(self.amt_raised)
+        self.record_trajectory(False)
         
       self.state = new_state
-      self.state_history.append(self.state)
+      self.record_state(self.state)
 
   # This is a helper function that retrieves the transition probabilites from the transition matrix, which stores both ints and functions. It calls the functions to generate the transition probabilities based on the current startup properties
   def get_transition_probabilities(self, state):
@@ -196,7 +298,9 @@ class Startup:
     # Check that the probabilities sum to 1
     if not (1.0 - 10**-6 < sum(probs) < 1.0 + 10**-6):
       print("Transition probabilities do not sum to 1.")
-      wat()
+      if DEBUG:
+        from wat import wat
+        wat()
       raise Exception('The probablities for state {} do not sum to 1. The sum was: {}'.format(state, sum(probs)))
 
     return probs 
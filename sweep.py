@@ -0,0 +1,128 @@
+from cohort import grid_points
+import argparse
+import json
+import sys
+
+# This module is the command line entry point of the simulations. It runs a quality x control preference sweep of the static or dynamic model and prints the analysis of each cell, e.g.
+#   python sweep.py static --q-inc 0.25 --cp-inc 0.1 --n 250
+#   python sweep.py dynamic --q-inc 0.2 --cp-inc 0.2 --n 20 --engine reference --plot
+#   python sweep.py static --q-inc 0.05 --cp-inc 0.05 --n 4 --engine sampled --points 1024 --design sobol
+#   python sweep.py dynamic --q-inc 0.25 --cp-inc 0.25 --n 250 --max-age 200
+# matplotlib is only imported with --plot, so a sweep (and every worker process) starts without it.
+
+MODELS = ['static', 'dynamic']
+ENGINES = ['cohort', 'reference', 'sampled']
+
+
+# This function runs the sweep and returns the analysis matrix in the format of simulation_analysis(). The cohort engine simulates each cell with the vectorized cohorts on workers processes (0 for this process), and the reference engine simulates Startup objects with initialize_startup_matrix(). The sampled engine simulates number_of_startups startups at each of number_of_points points of a design, and edge_startups at each edge cell, and evaluates a surrogate on the grid (see parameter_sampling.py). max_age and max_value censor the startups of the dynamic model with the cohort and reference engines (see simulate_dynamic.simulate()), and add the share of censored startups to each cell.
+def run_sweep(model, q_increment, cp_increment, number_of_startups, engine = 'cohort', workers = 0, seed = None, common_random_numbers = False, profile = None, number_of_points = 256, design = 'sobol', surrogate = 'kernel', bandwidth = 0.1, max_age = None, max_value = None, edge_startups = None):
+  if model not in MODELS:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(MODELS, model))
+  if engine not in ENGINES:
+    raise Exception('The engine must be one of {}. The engine supplied was: {}'.format(ENGINES, engine))
+  if (max_age is not None or max_value is not None) and (model == 'static' or engine == 'sampled'):
+    raise Exception('Censoring is only available for the dynamic model with the cohort and reference engines. The model and engine supplied were: {} and {}'.format(model, engine))
+  if profile is not None and engine != 'reference':
+    raise Exception('Only the reference engine is instrumented, so a Profile needs engine = \'reference\'. The engine supplied was: {}'.format(engine))
+
+  if engine == 'cohort':
+    from parallel_sweep import parallel_startup_matrix
+    return parallel_startup_matrix(model, q_increment, cp_increment, number_of_startups, workers = workers, seed = seed, common_random_numbers = common_random_numbers, max_age = max_age, max_value = max_value)
+
+  if engine == 'sampled':
+    from parameter_sampling import sampled_startup_matrix
+    return sampled_startup_matrix(model, q_increment, cp_increment, number_of_points, number_of_startups, design, surrogate, bandwidth, seed, edge_startups = edge_startups)
+
+  if model == 'static':
+    import simulate_static
+    startup_matrix = simulate_static.initialize_startup_matrix(q_increment, cp_increment, number_of_startups, seed, common_random_numbers, record = 'off', profile = profile)
+    return simulate_static.simulation_analysis(startup_matrix, profile)
+
+  if q_increment != cp_increment:
+    raise Exception('The reference engine of the dynamic model needs the same quality and control preference increment. The increments supplied were: {} and {}'.format(q_increment, cp_increment))
+  import simulate_dynamic
+  startup_matrix = simulate_dynamic.initialize_startup_matrix(q_increment, number_of_startups, seed, common_random_numbers, record = 'off', profile = profile, max_age = max_age, max_value = max_value)
+  return simulate_dynamic.simulation_analysis(startup_matrix, profile)
+
+
+# This function converts one cell of an analysis matrix into a dict, for printing or writing as JSON. The cells of the dynamic model also have the share of censored startups.
+def cell_record(quality, control_pref, cell):
+  record = {
+    'quality': float(quality),
+    'control_pref': float(control_pref),
+    'value_mean': float(cell[0][0]), 'value_stdev': float(cell[0][1]),
+    'ownership_mean': float(cell[1][0]), 'ownership_stdev': float(cell[1][1]),
+    'age_mean': float(cell[2][0]), 'age_stdev': float(cell[2][1]),
+    'survival': float(cell[3]),
+  }
+  if len(cell) > 4:
+    record['censored'] = float(cell[4])
+  return record
+
+
+# This function converts an analysis matrix into a list of one dict per cell (see cell_record())
+def analysis_records(analysis, q_increment, cp_increment):
+  records = []
+  for quality, row in zip(grid_points(q_increment), analysis):
+    for control_pref, cell in zip(grid_points(cp_increment), row):
+      records.append(cell_record(quality, control_pref, cell))
+  return records
+
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(prog = 'sweep', description = 'Run a quality x control preference sweep of the fundraising simulation.')
+  parser.add_argument('model', choices = MODELS)
+  parser.add_argument('--q-inc', type = float, default = 0.25, help = 'the quality increment of the grid')
+  parser.add_argument('--cp-inc', type = float, default = 0.1, help = 'the control preference increment of the grid')
+  parser.add_argument('--n', type = int, default = 250, help = 'the number of startups per cell (per point with --engine sampled)')
+  parser.add_argument('--engine', choices = ENGINES, default = 'cohort')
+  parser.add_argument('--points', type = int, default = 256, help = 'the number of points of the design of the sampled engine')
+  parser.add_argument('--design', choices = ['sobol', 'lhs', 'random'], default = 'sobol', help = 'the design of the sampled engine')
+  parser.add_argument('--surrogate', choices = ['kernel', 'binned'], default = 'kernel', help = 'the surrogate of the sampled engine')
+  parser.add_argument('--bandwidth', type = float, default = 0.1, help = 'the kernel bandwidth of the sampled engine')
+  parser.add_argument('--edge-startups', type = int, help = 'the startups simulated at each edge cell of the grid by the sampled engine')
+  parser.add_argument('--max-age', type = int, help = 'censor the startups of the dynamic model that reach this age before an end state')
+  parser.add_argument('--max-value', type = float, help = 'censor the startups of the dynamic model that reach this value before an end state')
+  parser.add_argument('--workers', type = int, default = 0, help = 'worker processes of the cohort engine (0 runs the sweep in this process)')
+  parser.add_argument('--seed', type = int)
+  parser.add_argument('--common-random-numbers', action = 'store_true')
+  parser.add_argument('--output', help = 'write the analysis of each cell to this JSON file')
+  parser.add_argument('--profile', action = 'store_true', help = 'print the timers and counters of the sweep (reference engine only)')
+  parser.add_argument('--plot', action = 'store_true', help = 'plot the analysis with matplotlib')
+  args = parser.parse_args(argv)
+  if args.profile and args.engine != 'reference':
+    parser.error('--profile needs --engine reference, since the {} engine is not instrumented'.format(args.engine))
+
+  profile = None
+  if args.profile:
+    from instrumentation import Profile
+    profile = Profile()
+
+  analysis = run_sweep(args.model, args.q_inc, args.cp_inc, args.n, args.engine, args.workers, args.seed, args.common_random_numbers, profile, args.points, args.design, args.surrogate, args.bandwidth, args.max_age, args.max_value, args.edge_startups)
+  records = analysis_records(analysis, args.q_inc, args.cp_inc)
+
+  censoring = args.max_age is not None or args.max_value is not None
+  print('{:>8} {:>12} {:>10} {:>10} {:>10} {:>10}'.format('quality', 'control_pref', 'survival', 'value', 'ownership', 'age') + (' {:>10}'.format('censored') if censoring else ''))
+  for record in records:
+    print('{quality:>8.3f} {control_pref:>12.3f} {survival:>10.3f} {value_mean:>10.3f} {ownership_mean:>10.3f} {age_mean:>10.2f}'.format(**record) + (' {censored:>10.3f}'.format(**record) if censoring else ''))
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump({'model': args.model, 'engine': args.engine, 'n': args.n, 'seed': args.seed, 'cells': records}, f, indent = 2)
+  if profile is not None:
+    print(profile.report())
+
+  if args.plot:
+    if args.model == 'static':
+      from simulate_static import plot_analysis
+      plot_analysis(args.q_inc, args.cp_inc, analysis)
+    else:
+      if args.q_inc != args.cp_inc:
+        raise Exception('The plot of the dynamic model needs the same quality and control preference increment. The increments supplied were: {} and {}'.format(args.q_inc, args.cp_inc))
+      from simulate_dynamic import plot_analysis
+      plot_analysis(args.q_inc, analysis)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
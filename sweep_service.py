@@ -0,0 +1,380 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from cohort import grid_points
+from parallel_sweep import MODELS, simulate_cells
+from random_streams import cell_seed_sequences
+from sweep import cell_record
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import sys
+
+# This module is a sweep service that several analysts can share on one machine. It accepts sweep specs (model, grid increments, startups per cell, seed, and optionally common_random_numbers, max_age and max_value), runs each sweep as a job whose cells are scheduled onto one shared process pool, and streams the analysis of every cell as it finishes, e.g.
+#   python sweep_service.py --port 8765 --workers 8
+#   curl -X POST localhost:8765/jobs -d '{"model": "dynamic", "q_increment": 0.25, "cp_increment": 0.25, "number_of_startups": 500, "seed": 1}'
+#   curl localhost:8765/jobs/1/events
+#   curl -X DELETE localhost:8765/jobs/1
+# The cells of concurrent jobs take turns on the pool, so a large sweep does not hold up a small one. A job gives the same results as parallel_startup_matrix() with the same spec. A spec that is already running or has finished is served by the existing job rather than simulated again, as long as it has a seed (results without one cannot be repeated). The service can also be used in process (see SweepService), e.g. from a notebook's event loop.
+#
+# The HTTP interface is plain HTTP/1.1 with one request per connection:
+#   POST /jobs                submit a spec (a JSON object), returns the job
+#   GET /jobs                 the status of every job
+#   GET /jobs/<id>            the status of a job, with the records of its finished cells
+#   GET /jobs/<id>/events     the events of a job as newline delimited JSON, from its first cell until it ends
+#   DELETE /jobs/<id>         cancel a job
+
+JOB_STATES = ['queued', 'running', 'done', 'cancelled', 'failed']
+END_JOB_STATES = ['done', 'cancelled', 'failed']
+SPEC_DEFAULTS = {'common_random_numbers': False, 'max_age': None, 'max_value': None}
+
+
+# This function checks a sweep spec and returns it with the defaults of SPEC_DEFAULTS filled in, so that equal sweeps have equal specs
+def normalize_spec(spec):
+  required = ['model', 'q_increment', 'cp_increment', 'number_of_startups', 'seed']
+  missing = [key for key in required if key not in spec]
+  if missing:
+    raise Exception('The sweep spec is missing {}. The spec supplied was: {}'.format(missing, spec))
+  unknown = [key for key in spec if key not in required and key not in SPEC_DEFAULTS]
+  if unknown:
+    raise Exception('The sweep spec has unknown keys {}. The keys must be among {}'.format(unknown, required + list(SPEC_DEFAULTS)))
+
+  normalized = dict(SPEC_DEFAULTS)
+  normalized.update(spec)
+  if normalized['model'] not in MODELS:
+    raise Exception('The model must be one of {}. The model supplied was: {}'.format(MODELS, normalized['model']))
+  for key in ['q_increment', 'cp_increment']:
+    if not 0 < normalized[key] <= 1:
+      raise Exception('The {} must be in (0, 1]. The increment supplied was: {}'.format(key, normalized[key]))
+  if int(normalized['number_of_startups']) != normalized['number_of_startups'] or normalized['number_of_startups'] < 1:
+    raise Exception('The number of startups must be a positive integer. The number supplied was: {}'.format(normalized['number_of_startups']))
+  if normalized['model'] == 'static' and (normalized['max_age'] is not None or normalized['max_value'] is not None):
+    raise Exception('The static model always reaches an end state within a few ticks, so it cannot be censored. The max_age and max_value supplied were: {}, {}'.format(normalized['max_age'], normalized['max_value']))
+  normalized['number_of_startups'] = int(normalized['number_of_startups'])
+  normalized['common_random_numbers'] = bool(normalized['common_random_numbers'])
+  return normalized
+
+
+# This function returns the key that identifies the results of a normalized spec
+def spec_key(spec):
+  return hashlib.sha256(json.dumps(spec, sort_keys = True).encode()).hexdigest()
+
+
+# The SweepJob class is one submitted sweep. It keeps the analysis of each finished cell and the events of the job (one per finished cell, and a last one when it ends), which are replayed to every subscriber of events() so that a subscriber that arrives late still sees the whole job.
+class SweepJob:
+  def __init__(self, job_id, spec):
+    self.id = job_id
+    self.spec = spec
+    self.key = spec_key(spec)
+    self.state = 'queued'
+    self.error = None
+    self.qualities = grid_points(spec['q_increment'])
+    self.control_prefs = grid_points(spec['cp_increment'])
+    self.total = len(self.qualities) * len(self.control_prefs)
+    self.done = 0
+    self.analysis = [[None] * len(self.control_prefs) for _ in self.qualities]
+    self.history = []
+    self.subscribers = []
+    self.task = None
+
+  # This function returns the spec as the list of cells that parallel_sweep.simulate_cells() takes, with the same random streams as parallel_startup_matrix()
+  def cells(self):
+    seed_sequences = cell_seed_sequences(self.spec['seed'], self.total, self.spec['common_random_numbers'])
+    cells = []
+    for i, quality in enumerate(self.qualities):
+      for j, control_pref in enumerate(self.control_prefs):
+        cells.append((i, j, quality, control_pref, self.spec['number_of_startups'], seed_sequences[i * len(self.control_prefs) + j]))
+    return cells
+
+  # This function returns the status of the job as a dict. With records, the records of the finished cells are included (see sweep.cell_record()).
+  def status(self, records = False):
+    status = {'job': self.id, 'state': self.state, 'done': self.done, 'total': self.total, 'spec': self.spec}
+    if self.error is not None:
+      status['error'] = self.error
+    if records:
+      status['cells'] = [cell_record(self.qualities[i], self.control_prefs[j], cell) for i, row in enumerate(self.analysis) for j, cell in enumerate(row) if cell is not None]
+    return status
+
+  # This function records an event and sends it to every subscriber
+  def publish(self, event):
+    self.history.append(event)
+    for queue in self.subscribers:
+      queue.put_nowait(event)
+
+  # This function stores the analysis of a finished cell and publishes it
+  def finish_cell(self, i, j, cell):
+    self.analysis[i][j] = cell
+    self.done = self.done + 1
+    self.publish({'event': 'cell', 'job': self.id, 'i': i, 'j': j, 'done': self.done, 'total': self.total, 'cell': cell_record(self.qualities[i], self.control_prefs[j], cell)})
+
+  # This function moves the job to an end state and publishes it
+  def end(self, state, error = None):
+    self.state = state
+    self.error = error
+    event = {'event': state, 'job': self.id, 'done': self.done, 'total': self.total}
+    if error is not None:
+      event['error'] = error
+    self.publish(event)
+
+  # This function yields every event of the job, from its first cell until it ends, as they happen
+  async def events(self):
+    queue = asyncio.Queue()
+    for event in self.history:
+      queue.put_nowait(event)
+    self.subscribers.append(queue)
+    try:
+      while True:
+        event = await queue.get()
+        yield event
+        if event['event'] in END_JOB_STATES:
+          return
+    finally:
+      self.subscribers.remove(queue)
+
+  # This function waits for the job to end and returns its analysis matrix in the format of simulation_analysis()
+  async def result(self):
+    async for event in self.events():
+      pass
+    if self.state != 'done':
+      raise Exception('Job {} ended in the state {}. {}'.format(self.id, self.state, self.error or ''))
+    return self.analysis
+
+
+""" The SweepService class runs the submitted jobs on one shared pool of worker processes. The parameters are:
+  workers: the number of worker processes (defaults to the number of cores). With 0 the cells are simulated in threads of this process.
+  cache_size: the number of ended jobs that are kept, and whose results serve repeated specs
+Each job runs as an asyncio task of the event loop the service is used from. At most workers cells are simulated at a time, and the jobs wait for a free worker in turn, cell by cell.
+"""
+class SweepService:
+  def __init__(self, workers = None, cache_size = 64):
+    self.workers = os.cpu_count() if workers is None else workers
+    self.executor = None if self.workers == 0 else ProcessPoolExecutor(max_workers = self.workers)
+    self.slots = None
+    self.cache_size = cache_size
+    self.jobs = OrderedDict()
+    self.results = OrderedDict()
+    self.ids = itertools.count(1)
+
+  # This function returns the job that holds the results of a seeded spec, if it is running or among the cached results, and None otherwise
+  def lookup(self, spec):
+    spec = normalize_spec(spec)
+    if spec['seed'] is None:
+      return None
+    return self.results.get(spec_key(spec))
+
+  # This function submits a spec and returns its job. A seeded spec that is running or among the cached results returns the existing job (see lookup()).
+  def submit(self, spec):
+    existing = self.lookup(spec)
+    if existing is not None:
+      return existing
+
+    job = SweepJob(next(self.ids), normalize_spec(spec))
+    self.jobs[job.id] = job
+    if job.spec['seed'] is not None:
+      self.results[job.key] = job
+    job.task = asyncio.get_running_loop().create_task(self.run(job))
+    job.task.add_done_callback(lambda task: self.finished(job))
+    return job
+
+  # This function is called when a job ends, and again when its task is done, for a job that was cancelled before it started. It ends such a job, and drops the results of a job that did not finish from the cache.
+  def finished(self, job):
+    if job.state not in END_JOB_STATES:
+      job.end('cancelled')
+    if job.state != 'done' and self.results.get(job.key) is job:
+      del self.results[job.key]
+    self.evict()
+
+  # This function drops the oldest ended jobs beyond cache_size
+  def evict(self):
+    ended = [job for job in self.jobs.values() if job.state in END_JOB_STATES]
+    for job in ended[:max(len(ended) - self.cache_size, 0)]:
+      del self.jobs[job.id]
+      if self.results.get(job.key) is job:
+        del self.results[job.key]
+
+  # This function is one lane of a job. It takes the cells of the job one at a time, waits for a free worker for each and simulates it there. The waiting lanes of every job are woken in turn, so the cells of concurrent jobs take turns on the pool.
+  async def lane(self, job, cells):
+    loop = asyncio.get_running_loop()
+    while cells:
+      async with self.slots:
+        if not cells:
+          return
+        cell = cells.popleft()
+        [(i, j, result)] = await loop.run_in_executor(self.executor, simulate_cells, job.spec['model'], [cell], 'analysis', job.spec['max_age'], job.spec['max_value'])
+        job.finish_cell(i, j, result)
+
+  # This function runs a job until every cell has finished, it is cancelled or a cell fails. Each job has up to one lane per worker.
+  async def run(self, job):
+    if self.slots is None:
+      self.slots = asyncio.Semaphore(max(self.workers, 1))
+    job.state = 'running'
+    cells = deque(job.cells())
+    tasks = [asyncio.ensure_future(self.lane(job, cells)) for _ in range(min(max(self.workers, 1), len(cells)))]
+    try:
+      await asyncio.gather(*tasks)
+      job.end('done')
+    except asyncio.CancelledError:
+      job.end('cancelled')
+    except Exception as e:
+      job.end('failed', '{}: {}'.format(type(e).__name__, e))
+    finally:
+      for task in tasks:
+        task.cancel()
+      self.finished(job)
+
+  # This function cancels a job. The cells that are being simulated finish on their worker, but no further cells of the job are started.
+  def cancel(self, job_id):
+    job = self.job(job_id)
+    if job.state not in END_JOB_STATES:
+      job.task.cancel()
+    return job
+
+  # This function returns the job with the given id
+  def job(self, job_id):
+    if job_id not in self.jobs:
+      raise KeyError('There is no job {}'.format(job_id))
+    return self.jobs[job_id]
+
+  # This function cancels every running job and shuts the pool down
+  async def close(self):
+    tasks = [job.task for job in self.jobs.values() if job.state not in END_JOB_STATES]
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions = True)
+    if self.executor is not None:
+      self.executor.shutdown()
+
+
+# This helper writes an HTTP response with a JSON body
+async def write_json(writer, status, body):
+  data = json.dumps(body).encode()
+  reason = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+  writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(status, reason, len(data)).encode() + data)
+  await writer.drain()
+
+
+# This function handles one HTTP connection to the service (see the routes at the top of the module)
+async def handle_connection(service, reader, writer):
+  try:
+    request_line = (await reader.readline()).decode().split()
+    if len(request_line) < 2:
+      return
+    method, path = request_line[0], request_line[1].rstrip('/')
+    headers = {}
+    while True:
+      line = (await reader.readline()).decode().strip()
+      if not line:
+        break
+      name, _, value = line.partition(':')
+      headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    parts = path.strip('/').split('/')
+
+    try:
+      if parts == ['jobs'] and method == 'POST':
+        spec = json.loads(body)
+        cached = service.lookup(spec) is not None
+        status = service.submit(spec).status()
+        status['cached'] = cached
+        await write_json(writer, 200 if cached else 201, status)
+      elif parts == ['jobs'] and method == 'GET':
+        await write_json(writer, 200, [job.status() for job in service.jobs.values()])
+      elif len(parts) in [2, 3] and parts[0] == 'jobs':
+        job = service.job(int(parts[1]))
+        if len(parts) == 3 and parts[2] == 'events' and method == 'GET':
+          writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n')
+          await writer.drain()
+          async for event in job.events():
+            writer.write(json.dumps(event).encode() + b'\n')
+            await writer.drain()
+        elif len(parts) == 2 and method == 'GET':
+          await write_json(writer, 200, job.status(records = True))
+        elif len(parts) == 2 and method == 'DELETE':
+          await write_json(writer, 200, service.cancel(job.id).status())
+        else:
+          await write_json(writer, 405, {'error': 'The method {} is not supported for {}'.format(method, path)})
+      else:
+        await write_json(writer, 404, {'error': 'There is no route {} {}'.format(method, path)})
+    except (KeyError, ValueError) as e:
+      await write_json(writer, 404 if isinstance(e, KeyError) else 400, {'error': str(e)})
+    except Exception as e:
+      await write_json(writer, 400, {'error': str(e)})
+  except (ConnectionError, asyncio.IncompleteReadError):
+    # The client went away, e.g. it stopped following the events of a job
+    pass
+  finally:
+    writer.close()
+
+
+# This function starts the HTTP server of a service on a TCP port, or on a Unix socket if path is given, and returns the asyncio Server
+async def start_server(service, host = '127.0.0.1', port = 8765, path = None):
+  handler = lambda reader, writer: handle_connection(service, reader, writer)
+  if path is not None:
+    return await asyncio.start_unix_server(handler, path = path)
+  return await asyncio.start_server(handler, host, port)
+
+
+# This function runs the service until it is interrupted
+async def serve(workers = None, host = '127.0.0.1', port = 8765, path = None, cache_size = 64):
+  service = SweepService(workers, cache_size)
+  server = await start_server(service, host, port, path)
+  print('Serving sweeps on {} with {} workers'.format(path or '{}:{}'.format(host, port), service.workers))
+  try:
+    async with server:
+      await server.serve_forever()
+  finally:
+    await service.close()
+
+
+# This function sends one request to a service and returns the decoded JSON response. For the events of a job use job_events().
+async def request(method, path, body = None, host = '127.0.0.1', port = 8765, socket_path = None):
+  reader, writer = await (asyncio.open_unix_connection(socket_path) if socket_path is not None else asyncio.open_connection(host, port))
+  data = b'' if body is None else json.dumps(body).encode()
+  writer.write('{} {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(method, path, host, len(data)).encode() + data)
+  await writer.drain()
+  response = await reader.read()
+  writer.close()
+  head, _, content = response.partition(b'\r\n\r\n')
+  status = int(head.split()[1])
+  result = json.loads(content)
+  if status >= 400:
+    raise Exception('The service answered {} {} with {}: {}'.format(method, path, status, result.get('error')))
+  return result
+
+
+# This function yields the events of a job of a service as they are streamed
+async def job_events(job_id, host = '127.0.0.1', port = 8765, socket_path = None):
+  reader, writer = await (asyncio.open_unix_connection(socket_path) if socket_path is not None else asyncio.open_connection(host, port))
+  writer.write('GET /jobs/{}/events HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n'.format(job_id, host).encode())
+  await writer.drain()
+  try:
+    status = int((await reader.readline()).split()[1])
+    while (await reader.readline()).strip():
+      pass
+    if status != 200:
+      raise Exception('The service answered the events of job {} with {}: {}'.format(job_id, status, json.loads(await reader.read()).get('error')))
+    async for line in reader:
+      yield json.loads(line)
+  finally:
+    writer.close()
+
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(prog = 'sweep_service', description = 'Serve sweeps of the fundraising simulation over HTTP.')
+  parser.add_argument('--host', default = '127.0.0.1')
+  parser.add_argument('--port', type = int, default = 8765)
+  parser.add_argument('--unix', help = 'serve on this Unix socket instead of a TCP port')
+  parser.add_argument('--workers', type = int, help = 'worker processes shared by every job (defaults to the number of cores, 0 simulates in threads of the service)')
+  parser.add_argument('--cache-size', type = int, default = 64, help = 'the number of ended sweeps kept to serve repeated specs')
+  args = parser.parse_args(argv)
+  try:
+    asyncio.run(serve(args.workers, args.host, args.port, args.unix, args.cache_size))
+  except KeyboardInterrupt:
+    pass
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,66 @@
+from accumulators import CellAccumulator, QuantileSketch, RunningStats
+import numpy as np
+import pytest
+import statistics
+
+# These tests check the running accumulators against NumPy and statistics on fixed seed samples.
+
+
+@pytest.mark.parametrize('p', [0.1, 0.5, 0.9])
+@pytest.mark.parametrize('distribution', ['normal', 'exponential', 'uniform'])
+def test_quantile_sketch_matches_percentile(p, distribution):
+  xs = getattr(np.random.default_rng(8), distribution)(size = 20000)
+  sketch = QuantileSketch(p)
+  for x in xs:
+    sketch.add(x)
+  # The estimate is within a small fraction of the spread of the sample
+  assert abs(sketch.value() - np.percentile(xs, 100 * p)) < 0.02 * np.std(xs)
+
+
+def test_quantile_sketch_is_exact_for_few_observations():
+  xs = [3.0, 1.0, 4.0]
+  sketch = QuantileSketch(0.25)
+  for x in xs:
+    sketch.add(x)
+  assert sketch.value() == np.percentile(xs, 25)
+
+
+def test_running_stats_matches_statistics():
+  xs = np.random.default_rng(1).lognormal(size = 1000)
+  stats = RunningStats()
+  for x in xs:
+    stats.add(x)
+  assert stats.mean == pytest.approx(statistics.mean(xs), rel = 10**-12)
+  assert stats.stdev() == pytest.approx(statistics.stdev(xs), rel = 10**-10)
+
+
+@pytest.mark.parametrize('split', [0, 1, 250, 999, 1000])
+def test_merge_matches_one_accumulator(split):
+  xs = np.random.default_rng(2).normal(5.0, 3.0, size = 1000)
+  combined = RunningStats()
+  for x in xs:
+    combined.add(x)
+  first = RunningStats()
+  for x in xs[:split]:
+    first.add(x)
+  second = RunningStats().add_batch(xs[split:])
+  merged = first.merge(second)
+  assert merged.count == combined.count
+  assert merged.mean == pytest.approx(combined.mean, rel = 10**-12)
+  assert merged.variance() == pytest.approx(combined.variance(), rel = 10**-10)
+
+
+def test_cell_accumulator_analysis():
+  rng = np.random.default_rng(3)
+  value, ownership, age = rng.exponential(10, 500), rng.uniform(size = 500), rng.integers(1, 30, 500)
+  survived = rng.random(500) < 0.3
+  censored = rng.random(500) < 0.1
+  cell = CellAccumulator()
+  for k in range(500):
+    cell.add(value[k], ownership[k], age[k], survived[k], censored[k])
+  analysis = cell.analysis()
+  assert analysis[0][0] == pytest.approx(np.mean(value))
+  assert analysis[0][1] == pytest.approx(statistics.stdev(value))
+  assert analysis[2][3] == pytest.approx(np.percentile(age, 90), abs = 1.5)
+  assert analysis[3] == pytest.approx(np.mean(survived))
+  assert cell.censored_share() == pytest.approx(np.mean(censored))
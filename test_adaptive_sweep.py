@@ -0,0 +1,70 @@
+from adaptive_sweep import adaptive_analysis, adaptive_startup_matrix, sample_counts, simulate_adaptive_cell
+from cohort import grid_points, outcome_analysis
+from random_streams import cell_rngs
+from statistics import NormalDist
+import cohort_dynamic
+import numpy as np
+import pytest
+
+# These tests check that each cell of the adaptive sweep stops at the first batch that meets its confidence interval targets, and that its statistics are those of all the startups it simulated.
+
+Z = NormalDist().inv_cdf(0.975)
+TOLERANCES = {'survival': 0.03, 'value': 1.0, 'ownership': 0.02}
+
+
+def sweep(**kwargs):
+  return adaptive_startup_matrix('dynamic', 0.5, 0.5, survival_tolerance = TOLERANCES['survival'], value_tolerance = TOLERANCES['value'], ownership_tolerance = TOLERANCES['ownership'], batch_size = 50, min_startups = 100, max_startups = 3000, seed = 1, **kwargs)
+
+
+def test_cells_stop_at_the_ci_target():
+  matrix = sweep()
+  counts = sample_counts(matrix)
+  rngs = iter(cell_rngs(1, 9))
+  for quality, row in zip(grid_points(0.5), matrix):
+    for control_pref, cell in zip(grid_points(0.5), row):
+      rng = next(rngs)
+      assert cell.count >= 100 and cell.count % 50 == 0
+      assert cell.count == 3000 or cell.converged(Z, TOLERANCES)
+      if cell.count > 100:
+        # With one batch less, the same cell had not converged yet
+        earlier = simulate_adaptive_cell('dynamic', control_pref, quality, np.random.default_rng(rng.bit_generator.seed_seq), TOLERANCES, Z, 50, 100, cell.count - 50)
+        assert not earlier.converged(Z, TOLERANCES)
+  # The cells do not all need the same number of startups
+  assert len({count for row in counts for count in row}) > 1
+
+
+def test_tighter_targets_need_more_startups():
+  loose = sum(sum(row) for row in sample_counts(sweep()))
+  tight = sum(sum(row) for row in sample_counts(adaptive_startup_matrix('dynamic', 0.5, 0.5, survival_tolerance = 0.01, value_tolerance = 0.5, ownership_tolerance = 0.01, batch_size = 50, min_startups = 100, max_startups = 3000, seed = 1)))
+  assert tight > loose
+
+
+def test_cell_statistics_match_its_batches():
+  rng = np.random.default_rng(5)
+  cell = simulate_adaptive_cell('dynamic', 0.5, 0.5, rng, TOLERANCES, Z, 50, 100, 400, max_age = 20)
+  rng = np.random.default_rng(5)
+  batches = [cohort_dynamic.simulate_cohort(cohort_dynamic.StartupCohort(0.5, 0.5, 50, rng, max_age = 20)) for _ in range(cell.count // 50)]
+  outcomes = [np.concatenate(arrays) for arrays in zip(*[batch.outcomes() for batch in batches])]
+  expected = outcome_analysis(*outcomes)
+  analysis = cell.analysis()
+  for k in range(3):
+    assert analysis[k] == pytest.approx(expected[k])
+  assert analysis[3] == pytest.approx(expected[3])
+  assert analysis[4] == pytest.approx(np.mean(np.concatenate([batch.state for batch in batches]) == cohort_dynamic.CENSORED))
+
+
+def test_budget_caps_every_cell():
+  matrix = adaptive_startup_matrix('static', 0.5, 0.5, survival_tolerance = 0.0001, batch_size = 20, min_startups = 20, max_startups = 60, seed = 1)
+  assert sample_counts(matrix) == [[60] * 3] * 3
+  assert {len(cell) for row in adaptive_analysis(matrix) for cell in row} == {4}
+
+
+def test_bad_arguments_are_rejected():
+  with pytest.raises(Exception):
+    adaptive_startup_matrix('unknown', 0.5, 0.5)
+  with pytest.raises(Exception):
+    adaptive_startup_matrix('dynamic', 0.5, 0.5, confidence = 1.0)
+  with pytest.raises(Exception):
+    adaptive_startup_matrix('dynamic', 0.5, 0.5, batch_size = 100, max_startups = 50)
+  with pytest.raises(Exception):
+    adaptive_startup_matrix('static', 0.5, 0.5, max_age = 10)
@@ -0,0 +1,60 @@
+from analysis import grouped_analysis, matrix_analysis, to_matrix
+from cohort_dynamic import initialize_cohort_matrix
+import numpy as np
+import pytest
+import simulate_dynamic
+import simulate_static
+
+# These tests check the grouped NumPy analysis against simulation_analysis() of the reference sweeps, and its quantiles against np.percentile.
+
+
+def assert_cells_equal(matrix, expected):
+  assert len(matrix) == len(expected)
+  for row, expected_row in zip(matrix, expected):
+    assert len(row) == len(expected_row)
+    for cell, expected_cell in zip(row, expected_row):
+      assert len(cell) == len(expected_cell)
+      for k in range(3):
+        assert cell[k] == pytest.approx(expected_cell[k])
+      assert cell[3:] == pytest.approx(expected_cell[3:])
+
+
+def test_static_matches_simulation_analysis():
+  matrix = simulate_static.initialize_startup_matrix(0.5, 0.25, 60, seed = 1, record = 'off')
+  frame = matrix_analysis('static', matrix)
+  assert_cells_equal(to_matrix(frame), simulate_static.simulation_analysis(matrix))
+  assert list(frame['count']) == [60] * 15
+
+
+def test_dynamic_matches_simulation_analysis():
+  matrix = simulate_dynamic.initialize_startup_matrix(0.5, 60, seed = 1, skip_ahead = True, record = 'off', max_age = 30)
+  assert_cells_equal(to_matrix(matrix_analysis('dynamic', matrix)), simulate_dynamic.simulation_analysis(matrix))
+  cohorts = initialize_cohort_matrix(0.5, 60, seed = 1)
+  assert_cells_equal(to_matrix(matrix_analysis('dynamic', cohorts)), simulate_dynamic.simulation_analysis(cohorts))
+
+
+def test_quantiles_match_np_percentile():
+  rng = np.random.default_rng(3)
+  n = 1001
+  quality = rng.choice([0.0, 0.5, 1.0], n)
+  control_pref = rng.choice([0.25, 0.75], n)
+  columns = {'state': rng.choice([3, 8, 10], n).astype(np.uint8), 'age': rng.integers(1, 100, n), 'value': rng.lognormal(size = n), 'pct_owned': rng.random(n)}
+  frame = grouped_analysis('dynamic', quality, control_pref, columns, quantiles = (0.05, 0.5, 0.9))
+  survived = columns['state'] == 8
+  for (q, cp), cell in frame.iterrows():
+    group = (quality == q) & (control_pref == cp)
+    assert cell['count'] == group.sum()
+    value = np.where(survived, columns['value'], 0)[group]
+    assert [cell['value_p5'], cell['value_p50'], cell['value_p90']] == pytest.approx(np.percentile(value, [5, 50, 90]))
+    assert cell['age_p50'] == pytest.approx(np.percentile(columns['age'][group], 50))
+    assert cell['value_stdev'] == pytest.approx(np.std(value, ddof = 1))
+    assert cell['censored'] == pytest.approx(np.mean(columns['state'][group] == 10))
+
+
+def test_empty_cells_are_dropped():
+  columns = {'state': np.array([3, 8, 8], dtype = np.uint8), 'age': np.array([1, 2, 3]), 'value': np.array([1.0, 2.0, 3.0]), 'pct_owned': np.array([1.0, 0.5, 0.25])}
+  frame = grouped_analysis('dynamic', np.array([0.0, 0.0, 1.0]), np.array([0.0, 1.0, 1.0]), columns)
+  assert list(frame.index) == [(0.0, 0.0), (0.0, 1.0), (1.0, 1.0)]
+  assert list(frame['survival']) == [0.0, 1.0, 1.0]
+  with pytest.raises(Exception):
+    grouped_analysis('unknown', np.zeros(3), np.zeros(3), columns)
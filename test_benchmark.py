@@ -0,0 +1,43 @@
+import benchmark
+import json
+import numpy as np
+import pytest
+
+# These tests run the benchmark harness on a tiny workload and check its JSON report and the comparison with a baseline.
+
+ARGS = ['--n', '5', '--sweep-n', '3', '--q-inc', '1', '--cp-inc', '1', '--repeat', '1']
+
+
+def test_report_covers_every_benchmark(tmp_path):
+  path = str(tmp_path / 'bench.json')
+  assert benchmark.main(ARGS + ['--output', path]) == 0
+  with open(path) as f:
+    report = json.load(f)
+  assert report['metadata']['parameters']['n'] == 5
+  expected = [(model, name) for model in benchmark.MODELS for name, _, _ in benchmark.benchmarks(model, 1, 1)]
+  assert [(r['model'], r['benchmark']) for r in report['results']] == expected
+  for result in report['results']:
+    assert result['startups'] == (3 * 4 if result['benchmark'].endswith('sweep') else 5)
+    assert result['seconds'] > 0 and result['startups_per_second'] > 0
+    assert result['peak_traced_bytes_per_startup'] >= 0
+
+
+def test_compare_reports_regressions(tmp_path):
+  results = [{'model': 'static', 'benchmark': 'init', 'startups_per_second': 100.0, 'ticks_per_second': None}, {'model': 'static', 'benchmark': 'simulate', 'startups_per_second': 100.0, 'ticks_per_second': 300.0}]
+  baseline = {'results': [dict(results[0], startups_per_second = 150.0), dict(results[1], ticks_per_second = 330.0)]}
+  assert benchmark.compare(baseline, results) == [('static', 'init', 'startups_per_second', 150.0, 100.0)]
+  assert benchmark.compare(baseline, results, tolerance = 0.5) == []
+  assert benchmark.compare({'results': []}, results) == []
+
+  # main() exits with status 1 when a benchmark is slower than the baseline
+  path = str(tmp_path / 'baseline.json')
+  with open(path, 'w') as f:
+    json.dump({'results': [{'model': 'static', 'benchmark': 'init', 'startups_per_second': float('1e30'), 'ticks_per_second': None}]}, f)
+  assert benchmark.main(ARGS + ['--model', 'static', '--only', 'init', '--compare', path]) == 1
+
+
+@pytest.mark.parametrize('model', benchmark.MODELS)
+def test_run_startup_reaches_an_end_state(model):
+  startup = benchmark.startup_class(model)(0.5, 0.5, np.random.default_rng(1), record = 'off')
+  ticks = benchmark.run_startup(startup, benchmark.END_STATES[model], skip_ahead = model == 'dynamic')
+  assert startup.state in benchmark.END_STATES[model] and 0 < ticks <= startup.age
@@ -0,0 +1,77 @@
+from cap_table import DEFAULT_LADDER, RoundLadder, dilute, empty_cap_table, ownership_from_pct_sold
+from cohort_dynamic import StartupCohort, simulate_cohort
+from definitions import STATE_CODES
+from random_streams import cell_seed_sequences
+from results_store import ResultsWriter, read_results
+from shared_cohort import shared_startup_matrix
+import numpy as np
+import pytest
+import startup_dynamic
+import startup_static
+
+# These tests check the batched cap table kernel, and a cohort simulated over a ladder with a Series B.
+
+SERIES_B_LADDER = DEFAULT_LADDER.extend('series_b', (0.15, 0.25), 60)
+
+
+def test_dilute_by_round_matches_one_round_at_a_time():
+  rng = np.random.default_rng(4)
+  raise_round = rng.integers(1, 4, size = 50)
+  pct_sold = rng.uniform(0.05, 0.3, size = 50)
+  idx = np.arange(0, 100, 2)
+  expected = empty_cap_table(4, 100)
+  for r in range(1, 4):
+    dilute(expected, r, pct_sold[raise_round == r], idx[raise_round == r], check = 'all')
+  actual = dilute(empty_cap_table(4, 100), raise_round, pct_sold, idx, check = 'all')
+  np.testing.assert_array_equal(actual, expected)
+
+
+def test_series_b_cohort():
+  cohort = simulate_cohort(StartupCohort(0.2, 0.9, 2000, np.random.default_rng(1), ladder = SERIES_B_LADDER, check = 'all'))
+  success = cohort.state == STATE_CODES['series_a-success']
+  assert success.any()
+  # Only the startups that raised the last round of the ladder end in the success state
+  assert np.all(cohort.round[success] == len(SERIES_B_LADDER) - 1)
+  assert np.all(cohort.round[~success] < len(SERIES_B_LADDER) - 1)
+  np.testing.assert_allclose(cohort.cap_table(), ownership_from_pct_sold(cohort.pct_sold.T), rtol = 0, atol = 10**-12)
+  np.testing.assert_allclose(cohort.ownership, cohort.cap_table(), rtol = 0, atol = 10**-12)
+
+
+def test_ladder_without_raise_values_cannot_be_simulated():
+  ladder = RoundLadder(DEFAULT_LADDER.names, DEFAULT_LADDER.pct_sold_ranges)
+  with pytest.raises(Exception):
+    StartupCohort(0.5, 0.5, 10, ladder = ladder)
+
+
+@pytest.mark.parametrize('module', [startup_static, startup_dynamic])
+def test_reference_startup_checks_every_round_by_default(module):
+  startup = module.Startup(0.5, 0.5)
+  assert startup.check == 'all'
+  # Founders that own more than everything break the invariant on the next round
+  startup.cap_table[0, module.PCT_OWNED] = 2.0
+  with pytest.raises(Exception):
+    startup.update_cap_table((True, 1, 1.0, 1.1, 0.1, 0.1))
+  startup = module.Startup(0.5, 0.5, check = 'off')
+  startup.cap_table[0, module.PCT_OWNED] = 2.0
+  startup.update_cap_table((True, 1, 1.0, 1.1, 0.1, 0.1))
+
+
+def test_series_b_results_keep_every_round(tmp_path):
+  cohort = simulate_cohort(StartupCohort(0.2, 0.9, 200, np.random.default_rng(2), ladder = SERIES_B_LADDER))
+  with ResultsWriter(str(tmp_path / 'default.parquet'), 'dynamic') as writer:
+    with pytest.raises(Exception):
+      writer.write_cohort(cohort)
+  with ResultsWriter(str(tmp_path / 'series_b.parquet'), 'dynamic', ladder = SERIES_B_LADDER) as writer:
+    writer.write_cohort(cohort)
+  table = read_results(str(tmp_path / 'series_b.parquet'))
+  np.testing.assert_array_equal(table.column('series_b_pct_sold').to_numpy(), cohort.pct_sold[:, 4])
+
+
+def test_series_b_shared_sweep_matches_cohort():
+  with shared_startup_matrix(0.5, 0.5, 50, workers = 0, seed = 3, ladder = SERIES_B_LADDER) as sweep:
+    columns = sweep.columns(2, 0)
+    assert columns['pct_sold'].shape == (50, len(SERIES_B_LADDER))
+    seed_sequence = cell_seed_sequences(3, 9)[6]
+    cohort = simulate_cohort(StartupCohort(0.0, 1.0, 50, np.random.default_rng(seed_sequence), ladder = SERIES_B_LADDER))
+    np.testing.assert_array_equal(columns['pct_sold'], cohort.pct_sold)
+    assert columns['pct_sold'][:, 4].any()
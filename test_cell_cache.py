@@ -0,0 +1,80 @@
+from cell_cache import CellCache, MODEL_SOURCES, block_key, cached_cell, cached_startup_matrix
+import cell_cache
+import numpy as np
+import os
+import pytest
+import shutil
+import time
+
+# These tests check the on-disk cell cache: its keys, the version hash of the models, hits and misses, and eviction.
+
+
+def test_hit_returns_the_same_arrays(tmp_path):
+  cache = CellCache(str(tmp_path))
+  first = cached_cell(cache, 'dynamic', 0.5, 0.5, 120, seed = 1)
+  assert (cache.hits, cache.misses) == (0, 3)
+  second = cached_cell(cache, 'dynamic', 0.5, 0.5, 120, seed = 1)
+  assert (cache.hits, cache.misses) == (3, 3)
+  for name in first:
+    np.testing.assert_array_equal(first[name], second[name])
+
+
+def test_more_startups_only_simulate_the_missing_blocks(tmp_path):
+  cache = CellCache(str(tmp_path))
+  small = cached_cell(cache, 'static', 0.3, 0.6, 100, seed = 2)
+  large = cached_cell(cache, 'static', 0.3, 0.6, 150, seed = 2)
+  assert (cache.hits, cache.misses) == (2, 3)
+  np.testing.assert_array_equal(large['value'][:100], small['value'])
+
+
+@pytest.mark.parametrize('change', [{'quality': 0.6}, {'control_pref': 0.4}, {'block': 1}, {'block_size': 25}, {'seed': 2}, {'common_random_numbers': True}, {'max_age': 10}, {'max_value': 5.0}, {'model': 'static'}])
+def test_changed_parameter_misses(change):
+  parameters = {'model': 'dynamic', 'quality': 0.5, 'control_pref': 0.5, 'block': 0, 'block_size': 50, 'seed': 1, 'common_random_numbers': False, 'max_age': None, 'max_value': None}
+  assert block_key(**parameters) != block_key(**dict(parameters, **change))
+  # The same point on a finer grid is the same cell
+  assert block_key(**parameters) == block_key(**dict(parameters, quality = 0.1 + 0.1 + 0.1 + 0.2))
+
+
+def test_censored_sweep_misses_uncensored_blocks(tmp_path):
+  cache = CellCache(str(tmp_path))
+  cached_startup_matrix('dynamic', 0.5, 0.5, 50, 1, cache = cache)
+  misses = cache.misses
+  cached_startup_matrix('dynamic', 0.5, 0.5, 50, 1, cache = cache, max_age = 10)
+  assert cache.hits == 0 and cache.misses == 2 * misses
+
+
+def test_model_version_follows_the_sources(tmp_path, monkeypatch):
+  for name in MODEL_SOURCES['dynamic']:
+    shutil.copy(os.path.join(cell_cache.BASE_DIR, name), str(tmp_path))
+  monkeypatch.setattr(cell_cache, 'BASE_DIR', str(tmp_path))
+  monkeypatch.setattr(cell_cache, '_model_versions', {})
+  version = cell_cache.model_version('dynamic')
+  assert version == cell_cache.model_version('dynamic')
+  with open(str(tmp_path / 'cohort_dynamic.py'), 'a') as f:
+    f.write('\n')
+  monkeypatch.setattr(cell_cache, '_model_versions', {})
+  assert cell_cache.model_version('dynamic') != version
+
+
+def test_eviction_removes_the_least_recently_used_entry(tmp_path):
+  cache = CellCache(str(tmp_path))
+  keys = ['a' * 64, 'b' * 64, 'c' * 64]
+  for k, key in enumerate(keys):
+    cache.put(key, {'value': np.arange(100.0)})
+    os.utime(cache.path(key), (1000 + k, 1000 + k))
+  # Reading the oldest entry makes it the most recently used
+  assert cache.get(keys[0]) is not None
+  size = os.path.getsize(cache.path(keys[0]))
+  assert cache.evict(max_bytes = 2 * size) == 1
+  assert cache.get(keys[1]) is None
+  assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+
+def test_eviction_by_age(tmp_path):
+  cache = CellCache(str(tmp_path), max_age = 60)
+  cache.put('a' * 64, {'value': np.zeros(3)})
+  cache.put('b' * 64, {'value': np.zeros(3)})
+  old = time.time() - 120
+  os.utime(cache.path('a' * 64), (old, old))
+  assert cache.evict() == 1
+  assert cache.get('a' * 64) is None and cache.get('b' * 64) is not None
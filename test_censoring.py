@@ -0,0 +1,49 @@
+from adaptive_sweep import adaptive_analysis, adaptive_startup_matrix
+from cell_cache import CellCache, cached_startup_matrix
+from parallel_sweep import parallel_startup_matrix
+from parameter_sampling import sampled_startup_matrix
+from sensitivity import sensitivity_matrix
+import pytest
+
+# These tests check that every sweep gives cells in the layout of simulation_analysis(): four elements for the static model, and a fifth with the share of censored startups for the dynamic model.
+
+CELL_LENGTHS = {'static': 4, 'dynamic': 5}
+
+
+def sweeps(model, tmp_path):
+  yield parallel_startup_matrix(model, 0.5, 0.5, 40, workers = 0, seed = 1)
+  yield adaptive_analysis(adaptive_startup_matrix(model, 0.5, 0.5, batch_size = 20, min_startups = 20, max_startups = 40, seed = 1))
+  yield cached_startup_matrix(model, 0.5, 0.5, 40, 1, cache = CellCache(str(tmp_path)))
+  for surrogate in ['kernel', 'binned']:
+    yield sampled_startup_matrix(model, 0.5, 0.5, 16, 2, surrogate = surrogate, seed = 1)
+
+
+@pytest.mark.parametrize('model', ['static', 'dynamic'])
+def test_cell_layout(model, tmp_path):
+  for matrix in sweeps(model, tmp_path):
+    assert {len(cell) for row in matrix for cell in row} == {CELL_LENGTHS[model]}
+
+
+def test_sensitivity_cell_layout():
+  matrix = sensitivity_matrix(0.5, 0.5, 20, seed = 1)
+  assert {len(cell.analysis()) for row in matrix for cell in row} == {CELL_LENGTHS['dynamic']}
+
+
+def test_censored_share_matches_parallel_sweep(tmp_path):
+  expected = parallel_startup_matrix('dynamic', 0.5, 0.5, 40, workers = 0, seed = 1, max_age = 10)
+  assert all(cell[4] > 0 for row in expected for cell in row)
+  # A cell of the adaptive sweep that simulates exactly one batch draws the same startups as the parallel sweep
+  adaptive = adaptive_analysis(adaptive_startup_matrix('dynamic', 0.5, 0.5, batch_size = 40, min_startups = 40, max_startups = 40, seed = 1, max_age = 10))
+  assert [[cell[4] for cell in row] for row in adaptive] == [[cell[4] for cell in row] for row in expected]
+  cached = cached_startup_matrix('dynamic', 0.5, 0.5, 40, 1, cache = CellCache(str(tmp_path)), max_age = 10)
+  assert all(cell[4] > 0 for row in cached for cell in row)
+  assert cached != cached_startup_matrix('dynamic', 0.5, 0.5, 40, 1, cache = CellCache(str(tmp_path)))
+
+
+@pytest.mark.parametrize('sweep', [
+  lambda: adaptive_startup_matrix('static', 0.5, 0.5, max_age = 10),
+  lambda: cached_startup_matrix('static', 0.5, 0.5, 40, 1, max_age = 10),
+])
+def test_static_model_cannot_be_censored(sweep):
+  with pytest.raises(Exception):
+    sweep()
@@ -0,0 +1,64 @@
+from cohort_dynamic import CENSORED, StartupCohort, cohort_arrays, initialize_cohort_matrix, simulate_cohort
+from definitions import FUNDRAISING_MAP
+from simulate_dynamic import initialize_startup_matrix, simulation_analysis
+import numpy as np
+import pytest
+
+# These tests check the vectorized dynamic cohort against the reference Startup class, and its parameters, preallocated arrays and censoring.
+
+
+def test_cohort_matrix_is_reproducible():
+  analysis = simulation_analysis(initialize_cohort_matrix(0.5, 200, seed = 4))
+  assert analysis == simulation_analysis(initialize_cohort_matrix(0.5, 200, seed = 4))
+  assert analysis != simulation_analysis(initialize_cohort_matrix(0.5, 200, seed = 5))
+
+
+# The shares must agree within 4 standard errors and the means within 4 standard errors of the larger standard deviation
+@pytest.mark.parametrize('max_age', [None, 15])
+def test_cohort_matches_reference_startups(max_age):
+  n = 2000
+  cohorts = simulation_analysis([[simulate_cohort(StartupCohort(control_pref, quality, n, np.random.default_rng(2), max_age = max_age)) for control_pref in [0.0, 0.5, 1.0]] for quality in [0.0, 0.5, 1.0]])
+  reference = simulation_analysis(initialize_startup_matrix(0.5, n, seed = 3, skip_ahead = True, record = 'off', max_age = max_age))
+  for cohort_row, reference_row in zip(cohorts, reference):
+    for cohort_cell, reference_cell in zip(cohort_row, reference_row):
+      for k in [3, 4]:
+        share = max(cohort_cell[k], reference_cell[k], 1e-3)
+        assert abs(cohort_cell[k] - reference_cell[k]) < 4 * np.sqrt(2 * share * (1 - share) / n) + 1e-12
+      for k in range(3):
+        std = max(cohort_cell[k][1], reference_cell[k][1])
+        assert abs(cohort_cell[k][0] - reference_cell[k][0]) <= 4 * np.sqrt(2 / n) * std + 1e-12
+
+
+def test_parameters_are_validated():
+  with pytest.raises(Exception):
+    StartupCohort(0.5, 0.5, 10, parameters = {'unknown': 1})
+  with pytest.raises(Exception):
+    StartupCohort(0.5, 0.5, 10, parameters = {'live_prob': 1.5})
+
+
+def test_live_prob_parameter():
+  # With a live probability of 0, every startup dies after its first grow step
+  cohort = simulate_cohort(StartupCohort(0.5, 0.5, 500, np.random.default_rng(1), parameters = {'live_prob': 0.0}))
+  assert cohort.analysis()[3] == 0
+
+
+def test_preallocated_arrays_are_filled_in_place():
+  n = 300
+  arrays = {name: np.full((n,) + shape, 7, dtype = dtype) for name, dtype, shape in cohort_arrays(len(FUNDRAISING_MAP))}
+  cohort = simulate_cohort(StartupCohort(0.5, 0.5, n, np.random.default_rng(1), arrays = arrays))
+  expected = simulate_cohort(StartupCohort(0.5, 0.5, n, np.random.default_rng(1)))
+  assert cohort.state is arrays['state']
+  for name, column in expected.columns().items():
+    assert np.array_equal(arrays[name], column)
+  arrays['age'] = arrays['age'].astype(np.int32)
+  with pytest.raises(Exception):
+    StartupCohort(0.5, 0.5, n, arrays = arrays)
+
+
+def test_censoring_stops_at_the_limits():
+  cohort = simulate_cohort(StartupCohort(0.9, 0.5, 1000, np.random.default_rng(1), max_age = 10))
+  censored = cohort.state == CENSORED
+  assert censored.any() and (cohort.age[censored] == 10).all() and (cohort.age <= 10).all()
+  cohort = simulate_cohort(StartupCohort(0.9, 0.5, 1000, np.random.default_rng(1), max_value = 5.0))
+  censored = cohort.state == CENSORED
+  assert censored.any() and (cohort.value[censored] >= 5.0).all()
@@ -0,0 +1,43 @@
+from cohort_static import StartupCohort, initialize_cohort_matrix, simulate_cohort, STATE_CODES
+from simulate_static import initialize_startup_matrix, simulation_analysis
+import numpy as np
+import pytest
+
+# These tests check the vectorized static cohort against the reference Startup class and against its own funding history.
+
+
+def test_cohort_matrix_is_reproducible_and_analysable():
+  first = initialize_cohort_matrix(0.5, 0.5, 200, seed = 4)
+  second = initialize_cohort_matrix(0.5, 0.5, 200, seed = 4)
+  analysis = simulation_analysis(first)
+  assert analysis == simulation_analysis(second)
+  for row, cohort_row in zip(analysis, first):
+    for cell, cohort in zip(row, cohort_row):
+      expected = cohort.analysis()
+      for k in range(3):
+        assert cell[k] == pytest.approx(expected[k])
+      assert cell[3] == pytest.approx(expected[3])
+  assert simulation_analysis(initialize_cohort_matrix(0.5, 0.5, 200, seed = 5)) != analysis
+
+
+@pytest.mark.parametrize('quality, control_pref', [(0.2, 0.8), (0.9, 0.1)])
+def test_funding_history_is_consistent(quality, control_pref):
+  cohort = simulate_cohort(StartupCohort(control_pref, quality, 2000, np.random.default_rng(1)))
+  assert len(cohort.active()) == 0
+  assert np.allclose(cohort.pct_owned, np.prod(1 - cohort.pct_sold, axis = 1))
+  assert np.allclose(cohort.amt_raised, (cohort.pct_sold * cohort.post_money).sum(axis = 1))
+  survived = cohort.state == STATE_CODES['series_a']
+  assert survived.any() and (cohort.pct_sold[survived, 3] > 0).all()
+  assert np.allclose(cohort.value[survived], cohort.post_money[survived, 3])
+
+
+def test_cohort_matches_reference_startups():
+  cohorts = simulation_analysis(initialize_cohort_matrix(0.5, 0.5, 4000, seed = 2))
+  reference = simulation_analysis(initialize_startup_matrix(0.5, 0.5, 4000, seed = 3, record = 'off'))
+  for cohort_row, reference_row in zip(cohorts, reference):
+    for cohort_cell, reference_cell in zip(cohort_row, reference_row):
+      survival = cohort_cell[3]
+      assert abs(survival - reference_cell[3]) < 4 * np.sqrt(2 * max(survival * (1 - survival), 1e-3) / 4000)
+      for k in range(3):
+        mean, std = cohort_cell[k]
+        assert abs(mean - reference_cell[k][0]) <= 4 * np.sqrt(2 / 4000) * max(std, reference_cell[k][1]) + 1e-12
@@ -0,0 +1,87 @@
+from instrumentation import Profile
+import json
+import numpy as np
+import pytest
+import simulate_dynamic
+import simulate_static
+import startup_dynamic
+
+# These tests check that a Profile does not change the results of a sweep, and that its counters agree with the simulated startups.
+
+
+def pitch_counts(startups, success_states):
+  counts = {}
+  for s in startups:
+    for state in s.state_history:
+      if state in success_states:
+        counts[success_states[state]] = counts.get(success_states[state], 0) + 1
+  return counts
+
+
+def test_static_counters_match_the_startups():
+  profile = Profile()
+  matrix = simulate_static.initialize_startup_matrix(0.5, 0.5, 40, seed = 1, profile = profile)
+  analysis = simulate_static.simulation_analysis(matrix, profile)
+  assert analysis == simulate_static.simulation_analysis(simulate_static.initialize_startup_matrix(0.5, 0.5, 40, seed = 1))
+
+  startups = [s for row in matrix for cell in row for s in cell]
+  counters = profile.counters
+  assert counters['startups'] == len(startups) == 360
+  assert counters['ticks'] == counters['advance calls'] == sum(s.age for s in startups)
+  raised = pitch_counts(startups, {'pre_seed': 'pitch pre_seed success', 'seed': 'pitch seed success', 'series_a': 'pitch series_a success'})
+  failed = pitch_counts(startups, {'no_pre_seed': 'pitch pre_seed fail', 'no_seed': 'pitch seed fail'})
+  for name, k in list(raised.items()) + list(failed.items()):
+    assert counters[name] == k
+  assert counters['cap table updates'] == sum(raised.values())
+  for name in ['initialize', 'simulate', 'analysis', 'advance', 'pitch']:
+    assert profile.timers[name][0] > 0 and profile.timers[name][1] >= 0
+  assert profile.timers['simulate'][0] == 1 and profile.timers['advance'][0] == counters['advance calls']
+
+
+@pytest.mark.parametrize('skip_ahead', [False, True])
+def test_dynamic_counters_match_the_startups(skip_ahead):
+  profile = Profile()
+  matrix = simulate_dynamic.initialize_startup_matrix(0.5, 30, seed = 2, skip_ahead = skip_ahead, profile = profile, max_age = 25)
+  expected = simulate_dynamic.initialize_startup_matrix(0.5, 30, seed = 2, skip_ahead = skip_ahead, max_age = 25)
+  assert simulate_dynamic.simulation_analysis(matrix) == simulate_dynamic.simulation_analysis(expected)
+
+  startups = [s for row in matrix for cell in row for s in cell]
+  counters = profile.counters
+  assert counters['startups'] == len(startups)
+  assert counters['ticks'] == sum(s.age for s in startups)
+  assert counters['censored'] == sum(s.state == 'censored' for s in startups)
+  # Each round is raised at most once, so the successful pitches are the rounds in the funding histories. A failed pitch always leads to the fail state of its round.
+  for r, name in [(1, 'pre_seed'), (2, 'seed'), (3, 'series_a')]:
+    assert counters.get('pitch {} success'.format(name), 0) == sum(int(s.funding_history[r, 0]) for s in startups)
+    assert counters.get('pitch {} fail'.format(name), 0) == sum(s.state_history.count(name + '-fail') for s in startups)
+  assert counters['cap table updates'] == sum(k for name, k in counters.items() if name.startswith('pitch ') and name.endswith('success'))
+  assert ('grow streaks' in counters) == skip_ahead
+
+
+def test_profiles_are_independent():
+  first, second = Profile(), Profile()
+  startup = startup_dynamic.Startup(0.5, 0.5, np.random.default_rng(1))
+  simulate_dynamic.simulate(first.instrument(startup), skip_ahead = True)
+  assert isinstance(startup, startup_dynamic.Startup) and type(startup).profile is first
+  second.instrument(startup)
+  assert type(startup).profile is second and type(startup).__mro__[1] is startup_dynamic.Startup
+  # A startup simulated without a profile keeps its plain class
+  plain = simulate_dynamic.simulate(startup_dynamic.Startup(0.5, 0.5, np.random.default_rng(1)), skip_ahead = True)
+  assert type(plain) is startup_dynamic.Startup and plain.state == startup.state and plain.age == startup.age
+
+
+def test_merge_and_dump(tmp_path):
+  first, second = Profile(), Profile()
+  first.add_time('simulate', 1.0)
+  first.count('ticks', 3)
+  second.add_time('simulate', 0.5)
+  second.add_time('analysis', 0.25)
+  second.count('ticks', 2)
+  second.count('startups')
+  first.merge(second)
+  assert first.timers == {'simulate': [2, 1.5], 'analysis': [1, 0.25]}
+  assert first.counters == {'ticks': 5, 'startups': 1}
+  first.dump(str(tmp_path / 'profile.json'))
+  with open(str(tmp_path / 'profile.json')) as f:
+    assert json.load(f) == first.to_dict()
+  assert 'simulate' in first.report().splitlines()[1]
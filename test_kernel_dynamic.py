@@ -0,0 +1,13 @@
+from kernel_dynamic import cross_check
+import pytest
+
+# These tests check the compiled kernel against the reference Startup class, startup by startup on fixed seeds, with and without censoring.
+
+POINTS = [(0.2, 0.5), (0.5, 0.9), (0.9, 0.8), (1.0, 0.3)]
+LIMITS = [(None, None), (15, None), (10, 3.0)]
+
+
+@pytest.mark.parametrize('control_pref, quality', POINTS)
+@pytest.mark.parametrize('max_age, max_value', LIMITS)
+def test_kernel_matches_startup(control_pref, quality, max_age, max_value):
+  assert cross_check(control_pref, quality, 300, seed = 7, max_age = max_age, max_value = max_value) == 300
@@ -0,0 +1,46 @@
+from cohort_dynamic import initialize_cohort_matrix as dynamic_cohort_matrix
+from cohort_static import initialize_cohort_matrix as static_cohort_matrix
+from parallel_sweep import parallel_startup_matrix
+import numpy as np
+import pytest
+
+# These tests check that the process pool sweep gives the same cells as the serial cohort sweep for the same seed, whatever the number of workers or the chunk size.
+
+
+@pytest.mark.parametrize('model', ['static', 'dynamic'])
+def test_workers_and_chunks_do_not_change_the_results(model):
+  expected = parallel_startup_matrix(model, 0.5, 0.25, 50, workers = 0, seed = 3)
+  assert parallel_startup_matrix(model, 0.5, 0.25, 50, workers = 2, chunksize = 4, seed = 3) == expected
+  assert parallel_startup_matrix(model, 0.5, 0.25, 50, workers = 0, chunksize = 7, seed = 3) == expected
+  assert parallel_startup_matrix(model, 0.5, 0.25, 50, workers = 0, seed = 4) != expected
+
+
+def test_matches_serial_cohort_sweep():
+  expected = [[cohort.analysis() for cohort in row] for row in static_cohort_matrix(0.5, 0.5, 50, seed = 3)]
+  assert parallel_startup_matrix('static', 0.5, 0.5, 50, workers = 2, seed = 3) == expected
+  expected = [[cohort.analysis() for cohort in row] for row in dynamic_cohort_matrix(0.5, 50, seed = 3, common_random_numbers = True)]
+  assert parallel_startup_matrix('dynamic', 0.5, 0.5, 50, workers = 2, seed = 3, common_random_numbers = True) == expected
+
+
+def test_arrays_output():
+  arrays = parallel_startup_matrix('dynamic', 0.5, 0.5, 50, workers = 2, seed = 3, output = 'arrays')
+  expected = dynamic_cohort_matrix(0.5, 50, seed = 3)
+  for row, cohort_row in zip(arrays, expected):
+    for columns, cohort in zip(row, cohort_row):
+      for name, column in cohort.columns().items():
+        assert np.array_equal(columns[name], column)
+
+
+def test_progress_is_reported_for_every_cell():
+  calls = []
+  parallel_startup_matrix('static', 0.5, 0.5, 10, workers = 0, chunksize = 2, seed = 1, progress = lambda done, total: calls.append((done, total)))
+  assert calls == [(2, 9), (4, 9), (6, 9), (8, 9), (9, 9)]
+
+
+def test_bad_arguments_are_rejected():
+  with pytest.raises(Exception):
+    parallel_startup_matrix('unknown', 0.5, 0.5, 10, workers = 0)
+  with pytest.raises(Exception):
+    parallel_startup_matrix('static', 0.5, 0.5, 10, workers = 0, output = 'startups')
+  with pytest.raises(Exception):
+    parallel_startup_matrix('static', 0.5, 0.5, 10, workers = 0, max_age = 10)
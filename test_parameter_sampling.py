@@ -0,0 +1,25 @@
+from parallel_sweep import parallel_startup_matrix
+from parameter_sampling import sampled_startup_matrix
+import numpy as np
+import pytest
+
+# These tests compare the sampled surrogate with a dense grid sweep of the same cells, in particular on the edges of the grid, where a surrogate of the design alone would have to extrapolate.
+
+
+@pytest.mark.parametrize('surrogate', ['kernel', 'binned'])
+def test_dynamic_full_control_column_never_pitches(surrogate):
+  matrix = sampled_startup_matrix('dynamic', 0.25, 0.25, seed = 1, surrogate = surrogate)
+  for row in matrix:
+    assert row[-1][0][0] == 0
+    assert row[-1][3] == 0
+
+
+def test_dynamic_surrogate_matches_grid_sweep():
+  matrix = sampled_startup_matrix('dynamic', 0.25, 0.25, seed = 1)
+  grid = parallel_startup_matrix('dynamic', 0.25, 0.25, 1000, workers = 0, seed = 2)
+  sampled = np.array([[cell[3] for cell in row] for row in matrix])
+  expected = np.array([[cell[3] for cell in row] for row in grid])
+  assert np.max(np.abs(sampled - expected)) < 0.15
+  sampled = np.array([[cell[0][0] for cell in row] for row in matrix])
+  expected = np.array([[cell[0][0] for cell in row] for row in grid])
+  assert np.max(np.abs(sampled - expected)) < 8
@@ -0,0 +1,50 @@
+from random_streams import cell_rngs, cell_seed_sequences, cumulative_probabilities, get_rng, sample_index
+from simulate_dynamic import initialize_startup_matrix as dynamic_startup_matrix, simulation_analysis as dynamic_analysis
+from simulate_static import initialize_startup_matrix as static_startup_matrix, simulation_analysis as static_analysis
+import numpy as np
+import pytest
+
+# These tests check the spawning of the per cell random streams and that seeded sweeps of the reference Startup classes are reproducible, with or without common random numbers.
+
+
+def test_spawned_streams_are_independent_and_reproducible():
+  first = [rng.random(4) for rng in cell_rngs(7, 5)]
+  second = [rng.random(4) for rng in cell_rngs(7, 5)]
+  assert all(np.array_equal(a, b) for a, b in zip(first, second))
+  assert len({tuple(draws) for draws in first}) == 5
+  assert not np.array_equal(first[0], cell_rngs(8, 5)[0].random(4))
+  # A SeedSequence can be passed in place of the seed
+  assert np.array_equal(cell_rngs(np.random.SeedSequence(7), 5)[2].random(4), first[2])
+
+
+def test_common_random_numbers_share_one_stream():
+  sequences = cell_seed_sequences(7, 4, common_random_numbers = True)
+  assert len(sequences) == 4 and all(sequence is sequences[0] for sequence in sequences)
+  draws = [rng.random(4) for rng in cell_rngs(7, 4, common_random_numbers = True)]
+  assert all(np.array_equal(draws[0], d) for d in draws)
+  # The shared stream is the first stream of the sweep without common random numbers
+  assert np.array_equal(draws[0], cell_rngs(7, 4)[0].random(4))
+
+
+def test_get_rng():
+  rng = np.random.default_rng(1)
+  assert get_rng(rng) is rng
+  assert get_rng() is get_rng()
+
+
+def test_sample_index_follows_the_probabilities():
+  row = cumulative_probabilities([0, 2, 0, 6, 2])
+  assert row[-1] == 1.0
+  rng = np.random.default_rng(1)
+  counts = np.bincount([sample_index(row, rng) for _ in range(20000)], minlength = 5)
+  assert counts[0] == 0 and counts[2] == 0
+  assert counts / 20000 == pytest.approx([0, 0.2, 0, 0.6, 0.2], abs = 0.02)
+
+
+@pytest.mark.parametrize('common_random_numbers', [False, True])
+def test_seeded_reference_sweeps_are_reproducible(common_random_numbers):
+  static = static_analysis(static_startup_matrix(0.5, 0.5, 100, seed = 2, common_random_numbers = common_random_numbers, record = 'off'))
+  assert static == static_analysis(static_startup_matrix(0.5, 0.5, 100, seed = 2, common_random_numbers = common_random_numbers, record = 'off'))
+  assert static != static_analysis(static_startup_matrix(0.5, 0.5, 100, seed = 3, common_random_numbers = common_random_numbers, record = 'off'))
+  dynamic = dynamic_analysis(dynamic_startup_matrix(0.5, 100, seed = 2, common_random_numbers = common_random_numbers, skip_ahead = True, record = 'off'))
+  assert dynamic == dynamic_analysis(dynamic_startup_matrix(0.5, 100, seed = 2, common_random_numbers = common_random_numbers, skip_ahead = True, record = 'off'))
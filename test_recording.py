@@ -0,0 +1,71 @@
+from definitions import RECORDING_MODES
+import numpy as np
+import pytest
+import simulate_dynamic
+import simulate_static
+import startup_dynamic
+import startup_static
+
+# These tests check the recording modes of the Startup classes: every mode must give the same final results for the same seed, and each downsampled trajectory must be a subset of the full trajectory.
+
+MODELS = {'static': (startup_static.Startup, simulate_static), 'dynamic': (startup_dynamic.Startup, simulate_dynamic)}
+
+
+def run(model, seed, record, record_every = 1):
+  Startup, simulate = MODELS[model]
+  return simulate.simulate(Startup(0.4, 0.7, np.random.default_rng(seed), record, record_every))
+
+
+def final(startup):
+  return (startup.state, startup.age, startup.value, startup.pct_owned, startup.amt_raised, startup.visited, startup.funding_history.tolist())
+
+
+@pytest.mark.parametrize('model', MODELS)
+@pytest.mark.parametrize('seed', range(5))
+def test_modes_give_equal_outcomes(model, seed):
+  full = run(model, seed, 'full')
+  for record in RECORDING_MODES:
+    assert final(run(model, seed, record, 3)) == final(full)
+
+
+@pytest.mark.parametrize('model', MODELS)
+@pytest.mark.parametrize('record, record_every', [('every', 1), ('every', 3), ('events', 1)])
+def test_trajectory_is_a_subset_of_the_full_trajectory(model, record, record_every):
+  for seed in range(5):
+    full = run(model, seed, 'full')
+    startup = run(model, seed, record, record_every)
+    ages = list(startup.trajectory_ages())
+    assert len(ages) == len(startup.value_history) == len(startup.ownership_history) == len(startup.amt_raised_history)
+    assert ages[0] == 0 and ages == sorted(set(ages))
+    if record == 'every':
+      assert all(age % record_every == 0 for age in ages)
+      if record_every == 1:
+        assert startup.value_history == full.value_history
+    for k, age in enumerate(ages):
+      assert startup.value_history[k] == full.value_history[age]
+      assert startup.ownership_history[k] == full.ownership_history[age]
+      assert startup.amt_raised_history[k] == full.amt_raised_history[age]
+
+
+@pytest.mark.parametrize('model', MODELS)
+def test_off_records_nothing(model):
+  startup = run(model, 1, 'off')
+  assert startup.value_history == [] and startup.ownership_history == [] and len(startup.path) == 0
+
+
+@pytest.mark.parametrize('model', MODELS)
+def test_sweep_analysis_does_not_depend_on_the_mode(model):
+  Startup, simulate = MODELS[model]
+  grid = (0.5, 0.5) if model == 'static' else (0.5,)
+  expected = simulate.simulation_analysis(simulate.initialize_startup_matrix(*grid, 50, seed = 3))
+  for record in ['off', 'events', 'every']:
+    assert simulate.simulation_analysis(simulate.initialize_startup_matrix(*grid, 50, seed = 3, record = record, record_every = 2)) == expected
+
+
+@pytest.mark.parametrize('model', MODELS)
+def test_bad_modes_are_rejected(model):
+  Startup = MODELS[model][0]
+  with pytest.raises(Exception):
+    Startup(0.5, 0.5, record = 'some')
+  with pytest.raises(Exception):
+    Startup(0.5, 0.5, record = 'every', record_every = 0)
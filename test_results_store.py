@@ -0,0 +1,55 @@
+from analysis import matrix_analysis, table_analysis
+from cohort_dynamic import initialize_cohort_matrix
+from parallel_sweep import parallel_startup_matrix
+from results_store import ROUNDS, ResultsWriter, iter_results, read_results
+from simulate_static import initialize_startup_matrix
+import numpy as np
+import pandas as pd
+import pytest
+
+# These tests write sweeps to Parquet and Arrow IPC files and check that reading them back gives the same per startup results and the same grouped analysis.
+
+
+@pytest.mark.parametrize('format, suffix', [('parquet', '.parquet'), ('arrow', '.arrow')])
+def test_cohort_round_trip(format, suffix, tmp_path):
+  path = str(tmp_path / ('results' + suffix))
+  matrix = initialize_cohort_matrix(0.5, 100, seed = 1, common_random_numbers = True)
+  with ResultsWriter(path, 'dynamic', format = format) as writer:
+    writer.write_matrix(matrix)
+  assert writer.rows == 900
+
+  table = read_results(path)
+  assert table.num_rows == 900
+  cohorts = [cohort for row in matrix for cohort in row]
+  batches = list(iter_results(path))
+  assert len(batches) == len(cohorts)
+  for cohort, batch in zip(cohorts, batches):
+    assert np.all(batch.column('quality').to_numpy() == cohort.quality)
+    assert batch.column('state').to_pylist() == [s.state for s in cohort]
+    for name in ['age', 'value', 'pct_owned', 'amt_raised']:
+      assert np.array_equal(batch.column(name).to_numpy(), cohort.columns()[name])
+    for r, name in enumerate(ROUNDS):
+      assert np.array_equal(batch.column(name + '_pct_sold').to_numpy(), cohort.pct_sold[:, r + 1])
+      assert np.array_equal(batch.column(name + '_post_money').to_numpy(), cohort.post_money[:, r + 1])
+
+  pd.testing.assert_frame_equal(table_analysis(path), matrix_analysis('dynamic', matrix))
+  assert read_results(path, columns = ['age', 'state']).column_names == ['age', 'state']
+
+
+def test_arrays_and_startups_round_trip(tmp_path):
+  arrays = parallel_startup_matrix('dynamic', 0.5, 0.25, 50, workers = 0, seed = 2, output = 'arrays', max_age = 20)
+  with ResultsWriter(str(tmp_path / 'arrays.parquet'), 'dynamic') as writer:
+    writer.write_matrix(arrays, 0.5, 0.25)
+  pd.testing.assert_frame_equal(table_analysis(str(tmp_path / 'arrays.parquet')), matrix_analysis('dynamic', arrays, 0.5, 0.25))
+
+  startups = initialize_startup_matrix(0.5, 0.5, 50, seed = 2, record = 'off')
+  with ResultsWriter(str(tmp_path / 'startups.arrow'), 'static', format = 'arrow') as writer:
+    writer.write_matrix(startups)
+  pd.testing.assert_frame_equal(table_analysis(str(tmp_path / 'startups.arrow')), matrix_analysis('static', startups))
+
+
+def test_bad_arguments_are_rejected(tmp_path):
+  with pytest.raises(Exception):
+    ResultsWriter(str(tmp_path / 'results.csv'), 'dynamic', format = 'csv')
+  with pytest.raises(Exception):
+    ResultsWriter(str(tmp_path / 'results.parquet'), 'unknown')
@@ -0,0 +1,75 @@
+from cohort_dynamic import StartupCohort, model_parameters, simulate_cohort
+from sensitivity import METRICS, sensitivity_matrix, sensitivity_records, simulate_sensitivity_cell, variant_parameters
+from startup_dynamic import Startup
+import json
+import numpy as np
+import pytest
+
+# These tests check the paired finite differences of the sensitivity sweep against independent cohorts, and the censoring of its startups.
+
+STEPS = {'growth_rate': 0.005, 'live_prob': 0.002}
+
+
+def cell(max_age = None, max_value = None, seed = 1, n = 2000):
+  return simulate_sensitivity_cell(0.9, 0.5, n, STEPS, False, np.random.default_rng(seed), max_age, max_value)
+
+
+def test_sweep_is_reproducible():
+  # The records are compared as JSON, where the NaN efficiency of a metric that never changes equals itself
+  first = sensitivity_records(sensitivity_matrix(0.5, 0.5, 50, steps = STEPS, seed = 3))
+  assert json.dumps(first) == json.dumps(sensitivity_records(sensitivity_matrix(0.5, 0.5, 50, steps = STEPS, seed = 3)))
+  assert json.dumps(first) != json.dumps(sensitivity_records(sensitivity_matrix(0.5, 0.5, 50, steps = STEPS, seed = 4)))
+  assert len(first) == 9 * len(STEPS) * len(METRICS)
+
+
+# The paired delta must agree with the difference of two independent cohorts simulated with the same steps, within their confidence intervals
+@pytest.mark.parametrize('central', [False, True])
+def test_paired_delta_matches_independent_cohorts(central):
+  n = 4000
+  paired = simulate_sensitivity_cell(0.5, 0.6, n, {'growth_rate': 0.05}, central, np.random.default_rng(1)).deltas()['growth_rate']
+  baseline = model_parameters(Startup(0.5, 0.6))['growth_rate']
+  low = simulate_cohort(StartupCohort(0.5, 0.6, n, np.random.default_rng(2), parameters = {'growth_rate': baseline - 0.05 if central else baseline})).outcomes()
+  high = simulate_cohort(StartupCohort(0.5, 0.6, n, np.random.default_rng(3), parameters = {'growth_rate': baseline + 0.05})).outcomes()
+  scale = 0.5 if central else 1.0
+  for m, metric in enumerate(METRICS):
+    difference = scale * (np.mean(high[m]) - np.mean(low[m]))
+    half_width = scale * 1.96 * np.sqrt((np.var(high[m], ddof = 1) + np.var(low[m], ddof = 1)) / n)
+    assert abs(paired[metric]['delta'] - difference) < 2 * (half_width + paired[metric]['half_width'])
+    assert paired[metric]['derivative'] == pytest.approx(paired[metric]['delta'] / 0.05)
+  # Common random numbers make the paired delta less noisy than independent runs
+  assert paired['survived']['efficiency'] > 1
+
+
+def test_variant_parameters():
+  reference = Startup(0.5, 0.5)
+  variants = variant_parameters(reference, STEPS, central = True)
+  baseline = model_parameters(reference)
+  assert variants[0] == baseline and len(variants) == 1 + 2 * len(STEPS)
+  assert variants[1]['growth_rate'] == pytest.approx(baseline['growth_rate'] - 0.005)
+  assert variants[4]['live_prob'] == pytest.approx(baseline['live_prob'] + 0.002)
+  with pytest.raises(Exception):
+    variant_parameters(reference, {'unknown': 1.0})
+  with pytest.raises(Exception):
+    variant_parameters(reference, {'growth_rate': 0})
+  with pytest.raises(Exception):
+    simulate_sensitivity_cell(0.5, 0.5, 1, STEPS, False, np.random.default_rng(1))
+
+
+def test_censored_share_matches_the_cohort():
+  n = 4000
+  censored = cell(max_age = 15, n = n).analysis()
+  cohort = simulate_cohort(StartupCohort(0.9, 0.5, n, np.random.default_rng(2), max_age = 15)).analysis()
+  share = max(censored[4], cohort[4])
+  assert 0 < censored[4] < 1
+  assert abs(censored[4] - cohort[4]) < 4 * np.sqrt(2 * share * (1 - share) / n)
+  assert censored[2][0] <= 15
+  assert abs(censored[3] - cohort[3]) < 4 * np.sqrt(2 * 0.25 / n)
+
+
+def test_limits_are_applied_and_can_be_switched_off():
+  assert cell().analysis()[4] == 0
+  assert cell(max_value = 20.0).analysis()[4] > 0
+  # Limits that are never reached give the same cell as no limits
+  assert cell(max_age = 10**9, max_value = 1e300).analysis() == cell().analysis()
+  matrix = sensitivity_matrix(0.5, 0.5, 50, steps = STEPS, seed = 1, max_age = 10)
+  assert all(c.analysis()[4] > 0 for row in matrix for c in row if c.quality > 0)
@@ -0,0 +1,50 @@
+from parallel_sweep import parallel_startup_matrix
+from shared_cohort import shared_startup_matrix
+import numpy as np
+import os
+import pytest
+
+# These tests check the shared buffer sweep against parallel_startup_matrix(), across worker processes and slice sizes, and that the buffer is removed when the sweep is closed.
+
+LIMITS = [(None, None), (15, None), (10, 3.0)]
+NAMES = ['state', 'age', 'value', 'pct_owned', 'amt_raised', 'pct_sold', 'post_money']
+
+
+def assert_same_sweep(a, b):
+  for i in range(len(a.qualities)):
+    for j in range(len(a.control_prefs)):
+      for name in NAMES:
+        np.testing.assert_array_equal(a.columns(i, j)[name], b.columns(i, j)[name])
+
+
+@pytest.mark.parametrize('backend', ['shared_memory', 'memmap'])
+@pytest.mark.parametrize('max_age, max_value', LIMITS)
+def test_shared_sweep_matches_parallel_sweep(backend, max_age, max_value):
+  expected = parallel_startup_matrix('dynamic', 0.5, 0.5, 40, workers = 0, seed = 11, output = 'arrays', max_age = max_age, max_value = max_value)
+  with shared_startup_matrix(0.5, 0.5, 40, workers = 0, backend = backend, seed = 11, max_age = max_age, max_value = max_value) as sweep:
+    for i, row in enumerate(expected):
+      for j, columns in enumerate(row):
+        actual = sweep.columns(i, j)
+        for name in ['state', 'age', 'value', 'pct_owned']:
+          np.testing.assert_array_equal(actual[name], columns[name])
+
+
+@pytest.mark.parametrize('backend', ['shared_memory', 'memmap'])
+def test_worker_processes_match_in_process_sweep(backend):
+  with shared_startup_matrix(0.5, 0.5, 30, workers = 0, seed = 4) as expected:
+    with shared_startup_matrix(0.5, 0.5, 30, workers = 2, backend = backend, seed = 4) as actual:
+      assert_same_sweep(actual, expected)
+
+
+def test_slices_are_reproducible():
+  with shared_startup_matrix(0.5, 0.5, 40, workers = 0, slice_size = 15, seed = 4) as a:
+    with shared_startup_matrix(0.5, 0.5, 40, workers = 2, slice_size = 15, seed = 4) as b:
+      assert_same_sweep(a, b)
+      assert {len(cell) for row in a.analysis() for cell in row} == {5}
+
+
+def test_memmap_file_is_removed_on_close(tmp_path):
+  path = str(tmp_path / 'sweep.dat')
+  with shared_startup_matrix(0.5, 0.5, 10, workers = 0, backend = 'memmap', path = path, seed = 1):
+    assert os.path.getsize(path) > 0
+  assert not os.path.exists(path)
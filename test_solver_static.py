@@ -0,0 +1,30 @@
+from simulate_static import initialize_startup_matrix, simulation_analysis
+import numpy as np
+import pytest
+import solver_static
+
+# These tests check the exact solution of the static model against the sampling engines: the cohort through solver_static.cross_check(), and the reference Startup class through simulation_analysis().
+
+
+@pytest.mark.parametrize('quality, control_pref', [(0.0, 0.0), (0.5, 0.5), (0.8, 0.2), (1.0, 1.0)])
+def test_static_cohort_matches_solver(quality, control_pref):
+  solver_static.cross_check(quality, control_pref, 2000, np.random.default_rng(3))
+
+
+def test_solve_grid_matches_solve():
+  grid = solver_static.solve_grid(0.5, 0.25)
+  for i, quality in enumerate([0.0, 0.5, 1.0]):
+    for j, control_pref in enumerate([0.0, 0.25, 0.5, 0.75, 1.0]):
+      solution = solver_static.solve(quality, control_pref)
+      assert grid[i][j][3] == pytest.approx(float(solution['survival']))
+      assert grid[i][j][0][0] == pytest.approx(float(solution['value_mean']))
+      assert grid[i][j][2][1] == pytest.approx(np.sqrt(float(solution['age_var'])))
+
+
+def test_solver_matches_reference_startups():
+  exact = solver_static.solve_grid(0.5, 0.5)
+  sampled = simulation_analysis(initialize_startup_matrix(0.5, 0.5, 2000, seed = 5, record = 'off'))
+  for exact_row, sampled_row in zip(exact, sampled):
+    for exact_cell, sampled_cell in zip(exact_row, sampled_row):
+      assert abs(exact_cell[3] - sampled_cell[3]) < 0.04
+      assert abs(exact_cell[2][0] - sampled_cell[2][0]) < 0.1
@@ -0,0 +1,148 @@
+from cohort_dynamic import StartupCohort
+from definitions import CAP_TABLE_COLUMNS, FUNDING_HISTORY_COLUMNS, FUNDRAISING_MAP, STARTUP_STATES, STATE_CODES
+from random_streams import cumulative_probabilities
+from simulate_dynamic import simulate
+from startup_dynamic import Startup
+import numpy as np
+import pytest
+
+# These tests check the NumPy cap table and funding history of the dynamic Startup class, its compiled transition rows and path of state codes, and the skip-ahead grow streak of Startup.advance_grow_streak() against stepping Startup.advance(): from the grow state, both must give the same distribution of the state and age the startup leaves the grow/live loop with, also when the streak is cut short by a censoring limit.
+
+N = 4000
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_cap_table_follows_the_funding_history(seed):
+  startup = simulate(Startup(0.3, 0.8, np.random.default_rng(seed)), skip_ahead = True)
+  raised = startup.funding_history[1:, 0] == 1
+  pct_sold = np.where(raised, startup.funding_history[1:, 5], 0)
+  assert startup.pct_owned == pytest.approx(np.prod(1 - pct_sold))
+  assert startup.cap_table[:, 2].sum() == pytest.approx(1.0)
+  assert np.array_equal(startup.cap_table[1:, 0], raised)
+  assert startup.amt_raised == pytest.approx(startup.funding_history[1:, 4].sum())
+  if startup.state == 'series_a-success':
+    assert startup.value == startup.funding_history[3, 3]
+
+
+def test_to_frame():
+  startup = simulate(Startup(0.3, 0.8, np.random.default_rng(1)))
+  for table, columns, array in [('cap_table', CAP_TABLE_COLUMNS, startup.cap_table), ('funding_history', FUNDING_HISTORY_COLUMNS, startup.funding_history)]:
+    frame = startup.to_frame(table)
+    assert list(frame.index) == [FUNDRAISING_MAP[r] for r in range(len(FUNDRAISING_MAP))]
+    assert list(frame.columns) == columns
+    assert np.array_equal(frame.to_numpy(), array)
+
+
+@pytest.mark.parametrize('quality, max_age', [(1.0, None), (0.0, None), (0.5, 3)])
+def test_advance_rejects_an_ended_startup(quality, max_age):
+  startup = simulate(Startup(0.0, quality, np.random.default_rng(1)), max_age = max_age)
+  assert startup.state == {1.0: 'series_a-success', 0.0: 'die', 0.5: 'censored'}[quality]
+  with pytest.raises(Exception):
+    startup.advance()
+
+
+# The compiled rows of every state must be the cumulative transition probabilities, and the cohort must sample from the same rows
+@pytest.mark.parametrize('control_pref, quality', [(0.0, 0.0), (0.3, 0.8), (1.0, 1.0)])
+def test_compiled_transition_rows(control_pref, quality):
+  startup = Startup(control_pref, quality)
+  cohort = StartupCohort(control_pref, quality, 1)
+  for k, state in enumerate(STARTUP_STATES):
+    row = cumulative_probabilities(startup.get_transition_probabilities(state))
+    assert startup.transition_rows[state] == pytest.approx(row)
+    assert cohort.cumulative_matrix[k] == pytest.approx(row)
+
+
+def test_transition_rows_are_recompiled():
+  startup = Startup(0.2, 0.2)
+  startup.control_pref = 0.9
+  startup.quality = 0.7
+  assert startup.transition_rows == Startup(0.9, 0.7).transition_rows
+  with pytest.raises(Exception):
+    startup.quality = 1.5
+  with pytest.raises(Exception):
+    startup.control_pref = -0.1
+  assert startup.transition_rows == Startup(0.9, 0.7).transition_rows
+
+
+def test_sampled_transitions_follow_the_probabilities():
+  startup = Startup(0.4, 0.6, np.random.default_rng(1))
+  probs = np.array(startup.get_transition_probabilities('grow'), dtype = float)
+  draws = [STARTUP_STATES.index(startup.sample_transition('grow')) for _ in range(20000)]
+  assert np.bincount(draws, minlength = len(probs)) / 20000 == pytest.approx(probs / probs.sum(), abs = 0.02)
+
+
+# Every step of the path must be a transition of the model (a pitch from live moves straight to the success or fail state of its round), and the visited bitmask must hold exactly the states of the path
+@pytest.mark.parametrize('seed', range(10))
+def test_path_and_visited_states(seed):
+  startup = simulate(Startup(0.6, 0.6, np.random.default_rng(seed)), skip_ahead = seed % 2 == 1)
+  history = startup.state_history
+  assert history[0] == 'start' and history[-1] == startup.state
+  assert list(startup.path) == [STATE_CODES[state] for state in history]
+  assert startup.path.typecode == 'B'
+  for state, next_state in zip(history, history[1:]):
+    assert startup.get_transition_probabilities(state)[STATE_CODES[next_state]] > 0 or (state == 'live' and next_state.endswith(('-success', '-fail')))
+  for state in STATE_CODES:
+    assert startup.has_visited(state) == (state in history)
+  assert startup.visited == sum(1 << STATE_CODES[state] for state in set(history))
+
+
+def test_unrecorded_path_still_tracks_visited_states():
+  startup = simulate(Startup(0.6, 0.6, np.random.default_rng(1), record = 'off'), skip_ahead = True)
+  assert len(startup.path) == 0 and startup.state_history == []
+  assert startup.has_visited('start') and startup.has_visited(startup.state)
+
+
+# This helper runs one streak of a startup in the grow state and censors it at max_age, as simulate_dynamic.simulate() does
+def skip_ahead(startup, max_age):
+  startup.advance_grow_streak(startup.grow_limit(max_age))
+  if startup.should_censor(max_age):
+    startup.censor()
+  return startup.state, startup.age
+
+
+# This helper steps a startup in the grow state with advance() until it dies or has made its pitch decision (a live step that does not choose to grow adds one to the age), censoring it at max_age
+def stepped(startup, max_age):
+  while True:
+    previous_state, previous_age = startup.state, startup.age
+    startup.advance()
+    if startup.should_censor(max_age):
+      startup.censor()
+      break
+    if startup.state == 'die' or (previous_state == 'live' and startup.age > previous_age):
+      break
+  return startup.state, startup.age
+
+
+# This helper returns the (state, age) of N startups of the cell, each started in the grow state
+def run(control_pref, quality, max_age, path, seed):
+  rng = np.random.default_rng(seed)
+  results = []
+  for _ in range(N):
+    startup = Startup(control_pref, quality, rng, record = 'off')
+    startup.state = 'grow'
+    results.append(path(startup, max_age))
+  return results
+
+
+@pytest.mark.parametrize('control_pref, quality, max_age', [(0.9, 0.5, None), (0.5, 0.8, None), (0.9, 0.5, 12), (0.97, 0.3, 30)])
+def test_grow_streak_matches_stepping(control_pref, quality, max_age):
+  fast = run(control_pref, quality, max_age, skip_ahead, 1)
+  slow = run(control_pref, quality, max_age, stepped, 2)
+
+  # The share of each exit state agrees within 4 standard errors
+  states = {state for state, _ in fast + slow}
+  for state in states:
+    p = np.mean([s == state for s, _ in fast])
+    q = np.mean([s == state for s, _ in slow])
+    standard_error = np.sqrt(max((p + q) / 2 * (1 - (p + q) / 2), 1 / N) * 2 / N)
+    assert abs(p - q) < 4 * standard_error, state
+
+  # The ages pass a two sample Kolmogorov-Smirnov test at about the 0.1% level
+  fast_ages = np.sort([age for _, age in fast])
+  slow_ages = np.sort([age for _, age in slow])
+  grid = np.union1d(fast_ages, slow_ages)
+  distance = np.max(np.abs(np.searchsorted(fast_ages, grid, side = 'right') - np.searchsorted(slow_ages, grid, side = 'right'))) / N
+  assert distance < 1.95 * np.sqrt(2 / N)
+  if max_age is not None:
+    assert fast_ages.max() <= max_age and slow_ages.max() <= max_age
+    assert any(state == 'censored' for state, _ in fast)
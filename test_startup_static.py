@@ -0,0 +1,106 @@
+from cohort_static import StartupCohort
+from definitions import CAP_TABLE_COLUMNS, FUNDING_HISTORY_COLUMNS, FUNDRAISING_MAP, STARTUP_STATES_STATIC, STATE_CODES_STATIC as STATE_CODES
+from random_streams import cumulative_probabilities
+from simulate_static import simulate
+from startup_static import Startup
+import numpy as np
+import pytest
+
+# These tests check the NumPy cap table and funding history of the static Startup class, their pandas views from to_frame(), the compiled transition rows, and the path of state codes.
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_cap_table_follows_the_funding_history(seed):
+  startup = simulate(Startup(0.5, 0.5, np.random.default_rng(seed)))
+  raised = startup.funding_history[1:, 0] == 1
+  pct_sold = np.where(raised, startup.funding_history[1:, 5], 0)
+  assert startup.pct_owned == pytest.approx(np.prod(1 - pct_sold))
+  assert startup.cap_table[:, 2].sum() == pytest.approx(1.0)
+  assert np.array_equal(startup.cap_table[1:, 0], raised)
+  assert startup.amt_raised == pytest.approx(startup.funding_history[1:, 4].sum())
+  if startup.state == 'series_a':
+    assert startup.value == startup.funding_history[3, 3]
+    assert startup.cap_table[:, 3].sum() == pytest.approx(startup.value)
+
+
+def test_to_frame():
+  startup = simulate(Startup(0.5, 0.5, np.random.default_rng(1)))
+  for table, columns, array in [('cap_table', CAP_TABLE_COLUMNS, startup.cap_table), ('funding_history', FUNDING_HISTORY_COLUMNS, startup.funding_history)]:
+    frame = startup.to_frame(table)
+    assert list(frame.index) == [FUNDRAISING_MAP[r] for r in range(len(FUNDRAISING_MAP))]
+    assert list(frame.columns) == columns
+    assert np.array_equal(frame.to_numpy(), array)
+  with pytest.raises(Exception):
+    startup.to_frame('unknown')
+
+
+def test_startups_do_not_share_arrays():
+  first, second = Startup(0.5, 0.5), Startup(0.5, 0.5)
+  first.cap_table[0, 2] = 0.5
+  first.funding_history[1, 0] = 1
+  assert second.pct_owned == 1.0 and second.funding_history[1, 0] == 0
+
+
+def test_advance_rejects_an_ended_startup():
+  startup = simulate(Startup(0.5, 0.5, np.random.default_rng(1)))
+  with pytest.raises(Exception):
+    startup.advance()
+
+# The compiled rows of every state must be the cumulative transition probabilities, and the cohort must sample from the same rows
+@pytest.mark.parametrize('control_pref, quality', [(0.0, 0.0), (0.3, 0.8), (1.0, 1.0)])
+def test_compiled_transition_rows(control_pref, quality):
+  startup = Startup(control_pref, quality)
+  cohort = StartupCohort(control_pref, quality, 1)
+  for k, state in enumerate(STARTUP_STATES_STATIC):
+    row = cumulative_probabilities(startup.get_transition_probabilities(state))
+    assert startup.transition_rows[state] == pytest.approx(row)
+    assert cohort.cumulative_matrix[k] == pytest.approx(row)
+
+
+def test_transition_rows_are_recompiled():
+  startup = Startup(0.2, 0.2)
+  startup.control_pref = 0.9
+  startup.quality = 0.7
+  assert startup.transition_rows == Startup(0.9, 0.7).transition_rows
+  with pytest.raises(Exception):
+    startup.quality = 1.5
+  with pytest.raises(Exception):
+    startup.control_pref = -0.1
+  assert startup.transition_rows == Startup(0.9, 0.7).transition_rows
+
+
+def test_sampled_transitions_follow_the_probabilities():
+  startup = Startup(0.4, 0.6, np.random.default_rng(1))
+  probs = np.array(startup.get_transition_probabilities('start'), dtype = float)
+  draws = [STARTUP_STATES_STATIC.index(startup.sample_transition('start')) for _ in range(20000)]
+  assert np.bincount(draws, minlength = len(probs)) / 20000 == pytest.approx(probs / probs.sum(), abs = 0.02)
+
+# Every step of the path must be a transition of the model, and the visited bitmask must hold exactly the states of the path
+@pytest.mark.parametrize('seed', range(10))
+def test_path_and_visited_states(seed):
+  startup = simulate(Startup(0.5, 0.5, np.random.default_rng(seed)))
+  history = startup.state_history
+  assert history[0] == 'start' and history[-1] == startup.state
+  assert list(startup.path) == [STATE_CODES[state] for state in history]
+  assert startup.path.typecode == 'B'
+  for state, next_state in zip(history, history[1:]):
+    assert startup.get_transition_probabilities(state)[STATE_CODES[next_state]] > 0
+  for state in STATE_CODES:
+    assert startup.has_visited(state) == (state in history)
+  assert startup.visited == sum(1 << STATE_CODES[state] for state in set(history))
+
+
+def test_unrecorded_path_still_tracks_visited_states():
+  startup = simulate(Startup(0.5, 0.5, np.random.default_rng(1), record = 'off'))
+  assert len(startup.path) == 0 and startup.state_history == []
+  assert startup.has_visited('start') and startup.has_visited(startup.state)
+
+
+# The Series A valuation depends on the rounds in the path (see Startup.pitch())
+@pytest.mark.parametrize('seed', range(20))
+def test_series_a_valuation_follows_the_path(seed):
+  startup = simulate(Startup(0.2, 0.7, np.random.default_rng(seed)))
+  if startup.state == 'series_a':
+    history = startup.state_history
+    base = 40 if 'seed' in history else 25 if 'pre_seed' in history and 'no_seed' in history else 20
+    assert startup.value == pytest.approx(base + 40 * 0.7)
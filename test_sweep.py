@@ -0,0 +1,48 @@
+from parallel_sweep import parallel_startup_matrix
+from sweep import analysis_records, main, run_sweep
+import json
+import pytest
+
+# These tests run the sweep command line in process and check that it rejects the combinations of options it cannot run.
+
+
+def test_output_matches_the_cohort_sweep(tmp_path):
+  path = str(tmp_path / 'sweep.json')
+  assert main(['dynamic', '--q-inc', '0.5', '--cp-inc', '0.5', '--n', '40', '--seed', '2', '--max-age', '20', '--output', path]) == 0
+  with open(path) as f:
+    report = json.load(f)
+  expected = analysis_records(parallel_startup_matrix('dynamic', 0.5, 0.5, 40, workers = 0, seed = 2, max_age = 20), 0.5, 0.5)
+  assert report['cells'] == expected
+  assert report['model'] == 'dynamic' and report['engine'] == 'cohort' and report['seed'] == 2
+  assert all('censored' in cell for cell in report['cells'])
+
+
+def test_reference_engine_with_profile(capsys):
+  assert main(['static', '--q-inc', '0.5', '--cp-inc', '0.5', '--n', '10', '--seed', '1', '--engine', 'reference', '--profile']) == 0
+  assert 'advance calls' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('argv', [
+  ['static', '--max-age', '10'],
+  ['dynamic', '--engine', 'sampled', '--max-value', '100'],
+  ['dynamic', '--profile'],
+  ['dynamic', '--engine', 'sampled', '--profile'],
+  ['static', '--engine', 'other'],
+  ['other'],
+])
+def test_cli_rejects_bad_combinations(argv):
+  with pytest.raises((SystemExit, Exception)) as error:
+    main(argv + ['--q-inc', '0.5', '--cp-inc', '0.5', '--n', '5'])
+  if error.type is SystemExit:
+    assert error.value.code == 2
+
+
+def test_run_sweep_rejects_bad_combinations():
+  with pytest.raises(Exception):
+    run_sweep('dynamic', 0.5, 0.25, 5, engine = 'reference')
+  with pytest.raises(Exception):
+    run_sweep('static', 0.5, 0.5, 5, max_age = 10)
+  with pytest.raises(Exception):
+    run_sweep('dynamic', 0.5, 0.5, 5, engine = 'sampled', max_age = 10)
+  with pytest.raises(Exception):
+    run_sweep('unknown', 0.5, 0.5, 5)
@@ -0,0 +1,86 @@
+from parallel_sweep import parallel_startup_matrix
+from sweep_service import SweepService, job_events, request, start_server
+import asyncio
+import json
+import pytest
+
+# These tests run the sweep service in process, on threads (workers = 0) and behind its HTTP server on a free local port.
+
+SPEC = {'model': 'dynamic', 'q_increment': 0.5, 'cp_increment': 0.5, 'number_of_startups': 30, 'seed': 5}
+
+
+# This helper runs a coroutine function with a fresh service and closes the service afterwards
+def with_service(test):
+  async def run():
+    service = SweepService(workers = 0)
+    try:
+      return await test(service)
+    finally:
+      await service.close()
+  return asyncio.run(run())
+
+
+@pytest.mark.parametrize('spec', [SPEC, dict(SPEC, model = 'static'), dict(SPEC, max_age = 10, common_random_numbers = True)])
+def test_job_matches_parallel_sweep(spec):
+  async def test(service):
+    return await service.submit(spec).result()
+  expected = parallel_startup_matrix(spec['model'], spec['q_increment'], spec['cp_increment'], spec['number_of_startups'], workers = 0, seed = spec['seed'], common_random_numbers = spec.get('common_random_numbers', False), max_age = spec.get('max_age'), max_value = spec.get('max_value'))
+  assert with_service(test) == expected
+
+
+def test_repeated_seeded_spec_is_served_by_the_same_job():
+  async def test(service):
+    job = service.submit(SPEC)
+    # The defaults of an equal spec do not make it a different sweep
+    assert service.submit(dict(SPEC, common_random_numbers = False)) is job
+    await job.result()
+    assert service.submit(SPEC) is job
+    assert service.submit(dict(SPEC, seed = 6)) is not job
+    unseeded = service.submit(dict(SPEC, seed = None))
+    assert service.submit(dict(SPEC, seed = None)) is not unseeded
+  with_service(test)
+
+
+def test_cancel_ends_the_job_cancelled():
+  async def test(service):
+    job = service.submit(dict(SPEC, q_increment = 0.1, cp_increment = 0.1, number_of_startups = 200))
+    events = job.events()
+    assert (await events.__anext__())['event'] == 'cell'
+    service.cancel(job.id)
+    async for event in events:
+      pass
+    assert event['event'] == 'cancelled' and job.state == 'cancelled'
+    assert job.done < job.total
+    # A cancelled job does not serve its spec again
+    assert service.submit(job.spec) is not job
+    # A job cancelled before it started ends cancelled too
+    queued = service.submit(dict(SPEC, seed = 7))
+    service.cancel(queued.id)
+    await asyncio.gather(queued.task, return_exceptions = True)
+    assert queued.state == 'cancelled'
+  with_service(test)
+
+
+def test_http_interface():
+  async def test(service):
+    server = await start_server(service, port = 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+      created = await request('POST', '/jobs', SPEC, port = port)
+      events = [event async for event in job_events(created['job'], port = port)]
+      assert [event['event'] for event in events] == ['cell'] * 9 + ['done']
+      status = await request('GET', '/jobs/{}'.format(created['job']), port = port)
+      assert status['state'] == 'done' and len(status['cells']) == 9
+      assert (await request('POST', '/jobs', SPEC, port = port))['cached']
+
+      # A malformed body and an invalid spec are both rejected with 400
+      for body in [b'{"model": ', json.dumps(dict(SPEC, model = 'unknown')).encode()]:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write('POST /jobs HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format(len(body)).encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        assert response.split()[1] == b'400'
+      with pytest.raises(Exception):
+        await request('GET', '/jobs/999', port = port)
+  with_service(test)